@@ -1,124 +1,255 @@
 """
 Agent Database - SQLite persistence for XAGENT registry
-Stores agent URLs, upload status, and active state
+Single store for agents.db: one schema, versioned migrations (PRAGMA user_version)
+and the repository functions main.py uses. Stores agent URLs, upload status and
+lifecycle status (inactive / spawning / active).
 """
-import sqlite3
+import json
 import os
-from datetime import datetime
+import threading
+
+import db_pool
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "agents.db")
+# Legacy registry locations: the old save_agent_url() wrote agents.json relative to the
+# working directory, so a backend started from the repo root kept it there
+AGENTS_JSON_PATHS = [
+    os.path.abspath("agents.json"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "agents.json"),
+]
+db = db_pool.get_database(DB_PATH)
 
-def get_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    """Initialize database schema"""
-    conn = get_connection()
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS agents (
-            agent_id TEXT PRIMARY KEY,
-            name TEXT,
-            description TEXT,
-            drive_url TEXT,
-            google_email TEXT,
-            created_at TIMESTAMP,
-            last_active TIMESTAMP,
-            files_uploaded BOOLEAN DEFAULT 0,
-            active BOOLEAN DEFAULT 0
-        )
-    """)
-    # Add google_email column if not exists (migration for existing DBs)
-    try:
-        conn.execute("ALTER TABLE agents ADD COLUMN google_email TEXT")
-    except:
-        pass  # Column already exists
-    conn.commit()
-    conn.close()
+AGENT_COLUMNS = ("name", "description", "status", "drive_url", "google_email", "files_uploaded")
 
-def get_agent(agent_id: str) -> dict | None:
-    """Get agent by ID"""
-    conn = get_connection()
-    row = conn.execute(
-        "SELECT * FROM agents WHERE agent_id = ?", (agent_id,)
-    ).fetchone()
-    conn.close()
-    if row:
-        return dict(row)
-    return None
-
-def save_agent(agent_id: str, name: str = "", description: str = "", 
-               drive_url: str = None, files_uploaded: bool = False,
-               google_email: str = None):
-    """Save or update agent"""
-    conn = get_connection()
-    existing = get_agent(agent_id)
-    now = datetime.now().isoformat()
-    
-    if existing:
-        # Update existing
+# One prepared upsert: NULL arguments keep the stored value
+UPSERT_AGENT_SQL = """
+    INSERT INTO agents (id, name, description, status, drive_url, google_email, files_uploaded, last_active)
+    VALUES (:id, :name, :description, COALESCE(:status, 'inactive'), :drive_url, :google_email, :files_uploaded,
+            CURRENT_TIMESTAMP)
+    ON CONFLICT(id) DO UPDATE SET
+        name = COALESCE(:name, name),
+        description = COALESCE(:description, description),
+        status = COALESCE(:status, status),
+        drive_url = COALESCE(:drive_url, drive_url),
+        google_email = COALESCE(:google_email, google_email),
+        files_uploaded = COALESCE(:files_uploaded, files_uploaded),
+        last_active = CURRENT_TIMESTAMP
+"""
+
+CREATE_AGENTS_SQL = """
+    CREATE TABLE IF NOT EXISTS agents (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        description TEXT,
+        status TEXT DEFAULT 'inactive',
+        drive_url TEXT,
+        google_email TEXT,
+        files_uploaded TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_active TIMESTAMP
+    )
+"""
+
+
+def saved_app_url(url):
+    """Only saved apps (/apps/drive/...) can be reopened; the blank bundled template can't"""
+    return url if url and "/apps/bundled/" not in url else None
+
+
+# =============================================================================
+# Migrations - applied in order, each in one transaction with its user_version bump
+# =============================================================================
+def _migrate_unified_table(conn):
+    """v1: one agents table. Converts the old agent_db schema (agent_id, active)."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(agents)")}
+    if "agent_id" in columns:
+        conn.execute("ALTER TABLE agents RENAME TO agents_legacy")
+        conn.execute(CREATE_AGENTS_SQL)
         conn.execute("""
-            UPDATE agents SET 
-                drive_url = COALESCE(?, drive_url),
-                files_uploaded = ?,
-                last_active = ?,
-                google_email = COALESCE(?, google_email),
-                active = 1
-            WHERE agent_id = ?
-        """, (drive_url, files_uploaded, now, google_email, agent_id))
+            INSERT INTO agents (id, name, description, status, drive_url, google_email,
+                                files_uploaded, created_at, last_active)
+            SELECT agent_id, name, description, CASE WHEN active THEN 'active' ELSE 'inactive' END,
+                   CASE WHEN drive_url LIKE '%/apps/bundled/%' THEN NULL ELSE drive_url END,
+                   google_email, files_uploaded, COALESCE(created_at, CURRENT_TIMESTAMP), last_active
+            FROM agents_legacy
+        """)
+        conn.execute("DROP TABLE agents_legacy")
+    elif columns:
+        if "last_active" not in columns:
+            conn.execute("ALTER TABLE agents ADD COLUMN last_active TIMESTAMP")
     else:
-        # Insert new
-        conn.execute("""
-            INSERT INTO agents (agent_id, name, description, drive_url, 
-                              google_email, created_at, last_active, files_uploaded, active)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
-        """, (agent_id, name, description, drive_url, google_email, now, now, files_uploaded))
-    
-    conn.commit()
-    conn.close()
-
-def set_active(agent_id: str, active: bool):
-    """Set agent active status"""
-    conn = get_connection()
-    now = datetime.now().isoformat()
-    conn.execute("""
-        UPDATE agents SET active = ?, last_active = ? WHERE agent_id = ?
-    """, (active, now, agent_id))
-    conn.commit()
-    conn.close()
-
-def update_drive_url(agent_id: str, drive_url: str):
-    """Update the drive URL after agent creation"""
-    conn = get_connection()
-    conn.execute("""
-        UPDATE agents SET drive_url = ?, files_uploaded = 1 WHERE agent_id = ?
-    """, (drive_url, agent_id))
-    conn.commit()
-    conn.close()
-
-def list_active() -> list[dict]:
-    """Get all active agents"""
-    conn = get_connection()
-    rows = conn.execute(
-        "SELECT * FROM agents WHERE active = 1"
-    ).fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+        conn.execute(CREATE_AGENTS_SQL)
+
+
+def _migrate_status_index(conn):
+    """v2: status filters are indexed lookups"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_agents_status ON agents(status)")
+
+
+def _migrate_import_agents_json(conn):
+    """v3: one-time import of the legacy agents.json registry (files are left in place)
+
+    Both AGENTS_JSON_PATHS are imported, working directory first; an agent's
+    URL from an earlier file wins.
+    """
+    paths = list(dict.fromkeys(AGENTS_JSON_PATHS))  # Same file when started from backend/
+    found = False
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        found = True
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                agents = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[agent_db] Skipping unreadable {path}: {e}")
+            continue
+        rows = [(agent_id, agent_id, saved_app_url(entry.get("url")), entry.get("created_at"))
+                for agent_id, entry in agents.items() if isinstance(entry, dict)]
+        conn.executemany("""
+            INSERT INTO agents (id, name, drive_url, created_at)
+            VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            ON CONFLICT(id) DO UPDATE SET drive_url = COALESCE(drive_url, excluded.drive_url)
+        """, rows)
+        print(f"[agent_db] Imported {len(rows)} agents from {path}")
+    if not found:
+        print(f"[agent_db] No legacy agents.json found (looked in {', '.join(paths)})")
+
+
+MIGRATIONS = [
+    (1, "unified agents table", _migrate_unified_table),
+    (2, "status index", _migrate_status_index),
+    (3, "import agents.json", _migrate_import_agents_json),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version() -> int:
+    return db.query_one("PRAGMA user_version")["user_version"]
+
+
+def init_db() -> list[str]:
+    """Bring agents.db up to SCHEMA_VERSION. Returns the names of migrations applied."""
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        def run(conn, version=version, migrate=migrate):
+            # Re-check inside the write transaction (another process may have migrated)
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                return False
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            return True
+        if db.transaction(run):
+            applied.append(f"v{version} {name}")
+    return applied
+
+
+# =============================================================================
+# Repository
+# =============================================================================
+def get_agent(agent_id: str) -> dict | None:
+    """Get agent by ID"""
+    return db.query_one("SELECT * FROM agents WHERE id = ?", (agent_id,))
+
+
+def get_agents(agent_ids) -> dict:
+    """Get several agents in one query -> {agent_id: row}"""
+    agent_ids = list(agent_ids)
+    if not agent_ids:
+        return {}
+    rows = db.query(f"SELECT * FROM agents WHERE id IN ({','.join('?' * len(agent_ids))})", agent_ids)
+    return {row["id"]: row for row in rows}
+
 
 def list_all() -> list[dict]:
-    """Get all agents (active and inactive)"""
-    conn = get_connection()
-    rows = conn.execute("SELECT * FROM agents").fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    """Get all agents (any status)"""
+    return db.query("SELECT * FROM agents")
+
+
+def list_by_status(status: str) -> list[dict]:
+    """Agents with the given status (uses idx_agents_status)"""
+    return db.query("SELECT * FROM agents WHERE status = ?", (status,))
+
+
+def upsert_agent(agent_id: str, **fields):
+    """Insert or update one agent; fields left out (or None) keep their stored value"""
+    upsert_agents([dict(fields, id=agent_id)])
+
+
+def upsert_agents(agents: list[dict]):
+    """Batched upsert: list of dicts (id + any AGENT_COLUMNS) written in one transaction"""
+    rows = [dict({col: None for col in AGENT_COLUMNS}, **agent) for agent in agents]
+    if len(rows) == 1:
+        db.execute(UPSERT_AGENT_SQL, rows[0])
+    elif rows:
+        db.executemany(UPSERT_AGENT_SQL, rows)
+    return rows
+
+
+def set_status_many(agent_ids, status: str):
+    """Set status for many agents in one transaction"""
+    return upsert_agents([{"id": agent_id, "status": status} for agent_id in agent_ids])
+
 
 def deactivate_all():
     """Mark all agents as inactive (on startup)"""
-    conn = get_connection()
-    conn.execute("UPDATE agents SET active = 0")
-    conn.commit()
-    conn.close()
+    db.execute("UPDATE agents SET status = 'inactive' WHERE status != 'inactive'")
+
+
+# =============================================================================
+# In-memory registry - read paths are dict lookups, writes go through to SQLite
+# =============================================================================
+class AgentRegistry:
+    """Agent rows cached in process, loaded once and updated write-through
+
+    `version` bumps on every change; agent_version(id) tracks a single agent,
+    so readers (ETags, SSE snapshots) can skip unchanged data.
+    """
+
+    def __init__(self):
+        self._agents = {}
+        self._versions = {}
+        self.version = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def load(self):
+        """(Re)load every row from agents.db"""
+        rows = list_all()
+        with self._lock:
+            self._agents = {row["id"]: row for row in rows}
+            self.version += 1
+            self._versions = {agent_id: self.version for agent_id in self._agents}
+
+    def get(self, agent_id: str) -> dict | None:
+        with self._lock:
+            row = self._agents.get(agent_id)
+        return dict(row) if row else None
+
+    def get_many(self, agent_ids) -> dict:
+        with self._lock:
+            return {aid: dict(self._agents[aid]) for aid in agent_ids if aid in self._agents}
+
+    def list_all(self, status: str = None) -> list[dict]:
+        with self._lock:
+            return [dict(row) for row in self._agents.values() if status is None or row["status"] == status]
+
+    def agent_version(self, agent_id: str) -> int:
+        with self._lock:
+            return self._versions.get(agent_id, 0)
+
+    def upsert(self, agents: list[dict]) -> list[dict]:
+        """Write to SQLite, then refresh the touched rows (DB fills defaults/timestamps)"""
+        with self._write_lock:  # Keeps write + refresh ordered between concurrent upserts
+            rows = upsert_agents(agents)
+            if rows:
+                fresh = get_agents(row["id"] for row in rows)
+                with self._lock:
+                    self._agents.update(fresh)
+                    self.version += 1
+                    for agent_id in fresh:
+                        self._versions[agent_id] = self.version
+        return rows
+
 
-# Initialize on import
-init_db()
+registry = AgentRegistry()
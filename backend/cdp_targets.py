@@ -0,0 +1,139 @@
+"""
+CDP Target Watcher - every tab's title/URL without switching WebDriver focus
+Opens a second DevTools connection to the browser (the chromedriver session
+keeps its own), enables Target.setDiscoverTargets and keeps a table of targets
+that is updated from targetCreated / targetInfoChanged / targetDestroyed
+events. For Chrome, a WebDriver window handle is the page's CDP targetId.
+Listeners get every target event (used by the tab monitor).
+"""
+import itertools
+import json
+import threading
+import urllib.request
+from concurrent.futures import Future
+
+import websocket  # websocket-client (installed with selenium)
+
+TARGET_EVENTS = ("Target.targetCreated", "Target.targetInfoChanged", "Target.targetDestroyed")
+
+
+def browser_ws_url(debugger_address: str, timeout: float = 5) -> str:
+    """Browser-level DevTools websocket URL for a host:port debugger address"""
+    with urllib.request.urlopen(f"http://{debugger_address}/json/version", timeout=timeout) as resp:
+        return json.load(resp)["webSocketDebuggerUrl"]
+
+
+class TargetWatcher:
+    """Live {targetId: targetInfo} for one browser, fed by CDP events"""
+
+    def __init__(self, ws_url: str, name: str = "cdp-targets", owner=None):
+        self.ws_url = ws_url
+        self.name = name
+        self.owner = owner  # What this watcher was started for (e.g. the WebDriver)
+        self.version = 0  # Bumped on every target change
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._listeners = []
+        self._ws = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, timeout: float = 5) -> bool:
+        """Connect and load the initial target list. Returns False if DevTools is unreachable."""
+        try:
+            self._ws = websocket.create_connection(self.ws_url, timeout=timeout, suppress_origin=True)
+            self._ws.settimeout(None)  # Reader blocks until the next event
+        except Exception:
+            return False
+        self._thread = threading.Thread(target=self._read_loop, name=self.name, daemon=True)
+        self._thread.start()
+        try:
+            # Emits targetCreated for every existing target, then live updates
+            self.send("Target.setDiscoverTargets", {"discover": True}, timeout)
+            for info in self.send("Target.getTargets", {}, timeout).get("targetInfos", []):
+                self._apply("Target.targetCreated", {"targetInfo": info}, notify=False)
+        except Exception:
+            self.close()
+            return False
+        self._ready.set()
+        return True
+
+    def close(self):
+        if self._ws:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+
+    def add_listener(self, callback):
+        """callback(event_name, target_info) for every target event (runs on the reader thread)"""
+        self._listeners.append(callback)
+
+    # -- commands -----------------------------------------------------------------
+    def send(self, method: str, params: dict = None, timeout: float = 10) -> dict:
+        """Browser-level CDP command (e.g. Target.closeTarget); returns its result"""
+        if not self.alive:
+            raise ConnectionError("DevTools connection closed")
+        message_id = next(self._ids)
+        future = Future()
+        self._pending[message_id] = future
+        try:
+            with self._send_lock:
+                self._ws.send(json.dumps({"id": message_id, "method": method, "params": params or {}}))
+            return future.result(timeout)
+        finally:
+            self._pending.pop(message_id, None)
+
+    # -- state --------------------------------------------------------------------
+    def targets(self, target_type: str = None) -> dict:
+        """{targetId: targetInfo} snapshot (optionally only one type, e.g. "page")"""
+        with self._lock:
+            return {tid: dict(info) for tid, info in self._targets.items()
+                    if target_type is None or info.get("type") == target_type}
+
+    def pages(self) -> dict:
+        return self.targets("page")
+
+    def _apply(self, method, params, notify=True):
+        if method == "Target.targetDestroyed":
+            with self._lock:
+                info = self._targets.pop(params.get("targetId"), None) or {"targetId": params.get("targetId")}
+                self.version += 1
+        else:
+            info = params.get("targetInfo") or {}
+            with self._lock:
+                self._targets[info.get("targetId")] = info
+                self.version += 1
+        if notify:
+            for callback in list(self._listeners):
+                try:
+                    callback(method, dict(info))
+                except Exception:
+                    pass  # A broken listener must not stop event delivery
+
+    def _read_loop(self):
+        try:
+            while True:
+                message = json.loads(self._ws.recv())
+                if "id" in message:
+                    future = self._pending.get(message["id"])
+                    if future and not future.done():
+                        if "error" in message:
+                            future.set_exception(RuntimeError(message["error"].get("message", "CDP error")))
+                        else:
+                            future.set_result(message.get("result", {}))
+                elif message.get("method") in TARGET_EVENTS:
+                    self._apply(message["method"], message.get("params", {}), notify=self._ready.is_set())
+        except Exception:
+            pass  # Browser closed / connection dropped; owner restarts the watcher
+        finally:
+            for future in list(self._pending.values()):
+                if not future.done():
+                    future.set_exception(ConnectionError("DevTools connection closed"))
@@ -0,0 +1,156 @@
+"""
+SQLite Access Layer - pooled readers, one writer thread, WAL journaling
+Readers borrow a connection from a small pool (many threads can read at once
+under WAL). All writes go through a single writer thread that groups queued
+writes into one transaction, so spawn threads and API threads never contend
+for the write lock ("database is locked"). Statements are plain constant SQL
+strings, so each connection's statement cache keeps them prepared.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+POOL_SIZE = int(os.getenv("XAGENT_DB_POOL_SIZE", "4"))
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE = 256  # Prepared statements kept per connection
+MAX_WRITE_BATCH = 100  # Queued writes committed together
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(path: str) -> "Database":
+    """Shared Database for `path` (one pool and one writer per file per process)"""
+    path = os.path.abspath(path)
+    with _databases_lock:
+        if path not in _databases:
+            _databases[path] = Database(path)
+        return _databases[path]
+
+
+class Database:
+    """Thread-safe pooled access to one SQLite file"""
+
+    def __init__(self, path: str, pool_size: int = POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self._readers = queue.LifoQueue()
+        self._created = 0
+        self._create_lock = threading.Lock()
+        self._writes = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    # -- connections ------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL; fsync at checkpoints only
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Borrow a pooled connection for reads"""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._create_lock:
+                grow = self._created < self.pool_size
+                if grow:
+                    self._created += 1
+            conn = self._connect() if grow else self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def query(self, sql: str, params=()) -> list[dict]:
+        with self.reader() as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def query_one(self, sql: str, params=()) -> dict | None:
+        with self.reader() as conn:
+            row = conn.execute(sql, params).fetchone()
+        return dict(row) if row else None
+
+    # -- single writer ------------------------------------------------------------
+    def _ensure_writer(self):
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+                    self._writer.start()
+
+    def _writer_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._writes.get()]
+            while len(batch) < MAX_WRITE_BATCH:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            self._run_batch(conn, batch)
+
+    def _run_batch(self, conn, batch):
+        """One transaction per batch; each write gets a savepoint so a failure only undoes itself"""
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    results.append((future, fn(conn), None))
+                    conn.execute("RELEASE write")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def submit(self, fn) -> Future:
+        """Queue fn(conn) on the writer thread; the Future resolves after commit"""
+        self._ensure_writer()
+        future = Future()
+        self._writes.put((fn, future))
+        return future
+
+    def transaction(self, fn, wait: bool = True):
+        """Run fn(conn) inside the writer's transaction. Returns its result (or the Future if wait=False)."""
+        future = self.submit(fn)
+        return future.result() if wait else future
+
+    def execute(self, sql: str, params=(), wait: bool = True):
+        """Single write statement; returns the row count"""
+        return self.transaction(lambda conn: conn.execute(sql, params).rowcount, wait)
+
+    def executemany(self, sql: str, seq_of_params, wait: bool = True):
+        """Batched write (e.g. many upserts) in one transaction; returns the row count"""
+        rows = list(seq_of_params)
+        return self.transaction(lambda conn: conn.executemany(sql, rows).rowcount, wait)
+
+    def execute_script(self, sql: str):
+        """Schema DDL (several `;`-separated statements) applied atomically on the writer"""
+        def run(conn):
+            for statement in filter(str.strip, sql.split(";")):
+                conn.execute(statement)
+        return self.transaction(run)
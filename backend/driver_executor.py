@@ -0,0 +1,178 @@
+"""
+Driver Executor - one worker thread per browser runs every tab-bound WebDriver operation
+Selenium commands go to the "current" window, so callers never switch tabs
+themselves: they submit (handle, operation) work items. The worker switches
+only when the next item targets a different tab, verifies the switch before
+running it, and prefers queued items for the tab it is already on (up to
+max_batch in a row, so other tabs are not starved). Background work goes in a
+separate idle lane that is served only while no regular item is queued.
+"""
+import itertools
+import threading
+from concurrent.futures import Future
+
+MAX_TAB_BATCH = 8  # Consecutive items on one tab while other tabs wait
+
+
+class WrongTabError(RuntimeError):
+    """The driver did not end up on the requested tab"""
+
+
+class _WorkItem:
+    __slots__ = ("seq", "handle", "fn", "args", "kwargs", "future", "context")
+
+    def __init__(self, seq, handle, fn, args, kwargs, context):
+        self.seq = seq
+        self.handle = handle
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.context = context
+
+
+class DriverExecutor:
+    """Serializes WebDriver work for one browser, batched per tab
+
+    get_driver() returns the current WebDriver (it changes when the browser is
+    restarted). `lock` is held while an item runs, so code that still talks to
+    the driver directly under that lock never interleaves with an item.
+    context_factory() is called on the submitting thread and the returned
+    context manager factory is entered around the item on the worker thread
+    (job/trace propagation).
+    """
+
+    def __init__(self, get_driver, lock, name="driver-executor", max_batch=MAX_TAB_BATCH,
+                 context_factory=None):
+        self.get_driver = get_driver
+        self.lock = lock
+        self.name = name
+        self.max_batch = max_batch
+        self.context_factory = context_factory
+        self.current_handle = None  # Tab the driver is on, as far as this executor knows
+        self.last_switched = False  # Whether the running item needed a tab switch
+        self.switches = 0
+        self.executed = 0
+        self._items = []
+        self._idle_items = []  # Served only when _items is empty
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._driver = None
+        self._batch = 0
+        self._thread = None
+        self._stopped = False
+
+    # -- submitting -------------------------------------------------------------
+    def submit(self, handle, fn, *args, **kwargs) -> Future:
+        """Queue fn(driver, *args, **kwargs) to run on tab `handle` (None = whatever tab is current)"""
+        return self._enqueue(self._items, handle, fn, args, kwargs)
+
+    def submit_idle(self, handle, fn, *args, **kwargs) -> Future:
+        """Like submit(), but the item only runs when no regular item is waiting (background work)"""
+        return self._enqueue(self._idle_items, handle, fn, args, kwargs)
+
+    def _enqueue(self, lane, handle, fn, args, kwargs) -> Future:
+        context = self.context_factory() if self.context_factory else None
+        item = _WorkItem(next(self._seq), handle, fn, args, kwargs, context)
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError(f"{self.name} is stopped")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+                self._thread.start()
+            lane.append(item)
+            self._cond.notify()
+        return item.future
+
+    def run(self, handle, fn, *args, **kwargs):
+        """submit() and wait for the result (re-raises the operation's exception)"""
+        if threading.current_thread() is self._thread:
+            # Nested call from inside an item: already serialized, just make sure of the tab
+            return self._execute(_WorkItem(-1, handle, fn, args, kwargs, None))
+        return self.submit(handle, fn, *args, **kwargs).result()
+
+    def run_idle(self, handle, fn, *args, **kwargs):
+        """submit_idle() and wait for the result"""
+        return self.submit_idle(handle, fn, *args, **kwargs).result()
+
+    def pending(self) -> dict:
+        """{handle: queued item count} (idle lane not included)"""
+        with self._cond:
+            counts = {}
+            for item in self._items:
+                counts[item.handle] = counts.get(item.handle, 0) + 1
+            return counts
+
+    def forget_tab(self):
+        """The current tab was closed/changed outside the executor; verify on next use"""
+        self.current_handle = None
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    # -- worker -------------------------------------------------------------------
+    def _next_item(self):
+        """Oldest item for the current tab (within the batch limit), else the oldest item,
+        else the oldest idle-lane item"""
+        if not self._items:
+            return self._idle_items.pop(0)
+        if self.current_handle is not None and self._batch < self.max_batch:
+            for index, item in enumerate(self._items):
+                if item.handle == self.current_handle:
+                    return self._items.pop(index)
+        return self._items.pop(0)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._items and not self._idle_items and not self._stopped:
+                    self._cond.wait()
+                if self._stopped and not self._items and not self._idle_items:
+                    return
+                item = self._next_item()
+            if not item.future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = self._execute(item)
+            except BaseException as e:
+                item.future.set_exception(e)
+            else:
+                item.future.set_result(result)
+
+    def _execute(self, item):
+        with self.lock:
+            driver = self.get_driver()
+            if driver is None:
+                raise RuntimeError("Browser instance is down")
+            if driver is not self._driver:  # Browser restarted
+                self._driver = driver
+                self.current_handle = None
+
+            self.last_switched = False
+            if item.handle is not None and item.handle != self.current_handle:
+                self.current_handle = None
+                driver.switch_to.window(item.handle)
+                actual = driver.current_window_handle
+                if actual != item.handle:
+                    raise WrongTabError(f"Wanted tab {item.handle}, driver is on {actual}")
+                self.switches += 1
+                self.last_switched = True
+                self._batch = 0
+                self.current_handle = item.handle
+            self._batch += 1
+            self.executed += 1
+
+            try:
+                if item.context is not None:
+                    with item.context():
+                        return item.fn(driver, *item.args, **item.kwargs)
+                return item.fn(driver, *item.args, **item.kwargs)
+            finally:
+                if item.handle is None:
+                    # Untargeted work (spawn) may open/switch/close tabs: re-read where we are
+                    try:
+                        self.current_handle = driver.current_window_handle
+                    except Exception:
+                        self.current_handle = None
@@ -0,0 +1,110 @@
+"""
+Event Bus - Server-Sent Events fan-out for the frontend
+Publishers push (event, data) pairs; each /api/events connection gets its
+own bounded queue. Recent events are kept so reconnects can resume via
+Last-Event-ID.
+"""
+import json
+import queue
+import threading
+from collections import deque
+
+HEARTBEAT_SECONDS = 15  # Keeps proxies from closing idle streams
+
+
+class EventBus:
+    """Thread-safe publish/subscribe with per-subscriber bounded queues"""
+
+    def __init__(self, subscriber_queue_size: int = 256, replay_size: int = 256):
+        self.subscriber_queue_size = subscriber_queue_size
+        self._subscribers = set()
+        self._recent = deque(maxlen=replay_size)
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def publish(self, event: str, data) -> int:
+        """Send an event to every subscriber. Slow subscribers lose their oldest events."""
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            item = (event_id, event, data)
+            self._recent.append(item)
+            subscribers = list(self._subscribers)
+
+        for q in subscribers:
+            try:
+                q.put_nowait(item)
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    q.put_nowait(item)
+                except (queue.Empty, queue.Full):
+                    pass
+        return event_id
+
+    def subscribe(self, last_event_id: int = None) -> tuple[queue.Queue, int]:
+        """Register a subscriber; replays buffered events newer than last_event_id
+
+        Returns (queue, replayed): the first `replayed` items in the queue are
+        the replayed events, everything after them is live.
+        """
+        q = queue.Queue(maxsize=self.subscriber_queue_size)
+        replayed = 0
+        with self._lock:
+            if last_event_id is not None:
+                for item in self._recent:
+                    if item[0] > last_event_id:
+                        try:
+                            q.put_nowait(item)
+                        except queue.Full:
+                            break
+                        replayed += 1
+            self._subscribers.add(q)
+        return q, replayed
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def stream(self, q: queue.Queue, initial: list = None, replayed: int = 0):
+        """Generator of SSE-formatted text for one subscriber
+
+        Args:
+            q: queue returned by subscribe()
+            initial: optional [(event, data)] (e.g. current snapshots), sent after
+                the replayed events so a reconnect never ends on older state
+            replayed: replay count returned by subscribe()
+        """
+        try:
+            yield "retry: 3000\n\n"
+            for _ in range(replayed):
+                try:
+                    event_id, event, data = q.get_nowait()
+                except queue.Empty:
+                    break  # Dropped by a full queue
+                yield format_sse(event, data, event_id)
+            for event, data in initial or []:
+                yield format_sse(event, data)
+            while True:
+                try:
+                    event_id, event, data = q.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event, data, event_id)
+        finally:
+            self.unsubscribe(q)
+
+
+def format_sse(event: str, data, event_id: int = None) -> str:
+    """Encode one SSE message (data is JSON-encoded onto a single line)"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
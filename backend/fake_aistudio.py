@@ -0,0 +1,379 @@
+"""
+Fake AI Studio - local stand-in for aistudio.google.com
+Serves a single page that implements the DOM contract main.py drives (settings
+panel, model select, system instructions, Add > Upload Zip / Upload files,
+file tree, Monaco output.md, chat box with running/thinking indicators, Save
+app dialog) with configurable think times, so spawn and chat latency can be
+measured offline and reproducibly.
+
+Run:   python fake_aistudio.py --port 8800 --think 2.0
+Point: XAGENT_AISTUDIO_URL=http://127.0.0.1:8800 python main.py --api
+"""
+import argparse
+import io
+import json
+import random
+import threading
+import time
+import uuid
+import zipfile
+
+from flask import Flask, abort, jsonify, redirect, request
+
+DEFAULT_CONFIG = {
+    "think": 2.0,        # Seconds the "thinking" indicator is shown
+    "jitter": 0.0,       # +/- seconds added to think, uniformly
+    "write": 0.5,        # Seconds spent streaming the reply into output.md
+    "chunks": 5,         # Number of output.md updates while writing
+    "page_delay": 0.0,   # Server-side delay before serving an app page
+    "seed": None,        # Seed for jitter (reproducible runs)
+}
+
+MODELS = ["Gemini 3 Pro Preview", "Gemini 2.5 Pro", "Gemini 2.5 Flash"]
+
+PAGE_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+  body { font-family: sans-serif; margin: 0; display: flex; flex-direction: column; height: 100vh; }
+  header { display: flex; gap: 8px; padding: 8px; border-bottom: 1px solid #ccc; }
+  main { display: flex; flex: 1; min-height: 0; }
+  #chat { width: 40%; display: flex; flex-direction: column; border-right: 1px solid #ccc; }
+  #history { flex: 1; overflow: auto; padding: 8px; }
+  .input-container { display: flex; gap: 8px; padding: 8px; border-top: 1px solid #ccc; }
+  ms-autosize-textarea { flex: 1; display: block; }
+  ms-autosize-textarea textarea { width: 100%; min-height: 48px; }
+  #code { flex: 1; display: flex; min-width: 0; }
+  mat-tree { display: block; width: 180px; border-right: 1px solid #ccc; padding: 8px; }
+  mat-tree-node { display: block; cursor: pointer; padding: 2px 0; }
+  mat-tree-node.selected { font-weight: bold; }
+  .monaco-editor { flex: 1; overflow: auto; font-family: monospace; padding: 8px; white-space: pre; }
+  .overlay { position: fixed; background: #fff; border: 1px solid #888; padding: 12px;
+             box-shadow: 0 2px 8px rgba(0,0,0,.3); z-index: 10; }
+  .overlay[hidden] { display: none; }
+  #settings-panel { right: 8px; top: 48px; width: 320px; }
+  #model-options { right: 16px; top: 110px; z-index: 11; }
+  #si-dialog { left: 30%; top: 20%; width: 40%; z-index: 12; }
+  #si-dialog textarea { width: 100%; height: 200px; }
+  #add-menu { left: 8px; top: 48px; }
+  #save-dialog { left: 35%; top: 30%; z-index: 12; }
+  mat-select, mat-option { display: block; cursor: pointer; padding: 4px; border: 1px solid #ddd; }
+</style>
+</head>
+<body>
+<header>
+  <button id="add-button" aria-label="Add files"><span class="material-symbols-outlined">add</span></button>
+  <button id="settings-button" aria-label="Advanced settings">tune</button>
+  <button id="save-button" aria-label="Save app">Save</button>
+</header>
+<main>
+  <section id="chat">
+    <div id="history"></div>
+    <div class="input-container">
+      <ms-autosize-textarea><textarea placeholder="Type something or pick a suggestion"></textarea></ms-autosize-textarea>
+      <button class="send-button" aria-label="Run">Run</button>
+    </div>
+  </section>
+  <section id="code">
+    <mat-tree></mat-tree>
+    <div class="monaco-editor" data-uri=""><div class="view-lines monaco-mouse-cursor-text"></div></div>
+  </section>
+</main>
+
+<div id="settings-panel" class="overlay" hidden>
+  <label>Model</label>
+  <mat-select aria-label="Select the model for the code assistant" tabindex="0"><span class="value"></span></mat-select>
+  <p><button data-test-id="instructions-button">System instructions</button></p>
+</div>
+<div id="model-options" class="overlay" hidden></div>
+<div id="si-dialog" class="overlay" hidden>
+  <textarea id="custom-si-textarea"></textarea>
+  <button class="ms-button-primary">Save changes</button>
+</div>
+<div id="add-menu" class="overlay" hidden>
+  <button mat-menu-item data-kind="zip"><span>Upload Zip</span></button>
+  <button mat-menu-item data-kind="files"><span>Upload files</span></button>
+</div>
+<mat-dialog-container id="save-dialog" class="overlay" hidden>
+  <input id="name-input" type="text">
+  <mat-dialog-actions><button class="ms-button-primary">Save</button></mat-dialog-actions>
+</mat-dialog-container>
+
+<script>
+const BOOT = __BOOT__;
+const app = BOOT.app || {id: null, name: null, model: BOOT.models[0], system_instructions: "", files: {}};
+let selected = null, turn = 0, busy = null;
+const $ = (sel) => document.querySelector(sel);
+
+// Monaco stand-in: main.py reads output.md through monaco.editor.getModels()
+window.monaco = {editor: {getModels: () => Object.keys(app.files).map(name => ({
+  uri: {path: "/" + name, toString: () => "file:///" + name},
+  getValue: () => app.files[name]
+}))}};
+
+function renderTree() {
+  const tree = $("mat-tree");
+  tree.innerHTML = "";
+  for (const name of Object.keys(app.files).sort()) {
+    const node = document.createElement("mat-tree-node");
+    node.innerHTML = '<span class="node-name"></span>';
+    node.firstChild.textContent = name;
+    node.classList.toggle("selected", name === selected);
+    node.addEventListener("click", () => { selected = name; renderTree(); renderEditor(); });
+    tree.appendChild(node);
+  }
+}
+
+function renderEditor() {
+  const editor = $(".monaco-editor"), lines = editor.firstElementChild;
+  editor.setAttribute("data-uri", selected ? "file:///" + selected : "");
+  lines.innerHTML = "";
+  for (const text of (selected ? app.files[selected] : "").split("\\n")) {
+    const line = document.createElement("div");
+    line.className = "view-line";
+    line.innerHTML = '<span class="mtk1"></span>';
+    line.firstChild.textContent = text;
+    lines.appendChild(line);
+  }
+}
+
+function setFile(name, content) {
+  app.files[name] = content;
+  renderTree();
+  if (name === selected) renderEditor();
+}
+
+// Overlays close on Escape, newest first
+const stack = [];
+function openOverlay(id) { const el = $(id); el.hidden = false; stack.push(el); }
+function closeOverlay(el) { el.hidden = true; stack.splice(stack.indexOf(el), 1); }
+document.addEventListener("keydown", (e) => {
+  if (e.key === "Escape" && stack.length) closeOverlay(stack[stack.length - 1]);
+});
+
+$("#settings-button").addEventListener("click", () => openOverlay("#settings-panel"));
+$("mat-select .value").textContent = app.model;
+$("mat-select").addEventListener("click", () => {
+  const list = $("#model-options");
+  list.innerHTML = "";
+  for (const model of BOOT.models) {
+    const opt = document.createElement("mat-option");
+    opt.textContent = model;
+    opt.addEventListener("click", () => {
+      app.model = model;
+      $("mat-select .value").textContent = model;
+      closeOverlay(list);
+    });
+    list.appendChild(opt);
+  }
+  openOverlay("#model-options");
+});
+$("[data-test-id='instructions-button']").addEventListener("click", () => {
+  $("#custom-si-textarea").value = app.system_instructions;
+  openOverlay("#si-dialog");
+});
+$("#si-dialog .ms-button-primary").addEventListener("click", () => {
+  app.system_instructions = $("#custom-si-textarea").value;
+});
+
+// Add > Upload Zip / Upload files go through a detached <input type=file>
+$("#add-button").addEventListener("click", () => openOverlay("#add-menu"));
+for (const item of document.querySelectorAll("#add-menu button")) {
+  item.addEventListener("click", () => {
+    closeOverlay($("#add-menu"));
+    const input = document.createElement("input");
+    input.type = "file";
+    input.multiple = item.dataset.kind === "files";
+    if (item.dataset.kind === "zip") input.accept = ".zip";
+    input.addEventListener("change", () => upload(item.dataset.kind, input.files));
+    input.click();
+  });
+}
+
+async function upload(kind, files) {
+  for (const file of files) {
+    if (kind === "zip") {
+      const form = new FormData();
+      form.append("file", file);
+      const res = await fetch("/fake/api/unzip", {method: "POST", body: form});
+      const body = await res.json();
+      for (const [name, content] of Object.entries(body.files)) setFile(name, content);
+    } else {
+      setFile(file.name, await file.text());
+    }
+  }
+}
+
+// Save app: persists server-side so the drive URL can be reactivated later
+$("#save-button").addEventListener("click", () => {
+  $("#name-input").value = app.name || "";
+  openOverlay("#save-dialog");
+});
+$("#save-dialog .ms-button-primary").addEventListener("click", async () => {
+  app.name = $("#name-input").value;
+  closeOverlay($("#save-dialog"));
+  await persist();
+  history.replaceState(null, "", "/apps/drive/" + app.id + "?showAssistant=true&showCode=true");
+  document.title = app.name + " | Google AI Studio";
+});
+
+async function persist() {
+  const res = await fetch(app.id ? "/fake/api/apps/" + app.id : "/fake/api/apps", {
+    method: app.id ? "PUT" : "POST",
+    headers: {"Content-Type": "application/json"},
+    body: JSON.stringify(app)
+  });
+  Object.assign(app, await res.json());
+}
+
+// Chat: running/thinking/cancel indicators during "think", then output.md is
+// written in chunks and a Checkpoint marker is appended
+const sendBtn = $("button.send-button"), history_ = $("#history");
+function setBusy(on) {
+  sendBtn.classList.toggle("running", on);
+  sendBtn.setAttribute("aria-label", on ? "Cancel" : "Run");
+  if (on) history_.appendChild(document.createElement("ms-thinking-indicator"));
+  else document.querySelectorAll("ms-thinking-indicator").forEach(el => el.remove());
+}
+
+function addTurn(text) {
+  const div = document.createElement("div");
+  div.className = "turn";
+  div.textContent = text;
+  history_.appendChild(div);
+}
+
+sendBtn.addEventListener("click", async () => {
+  if (busy) { clearTimeout(busy); busy = null; setBusy(false); return; }
+  const box = $("ms-autosize-textarea textarea"), message = box.value;
+  if (!message.trim()) return;
+  box.value = "";
+  turn += 1;
+  addTurn(message);
+  setBusy(true);
+  const res = await fetch("/fake/api/reply", {
+    method: "POST", headers: {"Content-Type": "application/json"},
+    body: JSON.stringify({message: message, turn: turn})
+  });
+  const plan = await res.json();
+  busy = setTimeout(() => writeReply(plan), plan.think * 1000);
+});
+
+function writeReply(plan) {
+  const chunks = Math.max(1, plan.chunks), step = plan.write * 1000 / chunks;
+  let i = 0;
+  const tick = () => {
+    i += 1;
+    setFile("output.md", plan.output.slice(0, Math.ceil(plan.output.length * i / chunks)));
+    if (i < chunks) { busy = setTimeout(tick, step); return; }
+    busy = null;
+    setBusy(false);
+    const marker = document.createElement("div");
+    marker.textContent = "Checkpoint " + turn;
+    history_.appendChild(marker);
+    if (app.id) persist();
+  };
+  tick();
+}
+
+renderTree();
+</script>
+</body>
+</html>
+"""
+
+
+def create_app(config: dict = None) -> Flask:
+    """Build the fake AI Studio Flask app. config overrides DEFAULT_CONFIG."""
+    app = Flask(__name__)
+    app.config["FAKE"] = dict(DEFAULT_CONFIG, **(config or {}))
+    apps = {}  # {app_id: saved app dict}
+    lock = threading.Lock()
+    rng = random.Random(app.config["FAKE"]["seed"])
+
+    def render(saved):
+        delay = app.config["FAKE"]["page_delay"]
+        if delay:
+            time.sleep(delay)
+        title = f"{saved['name']} | Google AI Studio" if saved else "Google AI Studio"
+        boot = json.dumps({"app": saved, "models": MODELS}).replace("</", "<\\/")
+        return PAGE_HTML.replace("__TITLE__", title).replace("__BOOT__", boot)
+
+    @app.route("/")
+    def index():
+        return redirect("/apps/bundled/blank?showAssistant=true&showCode=true")
+
+    @app.route("/apps/bundled/<name>")
+    def new_app(name):
+        return render(None)
+
+    @app.route("/apps/drive/<app_id>")
+    def saved_app(app_id):
+        with lock:
+            saved = apps.get(app_id)
+        if not saved:
+            abort(404)
+        return render(saved)
+
+    @app.route("/fake/api/apps", methods=["POST"])
+    @app.route("/fake/api/apps/<app_id>", methods=["PUT"])
+    def save(app_id=None):
+        data = request.get_json(force=True)
+        data["id"] = app_id or uuid.uuid4().hex[:16]
+        with lock:
+            apps[data["id"]] = data
+        return jsonify({"id": data["id"]})
+
+    @app.route("/fake/api/unzip", methods=["POST"])
+    def unzip():
+        upload = request.files["file"]
+        files = {}
+        with zipfile.ZipFile(io.BytesIO(upload.read())) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    files[info.filename.split("/")[-1]] = zf.read(info).decode("utf-8", "replace")
+        return jsonify({"files": files})
+
+    @app.route("/fake/api/reply", methods=["POST"])
+    def reply():
+        data = request.get_json(force=True)
+        cfg = app.config["FAKE"]
+        think = max(0.0, cfg["think"] + rng.uniform(-cfg["jitter"], cfg["jitter"]))
+        message = data.get("message", "")
+        status = "READY" if "STATUS: READY" in message else "COMPLETE"
+        output = (f"STATUS: {status}\nTASK_ID: turn-{data.get('turn', 0)}\n"
+                  f"RESULT: received {len(message)} chars: {message[:80]}")
+        return jsonify({"think": think, "write": cfg["write"], "chunks": cfg["chunks"], "output": output})
+
+    @app.route("/fake/api/config", methods=["GET", "POST"])
+    def fake_config():
+        """Read or change think times at runtime (benchmarks sweep them)"""
+        if request.method == "POST":
+            updates = {k: v for k, v in (request.get_json(force=True) or {}).items() if k in DEFAULT_CONFIG}
+            app.config["FAKE"].update(updates)
+        return jsonify(app.config["FAKE"])
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for aistudio.google.com")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--think", type=float, default=DEFAULT_CONFIG["think"], help="seconds of 'thinking' per reply")
+    parser.add_argument("--jitter", type=float, default=DEFAULT_CONFIG["jitter"], help="+/- seconds added to --think")
+    parser.add_argument("--write", type=float, default=DEFAULT_CONFIG["write"], help="seconds spent writing output.md")
+    parser.add_argument("--chunks", type=int, default=DEFAULT_CONFIG["chunks"], help="output.md updates per reply")
+    parser.add_argument("--page-delay", type=float, default=DEFAULT_CONFIG["page_delay"], help="seconds before serving a page")
+    parser.add_argument("--seed", type=int, default=None, help="seed for --jitter")
+    args = parser.parse_args()
+
+    config = {k: getattr(args, k) for k in DEFAULT_CONFIG}
+    print(f"Fake AI Studio on http://{args.host}:{args.port} {config}")
+    create_app(config).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Job Manager - background execution for long-running API work (spawn, chat)
+POST endpoints return a job_id immediately; GET /api/jobs/<id> reports state,
+per-phase timings and the result. A bounded worker pool runs the jobs.
+Jobs can also be created first and started later (spawn queue), and a job that
+has not started yet can be cancelled.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+JOB_STATES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+
+_current = threading.local()  # Job being run by this worker thread
+
+
+class Job:
+    """One unit of background work and its bookkeeping"""
+
+    def __init__(self, kind: str, params: dict = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params or {}
+        self.state = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.phases = []  # [{"name", "started_at", "duration"}]
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+        self._on_change = None  # Set by JobManager to notify listeners
+
+    def _changed(self):
+        if self._on_change:
+            self._on_change(self)
+
+    def start_phase(self, name: str):
+        """Close the running phase (if any) and start `name`"""
+        now = time.time()
+        self._close_phase(now)
+        self.phases.append({"name": name, "started_at": now, "duration": None})
+        self._changed()
+
+    def _close_phase(self, now: float):
+        if self.phases and self.phases[-1]["duration"] is None:
+            self.phases[-1]["duration"] = round(now - self.phases[-1]["started_at"], 3)
+
+    def set_progress(self, key: str, value):
+        self.progress[key] = value
+        self._changed()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "state": self.state,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_time": round((self.started_at or end) - self.created_at, 3),
+            "run_time": round(end - self.started_at, 3) if self.started_at else None,
+            "phases": [dict(p) for p in self.phases],
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class JobManager:
+    """Bounded worker pool plus a capped in-memory job history"""
+
+    def __init__(self, max_workers: int = 4, history: int = 500):
+        self.max_workers = max_workers
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def add_listener(self, fn):
+        """fn(job) is called on every state, phase and progress change"""
+        self._listeners.append(fn)
+
+    def _notify(self, job: Job):
+        for fn in self._listeners:
+            try:
+                fn(job)
+            except Exception as e:
+                print(f"[JobManager] Listener error: {e}")
+
+    def submit(self, kind: str, fn, *args, params: dict = None, **kwargs) -> Job:
+        """Queue fn(*args, **kwargs); its return value becomes job.result"""
+        job = self.create(kind, params)
+        self.start(job, fn, *args, **kwargs)
+        return job
+
+    def create(self, kind: str, params: dict = None) -> Job:
+        """Register a queued job without running it yet (see start())"""
+        job = Job(kind, params)
+        job._on_change = self._notify
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+        job._changed()
+        return job
+
+    def start(self, job: Job, fn, *args, **kwargs):
+        """Hand a created job to the worker pool"""
+        self._executor.submit(self._run, job, fn, args, kwargs)
+
+    def cancel(self, job: Job, reason: str = "Cancelled") -> bool:
+        """Cancel a job that has not started running. Returns False if it already has."""
+        return self._end_queued(job, "cancelled", reason)
+
+    def fail(self, job: Job, error: str) -> bool:
+        """Fail a job that never got to run (e.g. it could not be started)"""
+        return self._end_queued(job, "failed", error)
+
+    def _end_queued(self, job: Job, state: str, error: str) -> bool:
+        with self._lock:
+            if job.state != "queued":
+                return False
+            job.state = state
+        job.error = error
+        job.finished_at = time.time()
+        job._done.set()
+        job._changed()
+        return True
+
+    def _run(self, job: Job, fn, args, kwargs):
+        with self._lock:
+            if job.state != "queued":  # Cancelled before a worker picked it up
+                return
+            job.state = "running"
+        _current.job = job
+        job.started_at = time.time()
+        job._changed()
+        try:
+            job.result = fn(*args, **kwargs)
+            job.state = "succeeded"
+        except Exception as e:
+            job.error = str(e)
+            job.state = "failed"
+        finally:
+            job.finished_at = time.time()
+            job._close_phase(job.finished_at)
+            _current.job = None
+            job._done.set()
+            job._changed()
+
+    def _evict(self):
+        """Drop the oldest finished jobs once history is full"""
+        if len(self._jobs) <= self.history:
+            return
+        for job_id in [jid for jid, j in self._jobs.items() if j.finished]:
+            del self._jobs[job_id]
+            if len(self._jobs) <= self.history:
+                break
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, kind: str = None, state: str = None) -> list[Job]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [j for j in jobs
+                if (kind is None or j.kind == kind) and (state is None or j.state == state)]
+
+    def queue_depth(self) -> int:
+        return sum(1 for j in self.list(state="queued"))
+
+
+def current_job() -> Job | None:
+    """Job being executed by the calling thread, if any"""
+    return getattr(_current, "job", None)
+
+
+@contextmanager
+def bind(job: Job | None):
+    """Run the with-block as part of `job` on this thread (work handed to another thread)"""
+    previous = current_job()
+    _current.job = job
+    try:
+        yield
+    finally:
+        _current.job = previous
+
+
+def phase(name: str):
+    """Mark the start of a named phase in the current job (no-op outside a job)"""
+    job = current_job()
+    if job:
+        job.start_phase(name)
+
+
+def progress(key: str, value):
+    """Record a progress entry on the current job (no-op outside a job)"""
+    job = current_job()
+    if job:
+        job.set_progress(key, value)
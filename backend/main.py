@@ -1,72 +1,285 @@
 import time
 import os
 import json
+import hashlib
+import glob
+import io
 import shutil
 import threading
+import queue
 import zipfile
-from flask import Flask, jsonify, request
+from collections import namedtuple
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import events
+import jobs
+import cdp_targets
+import driver_executor
+import metrics
+import skills
+import spawn_scheduler
+import tracing
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support.ui import WebDriverWait as SeleniumWebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, InvalidSessionIdException
+from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
 
-try:
-    import pyautogui
-    pyautogui.FAILSAFE = False
-    pyautogui.PAUSE = 0.1
-except ImportError:
-    print("Run: pip install pyautogui")
-    pyautogui = None
+load_dotenv()
 
-try:
-    import pyperclip
-except ImportError:
-    print("Run: pip install pyperclip")
-    pyperclip = None
+# P21: AI Studio origin - point at fake_aistudio.py for offline benchmarking
+AISTUDIO_BASE_URL = os.getenv("XAGENT_AISTUDIO_URL", "https://aistudio.google.com").rstrip("/")
+AISTUDIO_HOST = urlparse(AISTUDIO_BASE_URL).netloc
+NEW_APP_URL = f"{AISTUDIO_BASE_URL}/apps/bundled/blank?showAssistant=true&showCode=true"
 
-load_dotenv()
+# P20: Headless mode - no desktop needed; pyautogui/pyperclip are never touched
+HEADLESS = os.getenv("XAGENT_HEADLESS", "0").lower() in ("1", "true", "yes")
+
+pyautogui = None
+pyperclip = None
+if not HEADLESS:
+    try:
+        import pyautogui
+        pyautogui.FAILSAFE = False
+        pyautogui.PAUSE = 0.1
+    except Exception:  # ImportError, or no display to attach to
+        print("Run: pip install pyautogui")
+        pyautogui = None
+
+    try:
+        import pyperclip
+    except ImportError:
+        print("Run: pip install pyperclip")
+        pyperclip = None
 
 # Globals
 stop_tab_monitor = False
 pause_tab_monitor = False
 driver_ref = None
 target_tab_handle = None
-agent_handles = {}  # {agent_id: window_handle} - track each agent's tab
-spawn_lock = threading.Lock()  # P8: Prevent parallel spawns (race condition with agent_handles)
+agent_handles = {}  # {agent_id: AgentTab(instance, handle)} - track each agent's tab
+agent_handles_lock = threading.RLock()  # P13: Guards agent_handles across instance threads
+
+# P13: An agent's tab lives in one pool instance (see DriverPool below)
+AgentTab = namedtuple("AgentTab", ["instance", "handle"])
 
 # =============================================================================
 # P12: Browser Initialization Function
 # - Required by ensure_browser() for browser recovery
 # =============================================================================
-def init_driver():
-    """Initialize Chrome WebDriver with undetected-chromedriver"""
+BASE_PROFILE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "chrome_profile"))
+POOL_PROFILES_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "chrome_profile_pool"))
+
+def init_driver(profile_path=None):
+    """Initialize Chrome WebDriver with undetected-chromedriver
+    
+    Args:
+        profile_path: Chrome user-data-dir. Defaults to the shared chrome_profile;
+                      pool instances pass their own copy (see prepare_profile_copy)
+    """
     extension_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "extension"))
-    profile_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "chrome_profile"))
+    profile_path = profile_path or BASE_PROFILE_PATH
     
     options = uc.ChromeOptions()
     options.add_argument(f"--load-extension={extension_path}")
     options.add_argument(f"--user-data-dir={profile_path}")
     options.add_argument("--no-first-run")
     options.add_argument("--no-default-browser-check")
+    if HEADLESS:
+        # P20: uc adds --headless=new (and hides "HeadlessChrome" from the UA)
+        options.add_argument("--window-size=1920,1080")
     
-    print("[init_driver] Launching Chrome...")
-    driver = uc.Chrome(options=options)
+    print(f"[init_driver] Launching Chrome{' (headless)' if HEADLESS else ''}...")
+    driver = uc.Chrome(options=options, headless=HEADLESS)
     print("[init_driver] Chrome launched successfully")
     
     return driver
 
+# =============================================================================
+# P13: Driver Pool
+# - N independent uc.Chrome processes (XAGENT_DRIVER_POOL_SIZE, default 1)
+# - Instance 0 uses chrome_profile; others get a copy in chrome_profile_pool/<n>
+# - Each instance has its own lock, so work on different instances runs in parallel
+# - P33: Each instance's tab work runs on its DriverExecutor thread (batched per tab)
+# - Agents are assigned to the least-loaded instance at spawn time
+# =============================================================================
+DRIVER_POOL_SIZE = max(1, int(os.getenv("XAGENT_DRIVER_POOL_SIZE", "1")))
+
+# Chrome refuses to start on a profile that still has these lock files
+PROFILE_COPY_IGNORE = shutil.ignore_patterns(
+    "Singleton*", "lockfile", "*.lock", "LOCK", "Crashpad", "*.tmp"
+)
+
+
+def prepare_profile_copy(index):
+    """Return the user-data-dir for pool instance `index`, copying the base profile once"""
+    if index == 0:
+        return BASE_PROFILE_PATH
+    
+    profile_path = os.path.join(POOL_PROFILES_PATH, str(index))
+    if not os.path.exists(profile_path):
+        if os.path.exists(BASE_PROFILE_PATH):
+            print(f"[P13] Copying chrome_profile for instance {index}...")
+            shutil.copytree(BASE_PROFILE_PATH, profile_path, ignore=PROFILE_COPY_IGNORE)
+        else:
+            os.makedirs(profile_path, exist_ok=True)
+    return profile_path
+
+
+@contextmanager
+def work_scope(job, stack):
+    with jobs.bind(job), tracing.tracer.attach(stack):
+        yield
+
+
+def work_context():
+    """P33: Carry the submitting thread's job and open trace over to the executor thread"""
+    job, stack = jobs.current_job(), tracing.tracer.context()
+    if job is None and not stack:
+        return None
+    return lambda: work_scope(job, stack)
+
+
+class DriverInstance:
+    """One Chrome process in the pool. Hold `lock` for any WebDriver command.
+    
+    P33: Tab-bound work goes through `executor` (one worker thread per
+    instance) instead of switching tabs from the calling thread.
+    """
+    
+    def __init__(self, index, profile_path, driver=None):
+        self.index = index
+        self.profile_path = profile_path
+        self.driver = driver
+        self.lock = threading.RLock()  # Selenium commands go to the "current" tab
+        self.reserved = 0  # Spawns assigned to this instance but not yet finished
+        self.targets = None  # P31: cdp_targets.TargetWatcher for the current driver
+        self.targets_retry_at = 0
+        self.executor = driver_executor.DriverExecutor(
+            lambda: self.driver, self.lock, name=f"driver-{index}", context_factory=work_context)
+    
+    def agent_ids(self):
+        """Agents whose tabs live in this instance"""
+        with agent_handles_lock:
+            return [aid for aid, tab in agent_handles.items() if tab.instance is self]
+    
+    def load(self):
+        return len(self.agent_ids()) + self.reserved
+    
+    def is_alive(self):
+        if self.driver is None:
+            return False
+        try:
+            _ = self.driver.window_handles
+            return True
+        except Exception:
+            return False
+    
+    def __repr__(self):
+        return f"<DriverInstance {self.index}>"
+
+
+class DriverPool:
+    """Fixed set of DriverInstances; assigns agents by load"""
+    
+    def __init__(self, size=DRIVER_POOL_SIZE):
+        self.size = size
+        self.instances = []
+        self._lock = threading.Lock()
+    
+    @property
+    def primary(self):
+        return self.instances[0] if self.instances else None
+    
+    def adopt(self, driver):
+        """Register an already-launched driver as instance 0"""
+        with self._lock:
+            if self.instances:
+                self.instances[0].driver = driver
+            else:
+                self.instances.append(DriverInstance(0, BASE_PROFILE_PATH, driver))
+            return self.instances[0]
+    
+    def launch_extra(self, warmup_url):
+        """Launch instances 1..size-1 (sequentially - uc patches chromedriver on launch)"""
+        for index in range(len(self.instances), self.size):
+            profile_path = prepare_profile_copy(index)
+            instance = DriverInstance(index, profile_path)
+            try:
+                instance.driver = init_driver(profile_path)
+                instance.driver.get(warmup_url)
+                logger.info("CHROME", f"Pool instance {index} ready", {"profile": profile_path})
+            except Exception as e:
+                logger.error("CHROME", f"Pool instance {index} failed to launch", {"error": str(e)})
+            with self._lock:
+                self.instances.append(instance)
+    
+    def instance_of(self, driver):
+        for instance in self.instances:
+            if instance.driver is driver:
+                return instance
+        return None
+    
+    def assign(self, agent_id, accept=None):
+        """Pick the instance for a spawn and reserve a slot on it
+        
+        An agent that already has a tab stays on its instance.
+        accept(instance) -> False rules an instance out (P35: no free spawn slot);
+        returns None if no instance qualifies.
+        Call release() when the spawn finishes.
+        """
+        with self._lock:
+            with agent_handles_lock:
+                tab = agent_handles.get(agent_id)
+            if tab:
+                instance = tab.instance
+                if accept and not accept(instance):
+                    return None
+            else:
+                candidates = [i for i in self.instances if i.driver is not None] or self.instances
+                if accept:
+                    candidates = [i for i in candidates if accept(i)]
+                if not candidates:
+                    return None
+                instance = min(candidates, key=lambda i: (i.load(), i.index))
+            instance.reserved += 1
+            return instance
+    
+    def release(self, instance):
+        with self._lock:
+            instance.reserved = max(0, instance.reserved - 1)
+    
+    def describe(self):
+        return [{
+            "index": i.index,
+            "alive": i.driver is not None,
+            "agents": i.agent_ids(),
+            "reserved": i.reserved,
+            "warm_tabs": warm_tab_pool.count(i),  # P34
+            "executor": {  # P33
+                "queued": sum(i.executor.pending().values()),
+                "executed": i.executor.executed,
+                "switches": i.executor.switches
+            }
+        } for i in self.instances]
+
+
+driver_pool = DriverPool()
+
+
 # =============================================================================
 # P12: Browser Health Check and Recovery
 # - is_browser_alive(): Check if browser is still running
 # - ensure_browser(): Restart browser if dead, clear stale handles
+# - P13: ensure_instance() does the same per pool instance
 # =============================================================================
 def is_browser_alive():
     """Check if browser is still running"""
-    global driver_ref
-    
     if driver_ref is None:
         return False
     
@@ -77,68 +290,262 @@ def is_browser_alive():
     except Exception:
         return False
 
-def ensure_browser():
-    """Ensure browser is running, start if needed. Returns driver or None."""
-    global driver_ref, agent_handles
-    
-    if is_browser_alive():
-        return driver_ref
-    
-    print("[P12] Browser not running, attempting recovery...")
+def drop_instance_handles(instance):
+    """Forget every agent tab that lived in `instance` (its browser is gone)"""
+    with agent_handles_lock:
+        lost = [aid for aid, tab in agent_handles.items() if tab.instance is instance]
+        for aid in lost:
+            del agent_handles[aid]
+    db_set_status_many(lost, "inactive")  # One transaction for the whole instance
+    notify_agents_changed()
+
+def ensure_instance(instance):
+    """Ensure a pool instance's browser is running, restart if needed. Returns driver or None."""
+    global driver_ref
     
-    # Clean up stale references
-    driver_ref = None
-    agent_handles.clear()  # All handles are invalid now
+    if instance.is_alive():
+        return instance.driver
     
-    try:
-        # Start new browser
-        driver_ref = init_driver()
+    # One recovery per instance: concurrent callers (several spawn slots, chats) wait
+    # here and then find the relaunched browser instead of starting a second Chrome
+    # on the same profile. Holding the lock also keeps executor items off the dead driver.
+    with instance.lock:
+        if instance.is_alive():
+            return instance.driver
         
-        # Warm up with AI Studio
-        driver_ref.get("https://aistudio.google.com")
-        time.sleep(3)
+        print(f"[P12] Browser instance {instance.index} not running, attempting recovery...")
         
-        print("[P12] Browser recovered successfully")
+        # Clean up stale references
+        instance.driver = None
+        drop_instance_handles(instance)  # All handles are invalid now
+        if instance.index == 0:
+            driver_ref = None
+        
+        try:
+            # Start new browser
+            instance.driver = init_driver(instance.profile_path)
+        
+            # Warm up with AI Studio
+            instance.driver.get(AISTUDIO_BASE_URL)
+            time.sleep(3)
+        
+            if instance.index == 0:
+                driver_ref = instance.driver
+            print(f"[P12] Browser instance {instance.index} recovered successfully")
+            notify_status()
+            return instance.driver
+        except Exception as e:
+            print(f"[P12] Failed to recover browser instance {instance.index}: {e}")
+            notify_status()
+            return None
+
+def ensure_browser():
+    """Ensure browser is running, start if needed. Returns driver or None."""
+    if is_browser_alive():
         return driver_ref
-    except Exception as e:
-        print(f"[P12] Failed to recover browser: {e}")
-        return None
+    
+    instance = driver_pool.primary or driver_pool.adopt(None)
+    return ensure_instance(instance)
 
 SKILLS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".agent", "skills"))
+skill_index = skills.SkillIndex(SKILLS_PATH)  # P28: parsed once, re-read on mtime change
 
 
 # =============================================================================
 # P1 Phase 2: Dual Logging System
 # - File (logs/xapply.log): DEBUG level, JSON format, everything
 # - Terminal: INFO level, important flow steps only
+# P24: Buffered writer
+# - log() only filters and enqueues; a background thread formats, prints and
+#   appends in batches to a file it keeps open
+# - Bounded queue: when full, entries are dropped (and counted) instead of
+#   blocking the Selenium hot path
+# - Size/time rotation to xapply.log.1 .. .N, optionally gzipped
+# - Per-category file levels: XAGENT_LOG_LEVELS="TAB=INFO,CHROME=WARNING"
+# P25: Debug tracing
+# - logger.trace(category, msg, *args) replaces the unconditional [DEBUG]
+#   prints; off by default, enabled per category via XAGENT_DEBUG or
+#   POST /api/debug at runtime
+# - Formatting is deferred: %-args are only applied, and callable messages
+#   (e.g. ones that read driver.current_url) only called, when enabled
 # =============================================================================
 import sys
 import platform
-from datetime import datetime
+import atexit
+import gzip
 
 class Logger:
-    """Dual-output logger: JSON file (DEBUG) + Terminal (INFO)"""
+    """Dual-output logger: JSON file (DEBUG) + Terminal (INFO), written by a background thread"""
     
     LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
     
     def __init__(self, log_dir="logs", log_file="xapply.log"):
         self.log_dir = os.path.join(os.path.dirname(__file__), log_dir)
         self.log_path = os.path.join(self.log_dir, log_file)
+        self.file_level = self.LEVELS.get(os.getenv("XAGENT_LOG_LEVEL", "DEBUG").upper(), 10)
+        self.terminal_level = self.LEVELS["INFO"]
+        self.category_levels = self._parse_levels(os.getenv("XAGENT_LOG_LEVELS", ""))
+        self.debug_categories = {c.strip().upper() for c in os.getenv("XAGENT_DEBUG", "").split(",") if c.strip()}
+        self.max_bytes = int(os.getenv("XAGENT_LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # 0 = no size rotation
+        self.rotate_seconds = float(os.getenv("XAGENT_LOG_ROTATE_HOURS", "0")) * 3600  # 0 = no time rotation
+        self.backups = int(os.getenv("XAGENT_LOG_BACKUPS", "5"))
+        self.compress = os.getenv("XAGENT_LOG_GZIP", "1") == "1"
+        self.flush_interval = float(os.getenv("XAGENT_LOG_FLUSH_MS", "200")) / 1000
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=int(os.getenv("XAGENT_LOG_QUEUE", "10000")))
+        self._file = None
+        self._opened_at = 0
         self._ensure_log_dir()
+        self._writer = threading.Thread(target=self._writer_loop, name="log-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
         self._log_startup()
     
+    def _parse_levels(self, spec: str) -> dict:
+        """"TAB=INFO,CHROME=WARNING" -> {"TAB": 20, "CHROME": 30}"""
+        levels = {}
+        for part in spec.split(","):
+            if "=" in part:
+                category, level = part.split("=", 1)
+                if level.strip().upper() in self.LEVELS:
+                    levels[category.strip().upper()] = self.LEVELS[level.strip().upper()]
+        return levels
+    
+    def set_level(self, category: str, level: str):
+        """Change the file level for one category at runtime (level None resets it)"""
+        if level is None:
+            self.category_levels.pop(category.upper(), None)
+        else:
+            self.category_levels[category.upper()] = self.LEVELS[level.upper()]
+    
     def _ensure_log_dir(self):
         """Create logs/ directory if it doesn't exist"""
         os.makedirs(self.log_dir, exist_ok=True)
     
-    def _write_file(self, entry: dict):
-        """Append JSON entry to log file"""
+    # -- writer thread ---------------------------------------------------------
+    def _writer_loop(self):
+        stopping = False
+        while not stopping:
+            items = [self._queue.get()]
+            self._print(items[-1])
+            deadline = time.time() + self.flush_interval
+            # Terminal lines go out as they arrive; file lines are written once per interval
+            while items[-1] is not None and len(items) < 1000:
+                try:
+                    items.append(self._queue.get(timeout=max(0, deadline - time.time())))
+                except queue.Empty:
+                    break
+                self._print(items[-1])
+            stopping = items[-1] is None  # close() marker
+            self._write_batch([item for item in items if item is not None])
+            for _ in items:
+                self._queue.task_done()
+        self._close_file()
+    
+    def _print(self, item):
+        if item is not None and item[2]:
+            print(f"[{item[0]['category']}] {item[0]['message']}")
+    
+    def _write_batch(self, batch: list):
+        lines = []
+        for entry, to_file, _ in batch:
+            if to_file:
+                entry["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(entry["timestamp"]))
+                try:
+                    lines.append(json.dumps(entry, default=str))
+                except Exception as e:
+                    lines.append(json.dumps({"timestamp": entry["timestamp"], "level": "ERROR",
+                                             "category": "LOGGER", "message": f"Unserializable entry: {e}"}))
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            lines.append(json.dumps({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                                     "level": "WARNING", "category": "LOGGER",
+                                     "message": "Log queue full, entries dropped", "data": {"dropped": dropped}}))
+        if lines:
+            self._write_file(lines)
+    
+    def _write_file(self, lines: list):
+        """Append lines to the open log file, rotating whenever the next line would pass the cap"""
         try:
-            with open(self.log_path, "a", encoding="utf-8") as f:
-                f.write(json.dumps(entry) + "\n")
+            if self._file is None:
+                self._open_file()
+            chunk, size = [], self._file.tell()
+            for line in lines:
+                line += "\n"  # json.dumps output is ASCII: len() is the byte count
+                if size and self._rotation_due(size + len(line)):
+                    if chunk:
+                        self._file.write("".join(chunk))
+                        chunk = []
+                    self._rotate()
+                    size = 0
+                chunk.append(line)
+                size += len(line)
+            self._file.write("".join(chunk))
+            self._file.flush()
         except Exception as e:
             print(f"[Logger] File write error: {e}")
+            self._close_file()
     
+    def _open_file(self):
+        self._file = open(self.log_path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+    
+    def _close_file(self):
+        if self._file:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+    
+    def _rotation_due(self, size: int) -> bool:
+        """size: segment size after the next write"""
+        if self.max_bytes and size > self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.time() - self._opened_at >= self.rotate_seconds
+    
+    def _rotate(self):
+        """xapply.log -> xapply.log.1[.gz], shifting older segments up to `backups`"""
+        self._close_file()
+        suffix = ".gz" if self.compress else ""
+        for i in range(self.backups, 0, -1):
+            for ext in (".gz", ""):
+                src = f"{self.log_path}.{i}{ext}"
+                if not os.path.exists(src):
+                    continue
+                if i == self.backups:
+                    os.remove(src)
+                else:
+                    os.replace(src, f"{self.log_path}.{i + 1}{ext}")
+        if self.backups > 0 and os.path.exists(self.log_path):
+            if self.compress:
+                with open(self.log_path, "rb") as src, gzip.open(self.log_path + ".1" + suffix, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(self.log_path)
+            else:
+                os.replace(self.log_path, self.log_path + ".1")
+        elif os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self._open_file()
+    
+    def flush(self, timeout: float = 5):
+        """Block until everything queued so far has been written"""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+    
+    def close(self):
+        """Drain the queue and stop the writer (registered with atexit)"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+    
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+    
+    # -- public API ------------------------------------------------------------
     def _log_startup(self):
         """Log startup info with system details"""
         self.log("INFO", "STARTUP", "Backend starting", {
@@ -149,7 +556,7 @@ class Logger:
     
     def log(self, level: str, category: str, message: str, data: dict = None):
         """
-        Log a message with dual output.
+        Log a message with dual output (enqueue only; the writer thread does the I/O).
         
         Args:
             level: DEBUG, INFO, WARNING, ERROR
@@ -157,9 +564,14 @@ class Logger:
             message: Human-readable message
             data: Optional dict with extra info
         """
-        timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        value = self.LEVELS.get(level, 0)
+        to_file = value >= self.category_levels.get(category, self.file_level)
+        to_terminal = value >= self.terminal_level
+        if not (to_file or to_terminal):
+            return
+        
         entry = {
-            "timestamp": timestamp,
+            "timestamp": time.time(),
             "level": level,
             "category": category,
             "message": message
@@ -167,16 +579,48 @@ class Logger:
         if data:
             entry["data"] = data
         
-        # Always write to file (DEBUG level = everything)
-        self._write_file(entry)
-        
-        # Only print INFO+ to terminal
-        if self.LEVELS.get(level, 0) >= self.LEVELS["INFO"]:
-            print(f"[{category}] {message}")
+        try:
+            self._queue.put_nowait((entry, to_file, to_terminal))
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
     
     def debug(self, category: str, message: str, data: dict = None):
         self.log("DEBUG", category, message, data)
     
+    TRACE_CATEGORIES = ["CHAT", "SETTINGS", "UPLOAD", "SKILL", "ZIP"]  # Used by logger.trace() calls
+    
+    def trace_enabled(self, category: str) -> bool:
+        """True if debug tracing is on for category ("*" enables everything)"""
+        return category in self.debug_categories or "*" in self.debug_categories
+    
+    def set_trace(self, category: str, enabled: bool):
+        if enabled:
+            self.debug_categories.add(category.upper())
+        else:
+            self.debug_categories.discard(category.upper())
+    
+    def trace(self, category: str, message, *args):
+        """
+        Debug trace line, dropped unless tracing is enabled for category.
+        
+        Args:
+            message: %-format string (formatted with args only when enabled),
+                     or a zero-arg callable returning the message
+        """
+        if not self.debug_categories or not self.trace_enabled(category):
+            return
+        try:
+            text = message() if callable(message) else (message % args if args else message)
+        except Exception as e:
+            text = f"<trace format error: {e}>"
+        entry = {"timestamp": time.time(), "level": "DEBUG", "category": category, "message": text}
+        try:
+            self._queue.put_nowait((entry, True, True))
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+    
     def info(self, category: str, message: str, data: dict = None):
         self.log("INFO", category, message, data)
     
@@ -191,153 +635,296 @@ class Logger:
 logger = Logger()
 
 
+# =============================================================================
+# P16: Event Bus (Server-Sent Events)
+# - Pushes agent lifecycle, job progress and captured responses to /api/events
+# - Replaces the frontend's 2s /api/status + /api/agents polling
+# =============================================================================
+event_bus = events.EventBus()
+
+
+# =============================================================================
+# P22: Span Tracing (see tracing.py)
+# - mark_phase() records a job phase (P15) and a trace phase in one call
+# - Every WebDriverWait.until/until_not becomes a "wait" span while a trace is
+#   open on the calling thread; /api/traces/<agent_id> serves the timelines
+# =============================================================================
+def mark_phase(name):
+    jobs.phase(name)
+    tracing.phase(name)
+
+
+def _condition_name(method):
+    """"element_to_be_clickable" for EC closures, "lambda" for lambdas, else the function name"""
+    parts = (getattr(method, "__qualname__", None) or type(method).__name__).split(".<locals>.")
+    if parts[-1] == "<lambda>":
+        return "lambda"
+    return parts[0] if parts[-1].startswith("_") else parts[-1]
+
+
+class WebDriverWait(SeleniumWebDriverWait):
+    """Selenium WebDriverWait that records each until()/until_not() as a span"""
+    
+    def until(self, method, message=""):
+        if not tracing.tracer.active():
+            return super().until(method, message)
+        with tracing.span(f"wait:{_condition_name(method)}", "wait",
+                          timeout=self._timeout, caller=sys._getframe(1).f_code.co_name):
+            return super().until(method, message)
+    
+    def until_not(self, method, message=""):
+        if not tracing.tracer.active():
+            return super().until_not(method, message)
+        with tracing.span(f"wait_not:{_condition_name(method)}", "wait",
+                          timeout=self._timeout, caller=sys._getframe(1).f_code.co_name):
+            return super().until_not(method, message)
+
+
+# =============================================================================
+# P23: Prometheus Metrics (see metrics.py, served at /api/metrics)
+# - Counters/histograms are recorded inline; queue depths and agent counts are
+#   callback gauges evaluated only when /api/metrics is scraped
+# - WebDriver commands are timed by wrapping RemoteWebDriver.execute once,
+#   which covers every pool instance (uc.Chrome inherits it)
+# =============================================================================
+SPAWNS = metrics.REGISTRY.counter("xagent_spawns_total", "Spawn jobs by result", ["result"])
+SPAWN_SECONDS = metrics.REGISTRY.histogram(
+    "xagent_spawn_duration_seconds", "Spawn job duration (including instance wait)",
+    buckets=(1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300))
+CHATS = metrics.REGISTRY.counter("xagent_chats_total", "Chat messages by mode and result", ["mode", "result"])
+CHAT_SECONDS = metrics.REGISTRY.histogram(
+    "xagent_chat_duration_seconds", "Chat round trip per agent (send to captured response)", ["mode"],
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 180))
+DEACTIVATES = metrics.REGISTRY.counter("xagent_deactivates_total", "Deactivate requests by result", ["result"])
+DEACTIVATE_SECONDS = metrics.REGISTRY.histogram("xagent_deactivate_duration_seconds", "Deactivate request duration")
+WEBDRIVER_SECONDS = metrics.REGISTRY.histogram(
+    "xagent_webdriver_command_duration_seconds", "WebDriver command latency (count = commands sent)", ["command"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 120))
+WEBDRIVER_ERRORS = metrics.REGISTRY.counter("xagent_webdriver_command_errors_total", "WebDriver commands that raised", ["command"])
+HANDLE_RESCANS = metrics.REGISTRY.counter("xagent_handle_rescans_total", "capture_agent_handles() tab scans")
+STALE_HANDLES = metrics.REGISTRY.counter("xagent_stale_handles_total", "Agent handles dropped because their tab disappeared")
+TAB_MONITOR_CLOSES = metrics.REGISTRY.counter("xagent_tab_monitor_closes_total", "Unwanted tabs closed by the tab monitor")
+SQLITE_SECONDS = metrics.REGISTRY.histogram(
+    "xagent_sqlite_query_duration_seconds", "SQLite operation latency", ["op"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1))
+UPLOADS_SKIPPED = metrics.REGISTRY.counter(
+    "xagent_uploads_skipped_total", "File uploads skipped because the workspace already had the same content")
+WARM_TAB_CLAIMS = metrics.REGISTRY.counter(
+    "xagent_warm_tab_claims_total", "Full spawns that found (hit) or missed a pre-warmed tab", ["result"])
+PACKAGE_BUILDS = metrics.REGISTRY.counter(
+    "xagent_agent_packages_total", "create_agent_zip() results (P29 package cache)", ["result"])
+metrics.REGISTRY.gauge("xagent_active_agents", "Agents with a live tab handle",
+                       callback=lambda: len(agent_handles))
+metrics.REGISTRY.gauge("xagent_instance_agents", "Agents per browser pool instance", ["instance"],
+                       callback=lambda: {str(i.index): i.load() for i in driver_pool.instances})
+metrics.REGISTRY.gauge("xagent_jobs", "Jobs in the job manager by state", ["state"],
+                       callback=lambda: {state: len(job_manager.list(state=state)) for state in jobs.JOB_STATES})
+metrics.REGISTRY.gauge("xagent_job_queue_depth", "Jobs waiting for a worker",
+                       callback=lambda: job_manager.queue_depth())
+metrics.REGISTRY.gauge("xagent_event_subscribers", "Connected /api/events streams",
+                       callback=lambda: event_bus.subscriber_count())
+metrics.REGISTRY.gauge("xagent_log_queue_depth", "Log entries waiting for the writer thread",
+                       callback=lambda: logger.queue_depth())
+
+_webdriver_execute = RemoteWebDriver.execute
+
+
+def _timed_execute(self, driver_command, params=None):
+    start = time.perf_counter()
+    try:
+        return _webdriver_execute(self, driver_command, params)
+    except Exception:
+        WEBDRIVER_ERRORS.inc(command=driver_command)
+        raise
+    finally:
+        WEBDRIVER_SECONDS.observe(time.perf_counter() - start, command=driver_command)
+
+
+RemoteWebDriver.execute = _timed_execute
+
+
 # =============================================================================
 # P5 Phase 10: Agent SQLite Database
 # - Persists agent info across restarts (drive_url, email, files)
 # - Status resets to 'inactive' on every startup
 # - agent_handles (memory) is always {} on startup
+# - P26: db_pool.py - pooled WAL readers, one writer thread, batched upserts
+# - P26: agent_db.py owns the schema (PRAGMA user_version migrations)
+# - P27: agent_db.registry caches every row in memory (write-through)
 # =============================================================================
-import sqlite3
+import agent_db
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "agents.db")
+DB_PATH = agent_db.DB_PATH
 
 def init_agent_db():
     """Initialize SQLite database for agent persistence"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Create agents table if not exists
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS agents (
-            id TEXT PRIMARY KEY,
-            name TEXT,
-            description TEXT,
-            status TEXT DEFAULT 'inactive',
-            drive_url TEXT,
-            google_email TEXT,
-            files_uploaded TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    # Create/migrate the schema (P26: versioned, agents.json imported once)
+    applied = agent_db.init_db()
     
     # Reset ALL agent statuses to 'inactive' on startup
-    cursor.execute("UPDATE agents SET status = 'inactive'")
+    agent_db.deactivate_all()
     
-    conn.commit()
-    conn.close()
-    logger.info("AGENT", "Database initialized", {"path": DB_PATH})
+    # P27: Everything after this reads from memory
+    agent_db.registry.load()
+    logger.info("AGENT", "Database initialized", {
+        "path": DB_PATH, "schema_version": agent_db.schema_version(),
+        "migrations": applied, "pool_size": agent_db.db.pool_size
+    })
 
 def db_get_agent(agent_id):
-    """Get agent from database"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM agents WHERE id = ?", (agent_id,))
-    row = cursor.fetchone()
-    conn.close()
-    return dict(row) if row else None
+    """Get agent (P27: from the in-memory registry)"""
+    return agent_db.registry.get(agent_id)
+
+def db_get_agents(agent_ids):
+    """Get several agents -> {agent_id: row} (P27: from the in-memory registry)"""
+    return agent_db.registry.get_many(agent_ids)
 
 def db_upsert_agent(agent_id, name=None, description=None, status=None, 
                     drive_url=None, google_email=None, files_uploaded=None):
     """Insert or update agent in database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Check if exists
-    cursor.execute("SELECT id FROM agents WHERE id = ?", (agent_id,))
-    exists = cursor.fetchone() is not None
-    
-    if exists:
-        # Build UPDATE statement dynamically
-        updates = []
-        values = []
-        if name is not None:
-            updates.append("name = ?")
-            values.append(name)
-        if description is not None:
-            updates.append("description = ?")
-            values.append(description)
-        if status is not None:
-            updates.append("status = ?")
-            values.append(status)
-        if drive_url is not None:
-            updates.append("drive_url = ?")
-            values.append(drive_url)
-        if google_email is not None:
-            updates.append("google_email = ?")
-            values.append(google_email)
-        if files_uploaded is not None:
-            updates.append("files_uploaded = ?")
-            values.append(files_uploaded)
-        
-        if updates:
-            values.append(agent_id)
-            cursor.execute(f"UPDATE agents SET {', '.join(updates)} WHERE id = ?", values)
-    else:
-        # INSERT new agent
-        cursor.execute('''
-            INSERT INTO agents (id, name, description, status, drive_url, google_email, files_uploaded)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (agent_id, name, description, status or 'inactive', drive_url, google_email, files_uploaded))
-    
-    conn.commit()
-    conn.close()
-
-def db_get_all_agents():
-    """Get all agents from database"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM agents")
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    db_upsert_agents([{"id": agent_id, "name": name, "description": description, "status": status,
+                       "drive_url": drive_url, "google_email": google_email,
+                       "files_uploaded": files_uploaded}])
+
+def db_upsert_agents(agents):
+    """Batched upsert: list of dicts (id + any agent_db.AGENT_COLUMNS) written in one transaction"""
+    with SQLITE_SECONDS.time(op="upsert_agents" if len(agents) > 1 else "upsert_agent"):
+        rows = agent_db.registry.upsert(agents)  # P27: write-through
+    
+    # P16: Lifecycle change (spawning -> active -> inactive)
+    changed = [row for row in rows if row["status"] is not None]
+    for row in changed:
+        event_bus.publish("agent", {"agent_id": row["id"], "status": row["status"]})
+    if changed:
+        notify_agents_changed()
+
+def db_set_status_many(agent_ids, status):
+    """Set status for many agents in one transaction (e.g. a whole browser instance died)"""
+    db_upsert_agents([{"id": aid, "status": status} for aid in agent_ids])
+
+def db_get_all_agents(status=None):
+    """Get all agents (optionally one status; P27: from the in-memory registry)"""
+    return agent_db.registry.list_all(status)
 
 # Initialize database on module load
 init_agent_db()
 
 
+# =============================================================================
+# P32: Event-Driven Tab Monitor
+# - TargetWatcher listeners (P31) queue unwanted popups as they appear or
+#   navigate; the monitor thread blocks on that queue (idle = no CPU, no
+#   WebDriver commands)
+# - Popups are closed by targetId with Target.closeTarget: no switch_to,
+#   so the tab a spawn/chat is driving is never touched
+# - Agent tabs, the main tab and an instance's last tab are never closed
+# - Instances without DevTools access are swept with Target.getTargets
+#   every TAB_MONITOR_POLL_SECONDS (only when their lock is free)
+# =============================================================================
+UNWANTED_TAB_PATTERNS = ["acrobat", "adobe", "microsoftonline", "microsoft", "welcome"]
+TAB_MONITOR_POLL_SECONDS = 5
+tab_monitor_events = queue.Queue()  # (instance, targetInfo) or None to wake the monitor
+monitor_pauses = {}  # {driver (None = all browsers): nested pause_monitor() count}
+monitor_pauses_lock = threading.Lock()
+
+
+def is_unwanted_tab(info):
+    url = (info.get("url") or "").lower()
+    title = (info.get("title") or "").lower()
+    return info.get("type") == "page" and any(p in url or p in title for p in UNWANTED_TAB_PATTERNS)
+
+
+def on_target_event(instance, event, info):
+    """TargetWatcher listener - runs on the watcher's reader thread, so only queue here"""
+    if event != "Target.targetDestroyed" and is_unwanted_tab(info):
+        tab_monitor_events.put((instance, info))
+
+
+def protected_handles(instance):
+    """Tabs the monitor must never close on this instance"""
+    with agent_handles_lock:
+        handles = {tab.handle for tab in agent_handles.values() if tab.instance is instance}
+    if instance.driver is driver_ref and target_tab_handle:
+        handles.add(target_tab_handle)
+    return handles
+
+
+def close_unwanted_tab(instance, info, pages=None):
+    """Close one popup by targetId (never switches tabs)"""
+    target_id = info.get("targetId")
+    watcher = instance.targets if instance.targets and instance.targets.alive else None
+    if pages is None and watcher:
+        pages = watcher.pages()
+    if target_id in protected_handles(instance) or (pages is not None and (target_id not in pages or len(pages) <= 1)):
+        return
+    try:
+        if watcher:
+            watcher.send("Target.closeTarget", {"targetId": target_id})
+        else:
+            with instance.lock:
+                instance.driver.execute_cdp_cmd("Target.closeTarget", {"targetId": target_id})
+        logger.info("TAB", "Closing unwanted tab", {"url": (info.get("url") or "")[:50], "instance": instance.index})
+        TAB_MONITOR_CLOSES.inc()
+    except Exception as e:
+        logger.debug("TAB", "Error closing tab", {"error": str(e)})
+
+
+def sweep_unwanted_tabs(instance, blocking=True):
+    """Check every current tab of the instance once"""
+    if not instance.lock.acquire(blocking=blocking):
+        return  # P13: A spawn/chat holds this instance; try again next poll
+    try:
+        pages = page_targets(instance)
+    except Exception as e:
+        logger.debug("TAB", "Sweep failed", {"error": str(e)})
+        return
+    finally:
+        instance.lock.release()
+    for info in list(pages.values()):
+        if is_unwanted_tab(info):
+            close_unwanted_tab(instance, info, pages)
+            pages.pop(info["targetId"], None)
+
+
 def tab_monitor():
-    """P4 Phase 8: Background tab monitor - closes unwanted popups"""
+    """P4 Phase 8: Background tab monitor - closes unwanted popups (P32: CDP target events)"""
     # breakpoint()  # DEBUG: Tab monitor loop start
-    global stop_tab_monitor, pause_tab_monitor, driver_ref, target_tab_handle
     logger.info("TAB", "Tab monitor started")
+    logger.debug("TAB", "Unwanted patterns configured", {"patterns": UNWANTED_TAB_PATTERNS})
     
-    unwanted = ["acrobat", "adobe", "microsoftonline", "microsoft", "welcome"]
-    logger.debug("TAB", "Unwanted patterns configured", {"patterns": unwanted})
-    
+    swept = set()  # Watchers whose pre-existing tabs were already checked
+    deferred = []  # Events for paused instances
     while not stop_tab_monitor:
-        if pause_tab_monitor:
-            time.sleep(0.5)
-            continue
-            
         try:
-            if driver_ref and target_tab_handle:
-                handles = driver_ref.window_handles
-                
-                if len(handles) > 1:
-                    for handle in handles[:]:
-                        if handle == target_tab_handle:
-                            continue
-                        try:
-                            driver_ref.switch_to.window(handle)
-                            url = driver_ref.current_url.lower()
-                            title = driver_ref.title.lower()
-                            
-                            if any(p in url or p in title for p in unwanted):
-                                logger.info("TAB", "Closing unwanted tab", {"url": url[:50]})
-                                driver_ref.close()
-                        except Exception as e:
-                            logger.debug("TAB", "Error checking handle", {"error": str(e)})
-                    
-                    try:
-                        if target_tab_handle in driver_ref.window_handles:
-                            driver_ref.switch_to.window(target_tab_handle)
-                    except:
-                        pass
+            item = tab_monitor_events.get(timeout=0.5 if deferred else TAB_MONITOR_POLL_SECONDS)
+        except queue.Empty:
+            item = None
+        if stop_tab_monitor:
+            break
+        
+        try:
+            # pause_monitor() (uploads, native dialogs) defers closing on that instance until resumed
+            if item:
+                deferred.append(item)
+            ready = [d for d in deferred if not monitor_paused(d[0])]
+            deferred = [d for d in deferred if monitor_paused(d[0])]
+            for event in ready:
+                close_unwanted_tab(*event)
+            if item:
+                continue
+            
+            # Idle: make sure every instance has a watcher; poll the ones that can't
+            for instance in list(driver_pool.instances):
+                if instance.driver is None or monitor_paused(instance):
+                    continue
+                watcher = target_watcher(instance)
+                if watcher is None:
+                    sweep_unwanted_tabs(instance, blocking=False)
+                elif id(watcher) not in swept:
+                    swept.add(id(watcher))
+                    sweep_unwanted_tabs(instance, blocking=False)
         except Exception as e:
             logger.debug("TAB", "Monitor loop error", {"error": str(e)})
-        time.sleep(0.5)
     
     logger.info("TAB", "Tab monitor stopped")
     # breakpoint()  # DEBUG: Tab monitor stopped
@@ -345,46 +932,110 @@ def tab_monitor():
 
 def start_tab_monitor(driver, handle=None):
     # breakpoint()  # DEBUG: Starting tab monitor
-    global driver_ref, stop_tab_monitor, target_tab_handle, pause_tab_monitor
+    global driver_ref, stop_tab_monitor, target_tab_handle
     driver_ref = driver
     target_tab_handle = handle or driver.current_window_handle
     stop_tab_monitor = False
-    pause_tab_monitor = False
-    thread = threading.Thread(target=tab_monitor, daemon=True)
+    with monitor_pauses_lock:
+        monitor_pauses.clear()
+    thread = threading.Thread(target=tab_monitor, name="tab-monitor", daemon=True)
     thread.start()
     return thread
 
 
-def pause_monitor():
+def monitor_paused(instance):
+    with monitor_pauses_lock:
+        return bool(monitor_pauses) and (None in monitor_pauses or instance.driver in monitor_pauses)
+
+
+def pause_monitor(driver=None):
+    """Stop the monitor closing tabs in driver's browser (None = every browser) until resume_monitor(driver)
+    
+    Pauses nest and are counted per driver, so one browser's upload finishing
+    never resumes the monitor for another browser still in its file dialog.
+    """
     global pause_tab_monitor
-    pause_tab_monitor = True
+    with monitor_pauses_lock:
+        monitor_pauses[driver] = monitor_pauses.get(driver, 0) + 1
+        pause_tab_monitor = True
 
 
-def resume_monitor():
+def resume_monitor(driver=None):
     global pause_tab_monitor
-    pause_tab_monitor = False
+    with monitor_pauses_lock:
+        count = monitor_pauses.get(driver, 0) - 1
+        if count > 0:
+            monitor_pauses[driver] = count
+        else:
+            monitor_pauses.pop(driver, None)
+        pause_tab_monitor = bool(monitor_pauses)
+    if count <= 0:
+        tab_monitor_events.put(None)  # Let deferred closes run
 
 
 def stop_all():
     global stop_tab_monitor
     stop_tab_monitor = True
+    tab_monitor_events.put(None)  # Wake the monitor
+
+
+# =============================================================================
+# P20: WebDriver/CDP Replacements for pyautogui
+# - press_key(): dispatches keys to the page via CDP (no OS focus needed)
+# - set_field_value(): sets textarea/input values without the clipboard
+# =============================================================================
+CDP_KEYS = {
+    "Escape": {"key": "Escape", "code": "Escape", "windowsVirtualKeyCode": 27},
+    "Enter": {"key": "Enter", "code": "Enter", "windowsVirtualKeyCode": 13},
+}
+
+
+def press_key(driver, key="Escape", times=1, pause=0.5):
+    """Send a key to the page `times` times (CDP Input.dispatchKeyEvent, ActionChains fallback)"""
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.common.action_chains import ActionChains
+    
+    for i in range(times):
+        try:
+            params = CDP_KEYS[key]
+            driver.execute_cdp_cmd("Input.dispatchKeyEvent", {"type": "rawKeyDown", **params})
+            driver.execute_cdp_cmd("Input.dispatchKeyEvent", {"type": "keyUp", **params})
+        except Exception:
+            ActionChains(driver).send_keys(getattr(Keys, key.upper())).perform()
+        if i < times - 1:
+            time.sleep(pause)
+
+
+def set_field_value(driver, element, value):
+    """Set a textarea/input value the way Angular sees typing, without the clipboard"""
+    driver.execute_script("""
+        const el = arguments[0];
+        const proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+        Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, arguments[1]);
+        el.dispatchEvent(new Event('input', { bubbles: true }));
+        el.dispatchEvent(new Event('change', { bubbles: true }));
+    """, element, value)
 
 
 def handle_native_file_dialog(file_path):
     """Handle Windows native file dialog using Alt+N to focus filename field"""
     # breakpoint()  # DEBUG: Native file dialog handler
-    print(f"[DEBUG] handle_native_file_dialog: Starting for {file_path}")
+    logger.trace("UPLOAD", "handle_native_file_dialog: Starting for %s", file_path)
+    if HEADLESS:
+        # P20: There is no OS dialog to drive; dismiss whatever the page opened
+        print("Native file dialog unavailable in headless mode")
+        return False
     if not pyautogui:
         print("PyAutoGUI required")
         return False
     
     try:
         print(f"Handling dialog for: {file_path}")
-        print(f"[DEBUG] handle_native_file_dialog: Waiting 2s for dialog")
+        logger.trace("UPLOAD", "handle_native_file_dialog: Waiting 2s for dialog")
     # breakpoint()  # DEBUG: Before dialog wait
         time.sleep(2)
         
-        print(f"[DEBUG] handle_native_file_dialog: Checking file exists")
+        logger.trace("UPLOAD", "handle_native_file_dialog: Checking file exists")
         if not os.path.exists(file_path):
             print(f"File not found: {file_path}")
     # breakpoint()  # DEBUG: File not found
@@ -392,46 +1043,46 @@ def handle_native_file_dialog(file_path):
         
         win_path = os.path.abspath(file_path).replace('/', '\\')
         print(f"Full path: {win_path}")
-        print(f"[DEBUG] handle_native_file_dialog: Converted path to Windows format")
+        logger.trace("UPLOAD", "handle_native_file_dialog: Converted path to Windows format")
     # breakpoint()  # DEBUG: Path converted
         
         # Focus filename field (Alt+N is Windows standard)
         print("Focusing filename field (Alt+N)...")
-        print(f"[DEBUG] handle_native_file_dialog: Sending Alt+N hotkey")
+        logger.trace("UPLOAD", "handle_native_file_dialog: Sending Alt+N hotkey")
     # breakpoint()  # DEBUG: Before Alt+N
         pyautogui.hotkey('alt', 'n')
         time.sleep(0.5)
-        print(f"[DEBUG] handle_native_file_dialog: Alt+N sent")
+        logger.trace("UPLOAD", "handle_native_file_dialog: Alt+N sent")
         
         # Select all existing text
-        print(f"[DEBUG] handle_native_file_dialog: Sending Ctrl+A")
+        logger.trace("UPLOAD", "handle_native_file_dialog: Sending Ctrl+A")
     # breakpoint()  # DEBUG: Before Ctrl+A
         pyautogui.hotkey('ctrl', 'a')
         time.sleep(0.2)
-        print(f"[DEBUG] handle_native_file_dialog: Ctrl+A sent")
+        logger.trace("UPLOAD", "handle_native_file_dialog: Ctrl+A sent")
         
         # Paste path
-        print(f"[DEBUG] handle_native_file_dialog: Pasting/typing path")
+        logger.trace("UPLOAD", "handle_native_file_dialog: Pasting/typing path")
     # breakpoint()  # DEBUG: Before paste
         if pyperclip:
             pyperclip.copy(win_path)
             pyautogui.hotkey('ctrl', 'v')
             print("Pasted path")
-            print(f"[DEBUG] handle_native_file_dialog: Clipboard paste complete")
+            logger.trace("UPLOAD", "handle_native_file_dialog: Clipboard paste complete")
         else:
             pyautogui.typewrite(win_path, interval=0.03)
             print("Typed path")
-            print(f"[DEBUG] handle_native_file_dialog: Typewrite complete")
+            logger.trace("UPLOAD", "handle_native_file_dialog: Typewrite complete")
         
         time.sleep(0.5)
         
         # Submit
         print("Pressing Enter...")
-        print(f"[DEBUG] handle_native_file_dialog: Sending Enter key")
+        logger.trace("UPLOAD", "handle_native_file_dialog: Sending Enter key")
     # breakpoint()  # DEBUG: Before Enter
         pyautogui.press('enter')
         
-        print(f"[DEBUG] handle_native_file_dialog: Waiting 3s for dialog close")
+        logger.trace("UPLOAD", "handle_native_file_dialog: Waiting 3s for dialog close")
         time.sleep(3)
         print("Dialog handled successfully")
     # breakpoint()  # DEBUG: Dialog complete
@@ -439,215 +1090,330 @@ def handle_native_file_dialog(file_path):
         
     except Exception as e:
         print(f"Dialog error: {e}")
-        print(f"[DEBUG] handle_native_file_dialog: EXCEPTION: {e}")
+        logger.trace("UPLOAD", "handle_native_file_dialog: EXCEPTION: %s", e)
     # breakpoint()  # DEBUG: Dialog error
         return False
 
 
 def get_agent_skill(agent_id):
-    """Read agent SKILL.md and extract info"""
+    """Read agent SKILL.md and extract info (P28: from the cached skill index)"""
     # breakpoint()  # DEBUG: Loading agent skill
-    print(f"[DEBUG] get_agent_skill: Loading skill for {agent_id}")
-    skill_path = os.path.join(SKILLS_PATH, agent_id, "SKILL.md")
-    print(f"[DEBUG] get_agent_skill: Skill path: {skill_path}")
-    # breakpoint()  # DEBUG: Skill path resolved
-    
-    if not os.path.exists(skill_path):
-        print(f"Skill not found: {skill_path}")
-        print(f"[DEBUG] get_agent_skill: File does not exist")
-    # breakpoint()  # DEBUG: Skill not found
+    skill = skill_index.get(agent_id)
+    if not skill:
+        print(f"Skill not found: {os.path.join(SKILLS_PATH, agent_id, 'SKILL.md')}")
         return None
-    
-    print(f"[DEBUG] get_agent_skill: Reading file...")
-    # breakpoint()  # DEBUG: Before file read
-    with open(skill_path, "r", encoding="utf-8") as f:
-        content = f.read()
-    print(f"[DEBUG] get_agent_skill: File read, {len(content)} bytes")
-    # breakpoint()  # DEBUG: After file read
-    
-    # Parse YAML frontmatter
-    name = agent_id
-    description = ""
-    print(f"[DEBUG] get_agent_skill: Parsing YAML frontmatter")
-    if content.startswith("---"):
-        print(f"[DEBUG] get_agent_skill: Found frontmatter delimiter")
-    # breakpoint()  # DEBUG: Parsing frontmatter
-        parts = content.split("---", 2)
-        print(f"[DEBUG] get_agent_skill: Split into {len(parts)} parts")
-        if len(parts) >= 3:
-            frontmatter = parts[1]
-            print(f"[DEBUG] get_agent_skill: Frontmatter: {frontmatter[:100]}...")
-            for line in frontmatter.split("\n"):
-                if line.startswith("name:"):
-                    name = line.split(":", 1)[1].strip().strip('"\'')
-                    print(f"[DEBUG] get_agent_skill: Found name: {name}")
-                elif line.startswith("description:"):
-                    description = line.split(":", 1)[1].strip().strip('"\'')
-                    print(f"[DEBUG] get_agent_skill: Found description: {description[:50]}...")
-    
-    result = {
-        "id": agent_id,
-        "name": name,
-        "description": description,
-        "skill_content": content,
-        "skill_path": skill_path
-    }
-    print(f"[DEBUG] get_agent_skill: Returning skill object")
-    # breakpoint()  # DEBUG: Skill loaded successfully
-    return result
+    logger.trace("SKILL", "get_agent_skill: %s -> %s (%s bytes, sha256 %s)",
+                 agent_id, skill["name"], len(skill["skill_content"]), skill["hash"][:12])
+    return skill
+
+
+# =============================================================================
+# P29: Content-Addressed Agent Packages
+# - Package key = sha256 of every file that goes into the zip
+#   (SKILL.md as core_instructions.md + the template files)
+# - Zips are built in memory (fixed timestamps -> identical bytes for
+#   identical content) and stored at temp_agents/packages/<key>/<id>.agent.zip
+# - Unchanged skills reuse the existing zip, across spawns and restarts
+# - `python main.py --prebuild-packages` warms the whole roster
+# - P30: XAGENT_PACK_CORE=1 also packs core.txt into every zip, so spawn
+#   needs one upload round instead of two (upload_files skips files the
+#   workspace already has, by content hash)
+# =============================================================================
+AGENT_TEMPLATE_FILES = {
+    "input.md": "# Input\n\nAwaiting input...\n",
+    "output.md": "# Output Format\n\nRespond ONLY in this format:\n```\nSTATUS: [READY|PROCESSING|COMPLETE|ERROR]\nTASK_ID: [task identifier]\nRESULT: [your response]\n```\n",
+    "memory.json": "{}"
+}
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)  # Fixed so the bytes depend only on the content
+CORE_TXT = "core.txt"  # Project documentation every agent gets (relative to the working dir)
+PACK_CORE = os.getenv("XAGENT_PACK_CORE", "0").lower() in ("1", "true", "yes")
+
+_file_cache = {}  # abspath -> ((mtime_ns, size), bytes, sha256)
+_file_cache_lock = threading.Lock()
+
+
+def read_file_cached(path):
+    """(bytes, sha256) of a file, re-read only when its mtime/size changes"""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _file_cache_lock:
+        cached = _file_cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1], cached[2]
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    with _file_cache_lock:
+        _file_cache[path] = (stamp, data, digest)
+    return data, digest
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode("utf-8") if isinstance(content, str) else content).hexdigest()
+
+
+def agent_package_files(skill):
+    """Ordered (name, content) pairs that make up an agent package"""
+    files = [("core_instructions.md", skill["skill_content"])] + list(AGENT_TEMPLATE_FILES.items())
+    if PACK_CORE and os.path.exists(CORE_TXT):
+        files.append((os.path.basename(CORE_TXT), read_file_cached(CORE_TXT)[0]))
+    return files
+
+
+def package_key(files):
+    """Content hash of a package (names + contents)"""
+    digest = hashlib.sha256()
+    for fname, content in files:
+        digest.update(f"{fname}\0{content_hash(content)}\0".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def package_manifest(skill):
+    """{file name: sha256} of what an agent's zip puts into the workspace"""
+    return {fname: content_hash(content) for fname, content in agent_package_files(skill)}
+
+
+def build_zip_bytes(files):
+    """Deterministic in-memory zip"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for fname, content in files:
+            info = zipfile.ZipInfo(fname, date_time=ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            zf.writestr(info, content)
+    return buffer.getvalue()
 
 
 def create_agent_zip(agent_id, output_dir="temp_agents"):
-    """Create .agent.zip for a specific agent"""
+    """Create .agent.zip for a specific agent (reused if the content is unchanged)"""
     # breakpoint()  # DEBUG: Creating agent zip package
-    print(f"[DEBUG] create_agent_zip: Starting for {agent_id}")
-    print(f"[DEBUG] create_agent_zip: Output dir: {output_dir}")
-    
-    print(f"[DEBUG] create_agent_zip: Getting agent skill")
-    # breakpoint()  # DEBUG: Before get_agent_skill call
     skill = get_agent_skill(agent_id)
     if not skill:
-        print(f"[DEBUG] create_agent_zip: No skill found, returning None")
-    # breakpoint()  # DEBUG: Skill not found
+        logger.trace("ZIP", "create_agent_zip: No skill found, returning None")
         return None
-    print(f"[DEBUG] create_agent_zip: Skill loaded: {skill['name']}")
-    # breakpoint()  # DEBUG: After get_agent_skill call
-    
-    # Create temp directory
-    print(f"[DEBUG] create_agent_zip: Creating directories")
-    # breakpoint()  # DEBUG: Before directory creation
-    os.makedirs(output_dir, exist_ok=True)
-    agent_dir = os.path.join(output_dir, agent_id)
-    os.makedirs(agent_dir, exist_ok=True)
-    print(f"[DEBUG] create_agent_zip: Agent dir: {agent_dir}")
-    
-    # Create core_instructions.md from SKILL.md
-    core_path = os.path.join(agent_dir, "core_instructions.md")
-    print(f"[DEBUG] create_agent_zip: Writing core_instructions.md")
-    # breakpoint()  # DEBUG: Before writing core_instructions
-    with open(core_path, "w", encoding="utf-8") as f:
-        f.write(skill["skill_content"])
-    print(f"[DEBUG] create_agent_zip: Wrote {len(skill['skill_content'])} bytes")
-    
-    # Create other files
-    files = {
-        "input.md": "# Input\n\nAwaiting input...\n",
-        "output.md": "# Output Format\n\nRespond ONLY in this format:\n```\nSTATUS: [READY|PROCESSING|COMPLETE|ERROR]\nTASK_ID: [task identifier]\nRESULT: [your response]\n```\n",
-        "memory.json": "{}"
-    }
     
-    print(f"[DEBUG] create_agent_zip: Writing {len(files)} additional files")
-    # breakpoint()  # DEBUG: Before writing other files
-    for fname, content in files.items():
-        fpath = os.path.join(agent_dir, fname)
-        print(f"[DEBUG] create_agent_zip: Writing {fname}")
-        with open(fpath, "w", encoding="utf-8") as f:
-            f.write(content)
-    print(f"[DEBUG] create_agent_zip: All files written")
-    
-    # Create zip
-    zip_path = os.path.join(output_dir, f"{agent_id}.agent.zip")
-    print(f"[DEBUG] create_agent_zip: Creating zip at {zip_path}")
-    # breakpoint()  # DEBUG: Before zip creation
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-        for fname in ["core_instructions.md", "input.md", "output.md", "memory.json"]:
-            full_path = os.path.join(agent_dir, fname)
-            print(f"[DEBUG] create_agent_zip: Adding {fname} to zip")
-            zf.write(full_path, fname)
-    
-    print(f"Created: {zip_path}")
-    print(f"[DEBUG] create_agent_zip: Zip created successfully")
-    # breakpoint()  # DEBUG: Zip creation complete
+    files = agent_package_files(skill)
+    key = package_key(files)
+    packages_dir = os.path.join(output_dir, "packages")
+    zip_path = os.path.join(packages_dir, key, f"{agent_id}.agent.zip")
+    
+    if os.path.exists(zip_path):
+        logger.trace("ZIP", "create_agent_zip: Cache hit %s (%s)", agent_id, key)
+        PACKAGE_BUILDS.inc(result="cached")
+        return zip_path
+    
+    logger.trace("ZIP", "create_agent_zip: Building %s (%s, %s files)", agent_id, key, len(files))
+    data = build_zip_bytes(files)
+    os.makedirs(os.path.dirname(zip_path), exist_ok=True)
+    tmp_path = f"{zip_path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, zip_path)  # Atomic: concurrent spawns never see a partial zip
+    PACKAGE_BUILDS.inc(result="built")
+    
+    # Drop this agent's packages for older skill versions
+    for stale in glob.glob(os.path.join(packages_dir, "*", f"{agent_id}.agent.zip")):
+        if os.path.abspath(stale) != os.path.abspath(zip_path):
+            try:
+                os.remove(stale)
+                os.rmdir(os.path.dirname(stale))
+            except OSError:
+                pass  # Directory still holds other agents' packages
+    
+    print(f"Created: {zip_path} ({len(data)} bytes)")
     return zip_path
 
 
+def prebuild_agent_packages(output_dir="temp_agents"):
+    """Build (or verify) the package of every agent in the roster. Returns {agent_id: zip_path}."""
+    roster, _ = skill_index.roster()
+    built = {}
+    for members in roster.values():
+        for member in members:
+            zip_path = create_agent_zip(member["id"], output_dir)
+            if zip_path:
+                built[member["id"]] = zip_path
+    logger.info("ZIP", f"Prebuilt {len(built)} agent packages", {"output_dir": output_dir})
+    return built
+
+
+# =============================================================================
+# P19: Direct File-Input Uploads
+# - Hooks HTMLInputElement.click/showPicker so the menu's hidden
+#   <input type=file> is captured instead of opening the OS file picker
+# - Files are set with send_keys (CDP DOM.setFileInputFiles as fallback)
+# - No pyautogui, no OS focus, no fixed sleeps: works headless and in parallel
+# - If no input is captured (site used another picker), the P4 native dialog
+#   handler takes over
+# =============================================================================
+ADD_BUTTON_XPATHS = [
+    "//button[contains(@aria-label, 'Add')]",
+    "//button[contains(@aria-label, 'Import')]",
+    "//button[.//span[text()='add']]",
+]
+UPLOAD_ZIP_XPATH = "//*[contains(text(), 'Upload Zip')]"
+UPLOAD_FILES_XPATH = "//*[contains(text(), 'Upload files') or contains(text(), 'Upload file')]"
+
+FILE_INPUT_HOOK_JS = """
+if (!window.__xagentFileHook) {
+    window.__xagentFileHook = true;
+    const capture = (input) => {
+        if (input.type !== 'file' || !window.__xagentCaptureFileInput) return false;
+        window.__xagentCaptureFileInput = false;
+        window.__xagentFileInput = input;
+        if (!input.isConnected) {
+            input.style.display = 'none';
+            document.body.appendChild(input);
+        }
+        return true;
+    };
+    for (const name of ['click', 'showPicker']) {
+        const original = HTMLInputElement.prototype[name];
+        if (!original) continue;
+        HTMLInputElement.prototype[name] = function () {
+            if (capture(this)) return;  // Swallowed: no native dialog
+            return original.apply(this, arguments);
+        };
+    }
+}
+window.__xagentFileInput = null;
+window.__xagentCaptureFileInput = true;
+"""
+
+
+def find_add_button(driver, timeout=15):
+    """Wait for the first displayed Add/Import button"""
+    def displayed_add_button(d):
+        for xpath in ADD_BUTTON_XPATHS:
+            try:
+                for el in d.find_elements(By.XPATH, xpath):
+                    if el.is_displayed():
+                        return el
+            except Exception:
+                pass
+        return False
+    
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.25).until(displayed_add_button)
+    except TimeoutException:
+        return None
+
+
+def set_input_files(driver, file_input, file_path):
+    """Put file_path on an <input type=file>; send_keys first, CDP as fallback"""
+    try:
+        file_input.send_keys(file_path)
+        return True
+    except Exception as e:
+        print(f"[upload] send_keys on file input failed: {e}, trying CDP")
+    
+    try:
+        ref = driver.execute_cdp_cmd("Runtime.evaluate", {"expression": "window.__xagentFileInput"})
+        object_id = ref.get("result", {}).get("objectId")
+        if not object_id:
+            return False
+        driver.execute_cdp_cmd("DOM.setFileInputFiles", {"files": [file_path], "objectId": object_id})
+        return True
+    except Exception as e:
+        print(f"[upload] CDP DOM.setFileInputFiles failed: {e}")
+        return False
+
+
+def upload_via_menu(driver, menu_xpath, file_path, expect_node=None):
+    """Add menu -> upload item, then hand the file to the captured input
+    
+    Args:
+        expect_node: file name that should appear in the file tree once the
+                     upload is processed (waited for, best effort)
+    
+    Returns:
+        True/False for the direct-input path, or "dialog" if the menu item opened
+        something we couldn't capture (a native dialog is presumably showing)
+    """
+    wait = WebDriverWait(driver, 15)
+    
+    add_btn = find_add_button(driver)
+    if not add_btn:
+        print("Add button not found")
+        return False
+    
+    # Arm the hook right before the click that creates the input
+    driver.execute_script(FILE_INPUT_HOOK_JS)
+    
+    try:
+        add_btn.click()
+    except:
+        driver.execute_script("arguments[0].click();", add_btn)
+    print("Clicked Add")
+    
+    menu_item = wait.until(EC.element_to_be_clickable((By.XPATH, menu_xpath)))
+    try:
+        menu_item.click()
+    except:
+        driver.execute_script("arguments[0].click();", menu_item)
+    print(f"Clicked {menu_item.text.strip() or 'upload item'}")
+    
+    try:
+        file_input = WebDriverWait(driver, 3, poll_frequency=0.1).until(
+            lambda d: d.execute_script("return window.__xagentFileInput;")
+        )
+    except TimeoutException:
+        driver.execute_script("window.__xagentCaptureFileInput = false;")
+        print("[upload] No file input captured, falling back to native dialog")
+        return "dialog"
+    
+    if not set_input_files(driver, file_input, file_path):
+        return False
+    print(f"[upload] ✓ Set {os.path.basename(file_path)} on file input")
+    
+    if expect_node:
+        try:
+            WebDriverWait(driver, 10, poll_frequency=0.2).until(lambda d: d.find_elements(
+                By.XPATH, f"//mat-tree-node//span[contains(@class, 'node-name') and normalize-space()='{expect_node}']"
+            ))
+        except TimeoutException:
+            print(f"[upload] {expect_node} not visible in file tree yet, continuing")
+    return True
+
+
 def upload_zip(driver, zip_path):
     """Upload a zip file via app UI"""
     # breakpoint()  # DEBUG: Zip upload workflow start
-    print(f"[DEBUG] upload_zip: Starting upload for {zip_path}")
-    wait = WebDriverWait(driver, 15)
-    print(f"[DEBUG] upload_zip: Pausing tab monitor")
-    pause_monitor()
+    logger.trace("UPLOAD", "upload_zip: Starting upload for %s", zip_path)
+    logger.trace("UPLOAD", "upload_zip: Pausing tab monitor")
+    pause_monitor(driver)
     
     try:
         print(f"Uploading zip: {zip_path}")
-        print(f"[DEBUG] upload_zip: Waiting 2s for page stability")
-    # breakpoint()  # DEBUG: Before initial wait
-        time.sleep(2)
-        
-        # Find Add button
-        print(f"[DEBUG] upload_zip: Searching for Add button")
-    # breakpoint()  # DEBUG: Before button search
-        add_btn = None
-        for xpath in [
-            "//button[contains(@aria-label, 'Add')]",
-            "//button[contains(@aria-label, 'Import')]",
-            "//button[.//span[text()='add']]",
-        ]:
-            try:
-                print(f"[DEBUG] upload_zip: Trying xpath: {xpath}")
-                els = driver.find_elements(By.XPATH, xpath)
-                print(f"[DEBUG] upload_zip: Found {len(els)} elements")
-                for el in els:
-                    if el.is_displayed():
-                        add_btn = el
-                        print(f"[DEBUG] upload_zip: Found displayed Add button")
-                        break
-                if add_btn:
-                    break
-            except Exception as e:
-                print(f"[DEBUG] upload_zip: Xpath error: {e}")
-                pass
-        
-        if not add_btn:
-            print("Add button not found")
-            print(f"[DEBUG] upload_zip: FAILED - Add button not found")
-    # breakpoint()  # DEBUG: Add button not found
-            return False
-        
-        print(f"[DEBUG] upload_zip: Clicking Add button")
-    # breakpoint()  # DEBUG: Before clicking Add
-        add_btn.click()
-        print("Clicked Add")
-        print(f"[DEBUG] upload_zip: Add button clicked")
-        time.sleep(1)
-        
-        # Click Upload Zip
-        print(f"[DEBUG] upload_zip: Waiting for Upload Zip menu item")
-    # breakpoint()  # DEBUG: Before finding Upload Zip
-        zip_item = wait.until(EC.element_to_be_clickable(
-            (By.XPATH, "//*[contains(text(), 'Upload Zip')]")
-        ))
-        print(f"[DEBUG] upload_zip: Found Upload Zip item")
-    # breakpoint()  # DEBUG: Before clicking Upload Zip
-        zip_item.click()
-        print("Clicked Upload Zip")
-        print(f"[DEBUG] upload_zip: Upload Zip clicked")
-        
-        print(f"[DEBUG] upload_zip: Waiting 2s for file dialog")
-        time.sleep(2)
-        print(f"[DEBUG] upload_zip: Calling handle_native_file_dialog")
-    # breakpoint()  # DEBUG: Before file dialog
-        result = handle_native_file_dialog(zip_path)
-        print(f"[DEBUG] upload_zip: File dialog result: {result}")
-    # breakpoint()  # DEBUG: After file dialog
+        result = upload_via_menu(driver, UPLOAD_ZIP_XPATH, os.path.abspath(zip_path),
+                                 expect_node="core_instructions.md")
+        if result == "dialog":
+            logger.trace("UPLOAD", "upload_zip: Calling handle_native_file_dialog")
+            result = handle_native_file_dialog(zip_path)
+        logger.trace("UPLOAD", "upload_zip: Upload result: %s", result)
+    # breakpoint()  # DEBUG: After upload
         return result
         
     except Exception as e:
         print(f"Upload error: {e}")
-        print(f"[DEBUG] upload_zip: EXCEPTION: {e}")
+        logger.trace("UPLOAD", "upload_zip: EXCEPTION: %s", e)
     # breakpoint()  # DEBUG: Upload error
         return False
     finally:
-        print(f"[DEBUG] upload_zip: Resuming tab monitor")
-        resume_monitor()
+        logger.trace("UPLOAD", "upload_zip: Resuming tab monitor")
+        resume_monitor(driver)
 
 
-def upload_files(driver, files):
-    """Upload individual files via 'Upload files' menu option"""
+def upload_files(driver, files, workspace=None):
+    """Upload individual files via 'Upload files' menu option
+    
+    P30: workspace is {file name: sha256} of what the app already has; files
+    with a matching hash are skipped and successful uploads are recorded in it.
+    """
     # breakpoint()  # DEBUG: File upload workflow
-    wait = WebDriverWait(driver, 15)
-    pause_monitor()
+    pause_monitor(driver)
     
     try:
         for file_name in files:
@@ -655,58 +1421,28 @@ def upload_files(driver, files):
             if not os.path.exists(file_path):
                 print(f"File not found, skipping: {file_path}")
                 continue
-                
-            print(f"Uploading: {file_name}")
-            time.sleep(1)
-            
-            # Find Add button
-            add_btn = None
-            for xpath in [
-                "//button[contains(@aria-label, 'Add')]",
-                "//button[contains(@aria-label, 'Import')]",
-                "//button[.//span[text()='add']]",
-            ]:
-                try:
-                    els = driver.find_elements(By.XPATH, xpath)
-                    for el in els:
-                        if el.is_displayed():
-                            add_btn = el
-                            break
-                    if add_btn:
-                        break
-                except:
-                    pass
             
-            if not add_btn:
-                print("Add button not found")
+            base_name = os.path.basename(file_path)
+            digest = read_file_cached(file_path)[1]
+            if workspace is not None and workspace.get(base_name) == digest:
+                print(f"Already in workspace, skipping upload: {file_name}")
+                UPLOADS_SKIPPED.inc()
                 continue
-            
-            try:
-                add_btn.click()
-            except:
-                driver.execute_script("arguments[0].click();", add_btn)
-            print("Clicked Add")
-            time.sleep(1)
+                
+            print(f"Uploading: {file_name}")
             
             # Click "Upload files" (not "Upload Zip")
-            files_item = wait.until(EC.element_to_be_clickable(
-                (By.XPATH, "//*[contains(text(), 'Upload files') or contains(text(), 'Upload file')]")
-            ))
-            try:
-                files_item.click()
-            except:
-                driver.execute_script("arguments[0].click();", files_item)
-            print("Clicked Upload files")
-            
-            time.sleep(2)
+            result = upload_via_menu(driver, UPLOAD_FILES_XPATH, file_path,
+                                     expect_node=os.path.basename(file_path))
+            if result == "dialog":
+                result = handle_native_file_dialog(file_path)
             
-            # Handle native file dialog
-            if not handle_native_file_dialog(file_path):
+            if not result:
                 print(f"Failed to upload: {file_name}")
             else:
                 print(f"Uploaded: {file_name}")
-            
-            time.sleep(2)
+                if workspace is not None:
+                    workspace[base_name] = digest
         
         return True
         
@@ -714,7 +1450,7 @@ def upload_files(driver, files):
         print(f"Upload files error: {e}")
         return False
     finally:
-        resume_monitor()
+        resume_monitor(driver)
 
 
 def set_system_instructions(driver, instructions, skip_open=False):
@@ -724,128 +1460,122 @@ def set_system_instructions(driver, instructions, skip_open=False):
         skip_open: If True, skip opening settings panel (already open from select_model)
     """
     # breakpoint()  # DEBUG: System instructions workflow start
-    print(f"[DEBUG] set_system_instructions: Starting")
-    print(f"[DEBUG] set_system_instructions: Instructions length: {len(instructions)} chars")
+    logger.trace("SETTINGS", "set_system_instructions: Starting")
+    logger.trace("SETTINGS", "set_system_instructions: Instructions length: %s chars", len(instructions))
     wait = WebDriverWait(driver, 15)
-    print(f"[DEBUG] set_system_instructions: Pausing tab monitor")
-    pause_monitor()
+    logger.trace("SETTINGS", "set_system_instructions: Pausing tab monitor")
+    pause_monitor(driver)
     
     try:
         print("Setting system instructions...")
         
         # Step 1: Open Advanced Settings if not already open
         if not skip_open:
-            print(f"[DEBUG] set_system_instructions: Step 1 - Opening advanced settings")
+            logger.trace("SETTINGS", "set_system_instructions: Step 1 - Opening advanced settings")
             try:
                 adv_settings_btn = driver.find_element(By.XPATH, "//button[contains(@aria-label, 'settings') or contains(@aria-label, 'Settings')]")
-                print(f"[DEBUG] set_system_instructions: Found settings button")
+                logger.trace("SETTINGS", "set_system_instructions: Found settings button")
                 adv_settings_btn.click()
                 print("Opened Advanced settings panel")
-                print(f"[DEBUG] set_system_instructions: Clicked settings button")
+                logger.trace("SETTINGS", "set_system_instructions: Clicked settings button")
                 time.sleep(2)
             except Exception as e:
                 print("Advanced settings panel may already be open or button not found")
-                print(f"[DEBUG] set_system_instructions: Settings button error: {e}")
+                logger.trace("SETTINGS", "set_system_instructions: Settings button error: %s", e)
         else:
-            print("[DEBUG] set_system_instructions: Skipping open (panel already open)")
+            logger.trace("SETTINGS", "set_system_instructions: Skipping open (panel already open)")
         
         # Step 2: Click "System instructions" card button
-        print(f"[DEBUG] set_system_instructions: Step 2 - Finding SI button")
+        logger.trace("SETTINGS", "set_system_instructions: Step 2 - Finding SI button")
     # breakpoint()  # DEBUG: Before finding SI button
         si_button = wait.until(EC.element_to_be_clickable(
             (By.CSS_SELECTOR, "button[data-test-id='instructions-button']")
         ))
-        print(f"[DEBUG] set_system_instructions: Found SI button")
+        logger.trace("SETTINGS", "set_system_instructions: Found SI button")
     # breakpoint()  # DEBUG: Before clicking SI button
         si_button.click()
         print("Clicked System instructions button")
-        print(f"[DEBUG] set_system_instructions: SI button clicked")
+        logger.trace("SETTINGS", "set_system_instructions: SI button clicked")
         time.sleep(2)
         
         # Step 3: Find the textarea with id="custom-si-textarea"
-        print(f"[DEBUG] set_system_instructions: Step 3 - Finding textarea")
+        logger.trace("SETTINGS", "set_system_instructions: Step 3 - Finding textarea")
     # breakpoint()  # DEBUG: Before finding textarea
         sys_textarea = wait.until(EC.visibility_of_element_located(
             (By.ID, "custom-si-textarea")
         ))
-        print(f"[DEBUG] set_system_instructions: Found textarea")
+        logger.trace("SETTINGS", "set_system_instructions: Found textarea")
     # breakpoint()  # DEBUG: Before clicking textarea
         sys_textarea.click()
-        print(f"[DEBUG] set_system_instructions: Clicked textarea")
+        logger.trace("SETTINGS", "set_system_instructions: Clicked textarea")
         time.sleep(0.3)
-        print(f"[DEBUG] set_system_instructions: Clearing textarea")
+        logger.trace("SETTINGS", "set_system_instructions: Clearing textarea")
         sys_textarea.clear()
-        print(f"[DEBUG] set_system_instructions: Textarea cleared")
+        logger.trace("SETTINGS", "set_system_instructions: Textarea cleared")
         time.sleep(0.3)
         
         # Paste instructions
-        print(f"[DEBUG] set_system_instructions: Pasting instructions")
+        logger.trace("SETTINGS", "set_system_instructions: Pasting instructions")
     # breakpoint()  # DEBUG: Before paste
-        if pyperclip:
-            pyperclip.copy(instructions)
-            pyautogui.hotkey('ctrl', 'v')
-            print(f"[DEBUG] set_system_instructions: Pasted via clipboard")
-        else:
+        # P20: Set the value directly - no clipboard, no OS focus
+        try:
+            set_field_value(driver, sys_textarea, instructions)
+            logger.trace("SETTINGS", "set_system_instructions: Set via JavaScript")
+        except Exception as js_err:
+            logger.trace("SETTINGS", "set_system_instructions: JS set failed (%s), typing via send_keys", js_err)
             sys_textarea.send_keys(instructions)
-            print(f"[DEBUG] set_system_instructions: Typed via send_keys")
         
         print("Entered system instructions")
-        print(f"[DEBUG] set_system_instructions: Instructions entered")
+        logger.trace("SETTINGS", "set_system_instructions: Instructions entered")
     # breakpoint()  # DEBUG: After paste
         time.sleep(1)
         
         # Step 4: Click "Save changes" button
-        print(f"[DEBUG] set_system_instructions: Step 4 - Finding Save button")
+        logger.trace("SETTINGS", "set_system_instructions: Step 4 - Finding Save button")
     # breakpoint()  # DEBUG: Before finding Save button
         save_btn = wait.until(EC.element_to_be_clickable(
             (By.XPATH, "//button[contains(@class, 'ms-button-primary') and contains(., 'Save changes')]")
         ))
-        print(f"[DEBUG] set_system_instructions: Found Save button")
+        logger.trace("SETTINGS", "set_system_instructions: Found Save button")
     # breakpoint()  # DEBUG: Before clicking Save
         save_btn.click()
         print("Clicked Save changes")
-        print(f"[DEBUG] set_system_instructions: Save clicked")
+        logger.trace("SETTINGS", "set_system_instructions: Save clicked")
         time.sleep(2)
         
         # Step 5: Close the panels using Escape key (most reliable)
         print("Closing panels with Escape...")
-        print(f"[DEBUG] set_system_instructions: Step 5 - Pressing Escape keys")
+        logger.trace("SETTINGS", "set_system_instructions: Step 5 - Pressing Escape keys")
     # breakpoint()  # DEBUG: Before Escape keys
-        pyautogui.press('escape')
-        print(f"[DEBUG] set_system_instructions: Escape 1 pressed")
-        time.sleep(0.5)
-        pyautogui.press('escape')
-        print(f"[DEBUG] set_system_instructions: Escape 2 pressed")
-        time.sleep(0.5)
-        pyautogui.press('escape')
-        print(f"[DEBUG] set_system_instructions: Escape 3 pressed")
+        press_key(driver, "Escape", times=3)
+        logger.trace("SETTINGS", "set_system_instructions: Escape pressed 3 times")
         time.sleep(1)
         
         print("System instructions saved!")
-        print(f"[DEBUG] set_system_instructions: SUCCESS")
+        logger.trace("SETTINGS", "set_system_instructions: SUCCESS")
     # breakpoint()  # DEBUG: Success
         return True
         
     except Exception as e:
         print(f"System instructions error: {e}")
-        print(f"[DEBUG] set_system_instructions: EXCEPTION: {e}")
+        logger.trace("SETTINGS", "set_system_instructions: EXCEPTION: %s", e)
     # breakpoint()  # DEBUG: Exception
         # Try to close any open dialogs
         try:
-            pyautogui.press('escape')
+            press_key(driver, "Escape")
         except:
             pass
         return False
     finally:
-        print(f"[DEBUG] set_system_instructions: Resuming tab monitor")
-        resume_monitor()
+        logger.trace("SETTINGS", "set_system_instructions: Resuming tab monitor")
+        resume_monitor(driver)
 
 
 def save_app(driver, app_name):
     """Save the app with a specific name"""
     # breakpoint()  # DEBUG: Save app workflow
     wait = WebDriverWait(driver, 15)
-    pause_monitor()
+    pause_monitor(driver)
     
     try:
         print(f"Saving app as: {app_name}")
@@ -888,7 +1618,7 @@ def save_app(driver, app_name):
         print(f"Save app error: {e}")
         return False
     finally:
-        resume_monitor()
+        resume_monitor(driver)
 
 
 def get_app_url(driver):
@@ -900,29 +1630,12 @@ def get_app_url(driver):
     return url
 
 
-def save_agent_url(agent_id, url, filename="agents.json"):
-    """Save the agent URL to a JSON file"""
-    # breakpoint()  # DEBUG: Saving agent URL to JSON
+def save_agent_url(agent_id, url):
+    """Save the agent URL to agents.db (agents.json is only read once, at migration)"""
+    # breakpoint()  # DEBUG: Saving agent URL
     try:
-        filepath = os.path.abspath(filename)
-        
-        agents = {}
-        if os.path.exists(filepath):
-            with open(filepath, "r", encoding="utf-8") as f:
-                try:
-                    agents = json.load(f)
-                except:
-                    agents = {}
-        
-        agents[agent_id] = {
-            "url": url,
-            "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(agents, f, indent=2)
-        
-        print(f"Saved agent '{agent_id}' URL to {filename}")
+        db_upsert_agent(agent_id, drive_url=agent_db.saved_app_url(url))
+        print(f"Saved agent '{agent_id}' URL to {DB_PATH}")
         return True
         
     except Exception as e:
@@ -930,299 +1643,559 @@ def save_agent_url(agent_id, url, filename="agents.json"):
         return False
 
 
-def send_chat_message(driver, message):
-    """Type a message in the chatbox and send it"""
+def submit_chat_message(driver, message):
+    """Type a message in the current tab's chatbox and click Send (does not wait for the AI)
+    
+    Returns:
+        "sent" if the Send button was clicked, "sent_enter" if the Enter-key
+        fallback was used (no completion tracking possible), False on failure
+    """
     # breakpoint()  # DEBUG: Chat message send workflow start
-    print(f"[DEBUG] send_chat_message: ========== STARTING ==========")
-    print(f"[DEBUG] send_chat_message: Message length: {len(message)} chars")
+    logger.trace("CHAT", "send_chat_message: ========== STARTING ==========")
+    logger.trace("CHAT", "send_chat_message: Message length: %s chars", len(message))
     wait = WebDriverWait(driver, 20)  # Increased timeout
-    print(f"[DEBUG] send_chat_message: Pausing tab monitor")
-    pause_monitor()
     
-    try:
-        print(f"[send_chat_message] Starting...")
-        print(f"[send_chat_message] Current URL: {driver.current_url}")
-        print(f"[send_chat_message] Current title: {driver.title}")
-        print(f"[send_chat_message] Message preview: {message[:50]}...")
-        
-        # Step 1: Ensure browser window is focused
-        print(f"[DEBUG] send_chat_message: Step 1 - Focusing browser window")
+    print(f"[send_chat_message] Starting...")
+    # P25: Two WebDriver round trips - only when CHAT tracing is on
+    logger.trace("CHAT", lambda: f"send_chat_message: Current URL: {driver.current_url}")
+    logger.trace("CHAT", lambda: f"send_chat_message: Current title: {driver.title}")
+    print(f"[send_chat_message] Message preview: {message[:50]}...")
+    
+    # Step 1: Ensure browser window is focused
+    logger.trace("CHAT", "send_chat_message: Step 1 - Focusing browser window")
     # breakpoint()  # DEBUG: Before focusing window
-        driver.switch_to.window(driver.current_window_handle)
-        print(f"[DEBUG] send_chat_message: Switched to current window handle")
-        driver.execute_script("window.focus();")
-        print(f"[DEBUG] send_chat_message: Executed window.focus()")
-        time.sleep(0.5)
-        
-        # Step 2: Wait for page to be ready (check for chat container)
-        print(f"[DEBUG] send_chat_message: Step 2 - Finding chat container")
+    driver.switch_to.window(driver.current_window_handle)
+    logger.trace("CHAT", "send_chat_message: Switched to current window handle")
+    driver.execute_script("window.focus();")
+    logger.trace("CHAT", "send_chat_message: Executed window.focus()")
+    time.sleep(0.5)
+    
+    # Step 2: Wait for page to be ready (check for chat container)
+    logger.trace("CHAT", "send_chat_message: Step 2 - Finding chat container")
     # breakpoint()  # DEBUG: Before finding chat container
-        try:
-            wait.until(EC.presence_of_element_located(
-                (By.CSS_SELECTOR, "div.input-container, .chat-input, ms-autosize-textarea")
-            ))
-            print("[send_chat_message] Chat container found")
-            print(f"[DEBUG] send_chat_message: Chat container located")
-        except:
-            print("[send_chat_message] WARNING: Chat container not found, proceeding anyway")
-            print(f"[DEBUG] send_chat_message: WARNING - No chat container")
-        
-        # Step 3: Find the chatbox with multiple fallback selectors
-        print(f"[DEBUG] send_chat_message: Step 3 - Finding chatbox textarea")
+    try:
+        wait.until(EC.presence_of_element_located(
+            (By.CSS_SELECTOR, "div.input-container, .chat-input, ms-autosize-textarea")
+        ))
+        print("[send_chat_message] Chat container found")
+        logger.trace("CHAT", "send_chat_message: Chat container located")
+    except:
+        print("[send_chat_message] WARNING: Chat container not found, proceeding anyway")
+        logger.trace("CHAT", "send_chat_message: WARNING - No chat container")
+    
+    # Step 3: Find the chatbox with multiple fallback selectors
+    logger.trace("CHAT", "send_chat_message: Step 3 - Finding chatbox textarea")
     # breakpoint()  # DEBUG: Before finding chatbox
-        chatbox = None
-        selectors = [
-            "div.input-container textarea",
-            "ms-autosize-textarea textarea",
-            "textarea[placeholder*='message' i]",
-            "textarea[placeholder*='type' i]",
-            ".chat-input textarea",
-            "div.input-area textarea",
-            "textarea:not([readonly])"
-        ]
-        
-        for selector in selectors:
-            try:
-                elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                print(f"[send_chat_message] Selector '{selector}' → {len(elements)} element(s)")
-                print(f"[DEBUG] send_chat_message: Trying selector: {selector} -> {len(elements)} found")
-                for el in elements:
-                    if el.is_displayed() and el.is_enabled():
-                        chatbox = el
-                        print(f"[send_chat_message] ✓ Using: {selector}")
-                        print(f"[DEBUG] send_chat_message: ✓ Using this element")
+    chatbox = None
+    selectors = [
+        "div.input-container textarea",
+        "ms-autosize-textarea textarea",
+        "textarea[placeholder*='message' i]",
+        "textarea[placeholder*='type' i]",
+        ".chat-input textarea",
+        "div.input-area textarea",
+        "textarea:not([readonly])"
+    ]
+    
+    for selector in selectors:
+        try:
+            elements = driver.find_elements(By.CSS_SELECTOR, selector)
+            logger.trace("CHAT", "send_chat_message: Trying selector: %s -> %s found", selector, len(elements))
+            for el in elements:
+                if el.is_displayed() and el.is_enabled():
+                    chatbox = el
+                    print(f"[send_chat_message] ✓ Using: {selector}")
+                    logger.trace("CHAT", "send_chat_message: ✓ Using this element")
     # breakpoint()  # DEBUG: Found chatbox
-                        break
-                if chatbox:
                     break
-            except Exception as e:
-                print(f"[DEBUG] send_chat_message: Selector error: {e}")
-                continue
-        
-        if not chatbox:
-            print("[send_chat_message] ERROR: Chatbox not found!")
-            print(f"[DEBUG] send_chat_message: FAILED - No chatbox found")
+            if chatbox:
+                break
+        except Exception as e:
+            logger.trace("CHAT", "send_chat_message: Selector error: %s", e)
+            continue
+    
+    if not chatbox:
+        print("[send_chat_message] ERROR: Chatbox not found!")
+        logger.trace("CHAT", "send_chat_message: FAILED - No chatbox found")
     # breakpoint()  # DEBUG: Chatbox not found
+        if logger.trace_enabled("CHAT"):
+            # P25: Diagnostics cost 1 + 3N WebDriver calls - tracing only
             textareas = driver.find_elements(By.TAG_NAME, "textarea")
-            print(f"[send_chat_message] Found {len(textareas)} textarea(s) on page")
+            logger.trace("CHAT", "send_chat_message: Found %s textarea(s) on page", len(textareas))
             for i, ta in enumerate(textareas):
                 try:
-                    print(f"  [{i}] displayed={ta.is_displayed()}, enabled={ta.is_enabled()}, class={ta.get_attribute('class')}")
+                    logger.trace("CHAT", "  [%s] displayed=%s, enabled=%s, class=%s",
+                                 i, ta.is_displayed(), ta.is_enabled(), ta.get_attribute('class'))
                 except:
                     pass
-            return False
-        
-        # Step 4: Scroll into view and ensure visibility
+        return False
+    
+    # Step 4: Scroll into view and ensure visibility
+    driver.execute_script("""
+        arguments[0].scrollIntoView({block: 'center', behavior: 'instant'});
+    """, chatbox)
+    time.sleep(0.3)
+    
+    # Step 5: Focus with multiple methods
+    driver.execute_script("arguments[0].focus();", chatbox)
+    time.sleep(0.2)
+    
+    try:
+        chatbox.click()
+    except:
+        driver.execute_script("arguments[0].click();", chatbox)
+    time.sleep(0.3)
+    
+    # Step 6: Clear and type message
+    chatbox.clear()
+    time.sleep(0.2)
+    
+    # Use JavaScript to set value directly - avoids pyautogui OS focus issues
+    # pyautogui types to whatever window has OS focus, not necessarily the browser!
+    try:
+        # Set value directly via JavaScript
         driver.execute_script("""
-            arguments[0].scrollIntoView({block: 'center', behavior: 'instant'});
-        """, chatbox)
-        time.sleep(0.3)
-        
-        # Step 5: Focus with multiple methods
-        driver.execute_script("arguments[0].focus();", chatbox)
-        time.sleep(0.2)
-        
+            arguments[0].value = arguments[1];
+            arguments[0].dispatchEvent(new Event('input', { bubbles: true }));
+            arguments[0].dispatchEvent(new Event('change', { bubbles: true }));
+        """, chatbox, message)
+        print("[send_chat_message] Set message via JavaScript")
+    except Exception as js_err:
+        print(f"[send_chat_message] JS setValue failed: {js_err}, trying send_keys")
+        chatbox.send_keys(message)
+        print("[send_chat_message] Typed message via send_keys")
+    
+    time.sleep(1)
+    
+    # Step 7: Find and click send button
+    send_btn = None
+    send_selectors = [
+        "button.send-button:not([disabled])",
+        "button.send-button",
+        "button[aria-label*='Send' i]",
+        "button[data-test-id='send-button']",
+        ".send-button:not([disabled])",
+    ]
+    
+    for selector in send_selectors:
         try:
-            chatbox.click()
+            elements = driver.find_elements(By.CSS_SELECTOR, selector)
+            for el in elements:
+                if el.is_displayed():
+                    disabled = el.get_attribute("disabled")
+                    classes = el.get_attribute("class") or ""
+                    if not disabled and "disabled" not in classes:
+                        send_btn = el
+                        print(f"[send_chat_message] ✓ Send button: {selector}")
+                        break
+            if send_btn:
+                break
         except:
-            driver.execute_script("arguments[0].click();", chatbox)
-        time.sleep(0.3)
-        
-        # Step 6: Clear and type message
-        chatbox.clear()
-        time.sleep(0.2)
-        
-        # Use JavaScript to set value directly - avoids pyautogui OS focus issues
-        # pyautogui types to whatever window has OS focus, not necessarily the browser!
-        try:
-            # Set value directly via JavaScript
-            driver.execute_script("""
-                arguments[0].value = arguments[1];
-                arguments[0].dispatchEvent(new Event('input', { bubbles: true }));
-                arguments[0].dispatchEvent(new Event('change', { bubbles: true }));
-            """, chatbox, message)
-            print("[send_chat_message] Set message via JavaScript")
-        except Exception as js_err:
-            print(f"[send_chat_message] JS setValue failed: {js_err}, trying send_keys")
-            chatbox.send_keys(message)
-            print("[send_chat_message] Typed message via send_keys")
+            continue
+    
+    if not send_btn:
+        print("[send_chat_message] Send button not found, trying Enter key")
+        chatbox.send_keys("\n")
+        time.sleep(2)
+        print("[send_chat_message] Sent via Enter key")
+        return "sent_enter"
+    
+    # Wait a moment for button to become clickable
+    time.sleep(0.5)
+    
+    # Click with JavaScript to bypass any overlays
+    # P17: Arm the completion observer in the same round trip, before the click,
+    # so the busy -> idle transition can't be missed
+    driver.execute_script(
+        AI_COMPLETION_INSTALL_JS + "window.__xagentCompletion.arm(); arguments[0].click();",
+        send_btn
+    )
+    print("[send_chat_message] ✓ Clicked Send button")
+    return "sent"
+
+
+# =============================================================================
+# P17: Event-Driven AI Completion Detection
+# - A MutationObserver (installed once per page) watches the same indicators as
+#   ai_finished() and records a completion timestamp in window.__xagentCompletion
+# - Completion = no running/thinking/cancel indicator AND no DOM mutations for
+#   AI_QUIET_MS (replaces the fixed 2s "output.md fully written" sleep)
+# - Python reads it with one short execute_script call per poll, so a wait never
+#   holds the instance's executor (P33)
+# =============================================================================
+AI_QUIET_MS = 750  # No DOM mutations for this long after the indicators clear
+AI_START_GRACE_MS = 3000  # If no busy indicator ever shows up, give up waiting for one
+
+AI_COMPLETION_INSTALL_JS = """
+if (!window.__xagentCompletion) {
+    const BUSY = "button.send-button.running, ms-thinking-indicator, button.send-button[aria-label='Cancel']";
+    const QUIET_MS = %d, GRACE_MS = %d;
+    const st = window.__xagentCompletion = {
+        armedAt: 0, busySeen: false, doneAt: 0, lastMutation: 0, waiters: [], timer: null
+    };
+    const isBusy = () => !!document.querySelector(BUSY);
+    st.snapshot = () => ({
+        installed: true, armedAt: st.armedAt, busySeen: st.busySeen,
+        doneAt: st.doneAt, lastMutation: st.lastMutation, now: Date.now()
+    });
+    st.check = () => {
+        if (!st.armedAt || st.doneAt) return;
+        clearTimeout(st.timer);
+        if (isBusy()) { st.busySeen = true; return; }
+        const wait = st.busySeen ? QUIET_MS : Math.max(QUIET_MS, st.armedAt + GRACE_MS - Date.now());
+        st.timer = setTimeout(() => {
+            if (isBusy() || st.doneAt) return;
+            st.doneAt = Date.now();
+            st.waiters.splice(0).forEach(cb => cb(st.snapshot()));
+        }, wait);
+    };
+    st.arm = () => {
+        clearTimeout(st.timer);
+        st.armedAt = Date.now(); st.busySeen = false; st.doneAt = 0;
+        st.check();
+    };
+    new MutationObserver(() => { st.lastMutation = Date.now(); st.check(); })
+        .observe(document.documentElement, {
+            subtree: true, childList: true, characterData: true,
+            attributes: true, attributeFilter: ["class", "aria-label", "disabled"]
+        });
+}
+""" % (AI_QUIET_MS, AI_START_GRACE_MS)
+
+AI_COMPLETION_STATE_JS = """
+const st = window.__xagentCompletion;
+return (st && st.armedAt) ? st.snapshot() : {installed: false};
+"""
+
+
+def ai_completion_state(driver):
+    """Non-blocking read of the observer state (one poll_tab_response check). None if not armed."""
+    result = driver.execute_script(AI_COMPLETION_STATE_JS)
+    if not result or not result.get("installed"):
+        return None
+    return result
+
+
+def ai_finished(driver):
+    """P9 Phase 4: AI finished when no running/thinking/cancel indicators are present"""
+    # Check if still processing
+    running = driver.find_elements(By.CSS_SELECTOR, "button.send-button.running")
+    thinking = driver.find_elements(By.CSS_SELECTOR, "ms-thinking-indicator")
+    cancel = driver.find_elements(By.CSS_SELECTOR, "button.send-button[aria-label='Cancel']")
+    
+    if running or thinking or cancel:
+        return False  # Still processing
+    
+    # Also check for Checkpoint indicator (AI finished writing)
+    checkpoint = driver.find_elements(By.XPATH, "//div[contains(text(), 'Checkpoint')]")
+    if checkpoint:
+        print("[send_chat_message] ✓ Checkpoint detected")
+        return True
         
+    return True  # No processing indicators
+
+
+# =============================================================================
+# P18: Read output.md from the Monaco model
+# - One execute_script returns the whole model text: no tree click, no sleeps,
+#   no per-line .text round trips, and no truncation to the rendered lines
+# - The P9 DOM scrape (click + view-lines) is kept as a fallback
+# =============================================================================
+MONACO_OUTPUT_JS = """
+const monaco = window.monaco || globalThis.monaco;
+if (!monaco || !monaco.editor || !monaco.editor.getModels) return null;
+const model = monaco.editor.getModels().find(m => {
+    const path = (m.uri && (m.uri.path || m.uri.toString())) || "";
+    return /(^|\/)output\.md$/i.test(path);
+});
+return model ? model.getValue() : null;
+"""
+
+
+def read_output_md_model(driver):
+    """Full output.md text from the Monaco model ("" if the model is empty), or None if Monaco isn't reachable"""
+    try:
+        text = driver.execute_script(MONACO_OUTPUT_JS)
+    except Exception as e:
+        print(f"[send_chat_message] Monaco model read failed: {e}")
+        return None
+    if text is None:
+        return None
+    print(f"[send_chat_message] ✓ Read output.md model ({len(text)} chars)")
+    return text.strip()  # Empty model is an answer too: no DOM scrape fallback
+
+
+def read_output_md(driver):
+    """P9 Phase 5: Read the current tab's output.md via the Monaco editor. Returns text ("" for an empty model) or None."""
+    # P18: Fast path - whole model in one script call ("" = model found but empty)
+    text = read_output_md_model(driver)
+    if text is not None:
+        return text
+    
+    print("[send_chat_message] Looking for output.md in file tree...")
+    
+    # Step 1: Find and click output.md in file tree
+    # The file tree uses: mat-tree-node with span.node-name containing filename
+    output_md_clicked = False
+    try:
+        # Find all file nodes in the tree
+        file_nodes = driver.find_elements(By.CSS_SELECTOR, "mat-tree-node span.node-name")
+        for node in file_nodes:
+            if node.text.strip().lower() == "output.md":
+                # Click the parent mat-tree-node to select the file
+                parent_node = node.find_element(By.XPATH, "./ancestor::mat-tree-node")
+                driver.execute_script("arguments[0].click();", parent_node)
+                output_md_clicked = True
+                print("[send_chat_message] ✓ Clicked output.md in file tree")
+                break
+        
+        if not output_md_clicked:
+            print("[send_chat_message] output.md not found in file tree")
+    except Exception as e:
+        print(f"[send_chat_message] Error clicking output.md: {e}")
+    
+    if not output_md_clicked:
+        return None
+    
+    # Step 2: Wait for Monaco editor to load output.md
+    time.sleep(1.5)  # Wait for editor to switch
+    
+    # Verify editor shows output.md (check data-uri attribute)
+    try:
+        editor = driver.find_element(By.CSS_SELECTOR, "div.monaco-editor[data-uri*='output.md']")
+        print("[send_chat_message] ✓ Monaco editor loaded output.md")
+    except:
+        # Editor might just take a moment
         time.sleep(1)
-        
-        # Step 7: Find and click send button
-        send_btn = None
-        send_selectors = [
-            "button.send-button:not([disabled])",
-            "button.send-button",
-            "button[aria-label*='Send' i]",
-            "button[data-test-id='send-button']",
-            ".send-button:not([disabled])",
-        ]
-        
-        for selector in send_selectors:
-            try:
-                elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                for el in elements:
-                    if el.is_displayed():
-                        disabled = el.get_attribute("disabled")
-                        classes = el.get_attribute("class") or ""
-                        if not disabled and "disabled" not in classes:
-                            send_btn = el
-                            print(f"[send_chat_message] ✓ Send button: {selector}")
-                            break
-                if send_btn:
-                    break
-            except:
-                continue
-        
-        if not send_btn:
-            print("[send_chat_message] Send button not found, trying Enter key")
-            chatbox.send_keys("\n")
-            time.sleep(2)
-            print("[send_chat_message] Sent via Enter key")
-            return True
-        
-        # Wait a moment for button to become clickable
-        time.sleep(0.5)
-        
-        # Click with JavaScript to bypass any overlays
-        driver.execute_script("arguments[0].click();", send_btn)
-        print("[send_chat_message] ✓ Clicked Send button")
-        
-        # P9 Phase 4: Wait for AI to finish processing (event-driven via WebDriverWait)
-        response_text = None
+        print("[send_chat_message] Waiting for editor to load output.md...")
+    
+    # Step 3: Read content from Monaco editor view-lines
+    try:
+        # Debug: Try multiple selectors
+        view_lines = driver.find_elements(By.CSS_SELECTOR, "div.view-lines.monaco-mouse-cursor-text div.view-line")
+        logger.trace("CHAT", lambda: f"read_output_md: Found {len(view_lines)} view-line elements")
+        
+        if not view_lines:
+            # Fallback: try without the mouse-cursor-text class
+            view_lines = driver.find_elements(By.CSS_SELECTOR, "div.view-lines div.view-line")
+            logger.trace("CHAT", lambda: f"read_output_md: Fallback found {len(view_lines)} view-line elements")
+        
+        lines = []
+        for line in view_lines:
+            # Each line has span elements with class mtk1, mtk8, etc.
+            line_text = line.text.strip()
+            if line_text:
+                lines.append(line_text)
+        
+        logger.trace("CHAT", lambda: f"read_output_md: Extracted {len(lines)} non-empty lines")
+        
+        if lines:
+            print(f"[send_chat_message] ✓ Read {len(lines)} lines from output.md")
+            return "\n".join(lines)
+    except Exception as e:
+        print(f"[send_chat_message] Error reading Monaco editor: {e}")
+    return None
+
+
+def agent_for_tab(driver):
+    """Find which agent the driver's current tab belongs to"""
+    current_handle = driver.current_window_handle
+    logger.trace("CHAT", lambda: f"agent_for_tab: Looking for handle {current_handle[:20]}... in agent_handles")
+    
+    with agent_handles_lock:
+        tabs = list(agent_handles.items())
+    for aid, tab in tabs:
+        if tab.handle == current_handle and tab.instance.driver is driver:
+            logger.trace("CHAT", "agent_for_tab: Found matching agent: %s", aid)
+            return aid
+    return None
+
+
+def mark_first_response(driver, aid):
+    """P9: After first response, save URL and mark the agent active"""
+    # Check if agent is still in "spawning" status
+    agent_data = db_get_agent(aid)
+    logger.trace("CHAT", lambda: f"mark_first_response: agent_data status = {agent_data.get('status') if agent_data else 'None'}")
+    
+    if agent_data and agent_data.get("status") == "spawning":
+        # First response received! Save URL and mark active
+        current_url = driver.current_url
+        db_upsert_agent(aid, status="active", drive_url=current_url)
+        logger.info("AGENT", f"First response received, agent now active", {
+            "agent_id": aid,
+            "url": current_url[:50]
+        })
+        print(f"[send_chat_message] ✓ Agent {aid} marked ACTIVE, URL saved")
+
+
+def capture_response(driver):
+    """Read output.md and handle first-response bookkeeping. Returns text or None."""
+    response_text = read_output_md(driver)
+    if response_text:
+        logger.debug("CHAT", f"Response captured ({len(response_text)} chars)")
+        aid = agent_for_tab(driver)
+        if aid:
+            mark_first_response(driver, aid)
+            event_bus.publish("response", {"agent_id": aid, "response": response_text})
+    return response_text
+
+
+# =============================================================================
+# P14: Parallel Broadcast Engine
+# - Phase A: submit the message to every tab of an instance back to back
+# - Phase B: one poll loop per instance checks all of its pending tabs each tick
+# - Instances run in their own threads; results are yielded as agents finish,
+#   so wall-clock time tracks the slowest agent instead of the sum
+# =============================================================================
+BROADCAST_TIMEOUT = 120  # Same budget a single chat gets
+BROADCAST_SETTLE = 2  # P9 "output.md fully written" pause (fallback when the P17 observer isn't armed)
+BROADCAST_POLL_INTERVAL = 0.25  # P17: Each poll is a single script call per tab
+
+
+def poll_tab_response(driver, label, state, timed_out):
+    """One check of one tab; returns ("done", response) or None to keep waiting
+    
+    `state` starts as {"idle_since": None} and is carried from poll to poll.
+    """
+    if state["idle_since"] is None:
+        # P17: One script call reads the observer; it already waited
+        # out the quiet period, so no settle pause is needed
+        completion = ai_completion_state(driver)
+        if completion is not None and completion["doneAt"]:
+            state["idle_since"] = time.time() - BROADCAST_SETTLE
+        elif completion is None and ai_finished(driver):
+            state["idle_since"] = time.time()
+        elif timed_out:
+            print(f"[poll] Timeout waiting for {label}, proceeding anyway...")
+            state["idle_since"] = time.time() - BROADCAST_SETTLE
+        else:
+            return None
+    if time.time() - state["idle_since"] < BROADCAST_SETTLE:
+        return None
+    with tracing.span("capture_response"):
+        return ("done", capture_response(driver))
+
+
+def await_tab_response(executor, handle, label, timeout=BROADCAST_TIMEOUT):
+    """Wait for the AI to finish on one tab, then capture output.md (None if empty)
+    
+    P33: Every check is its own short executor item and the sleeps between them
+    happen on the calling thread, so the instance keeps serving other tabs.
+    """
+    state = {"idle_since": None}
+    deadline = time.time() + timeout
+    while True:
+        time.sleep(BROADCAST_POLL_INTERVAL)
+        outcome = executor.run(handle, poll_tab_response, label, state, time.time() >= deadline)
+        if outcome is not None:
+            return outcome[1]
+
+
+def _broadcast_on_instance(instance, tabs, message, results, timeout):
+    """Submit to every tab in `tabs`, then poll them together until all finish
+    
+    P33: Each per-tab step is an executor item, so submits/polls for the same
+    tab are batched and other API traffic on this instance interleaves safely.
+    """
+    executor = instance.executor
+    started = time.time()
+    pending = {}  # {agent_id: {"handle": ..., "idle_since": None}}
+    
+    def finish(aid, result):
+        result["elapsed"] = round(time.time() - started, 2)
+        results.put((aid, result))
+    
+    # Phase A: submit everywhere before waiting anywhere
+    live_handles = page_targets(instance)
+    submits = {}
+    for aid, handle in tabs:
+        if handle not in live_handles:
+            print(f"[broadcast] Handle for {aid} is stale, skipping")
+            finish(aid, {"success": False, "error": "Tab was closed"})
+            continue
+        submits[aid] = (handle, executor.submit(handle, submit_chat_message, message))
+    
+    for aid, (handle, future) in submits.items():
         try:
-            print("[send_chat_message] Waiting for AI to finish (event-driven)...")
-            
-            # Custom expected condition: AI finished when no running/thinking/cancel indicators
-            def ai_finished(driver):
-                # Check if still processing
-                running = driver.find_elements(By.CSS_SELECTOR, "button.send-button.running")
-                thinking = driver.find_elements(By.CSS_SELECTOR, "ms-thinking-indicator")
-                cancel = driver.find_elements(By.CSS_SELECTOR, "button.send-button[aria-label='Cancel']")
-                
-                if running or thinking or cancel:
-                    return False  # Still processing
-                
-                # Also check for Checkpoint indicator (AI finished writing)
-                checkpoint = driver.find_elements(By.XPATH, "//div[contains(text(), 'Checkpoint')]")
-                if checkpoint:
-                    print("[send_chat_message] ✓ Checkpoint detected")
-                    return True
-                    
-                return True  # No processing indicators
-            
-            # Wait up to 120 seconds for AI to finish (event-driven, not polling)
-            wait = WebDriverWait(driver, 120, poll_frequency=1)
-            try:
-                wait.until(ai_finished)
-                print("[send_chat_message] ✓ AI finished processing")
-            except TimeoutException:
-                print("[send_chat_message] Timeout waiting for AI, proceeding anyway...")
-            
-            # Brief pause to ensure output.md is fully written
-            time.sleep(2)
-            
-            # P9 Phase 5: Read response from output.md via Monaco editor
-            print("[send_chat_message] Looking for output.md in file tree...")
-            
-            # Step 1: Find and click output.md in file tree
-            # The file tree uses: mat-tree-node with span.node-name containing filename
-            output_md_clicked = False
+            sent = future.result()
+        except Exception as e:
+            print(f"[broadcast] ✗ {aid}: Exception - {e}")
+            finish(aid, {"success": False, "error": str(e)})
+            continue
+        
+        if not sent:
+            finish(aid, {"success": False, "error": "Failed to send"})
+        elif sent == "sent_enter":
+            finish(aid, {"success": True})
+        else:
+            pending[aid] = {"handle": handle, "idle_since": None}
+            print(f"[broadcast] ✓ {aid}: Submitted")
+    
+    # Phase B: shared poll loop across this instance's pending tabs
+    deadline = started + timeout
+    while pending:
+        time.sleep(BROADCAST_POLL_INTERVAL)
+        timed_out = time.time() >= deadline
+        polls = {aid: executor.submit(state["handle"], poll_tab_response, aid, state, timed_out)
+                 for aid, state in pending.items()}
+        for aid, future in polls.items():
             try:
-                # Find all file nodes in the tree
-                file_nodes = driver.find_elements(By.CSS_SELECTOR, "mat-tree-node span.node-name")
-                for node in file_nodes:
-                    if node.text.strip().lower() == "output.md":
-                        # Click the parent mat-tree-node to select the file
-                        parent_node = node.find_element(By.XPATH, "./ancestor::mat-tree-node")
-                        driver.execute_script("arguments[0].click();", parent_node)
-                        output_md_clicked = True
-                        print("[send_chat_message] ✓ Clicked output.md in file tree")
-                        break
-                
-                if not output_md_clicked:
-                    print("[send_chat_message] output.md not found in file tree")
+                outcome = future.result()
+                if outcome is None:
+                    continue
+                response = outcome[1]
+                del pending[aid]
+                if response:
+                    finish(aid, {"success": True, "response": response})
+                else:
+                    finish(aid, {"success": True})
+                print(f"[broadcast] ✓ {aid}: Finished")
             except Exception as e:
-                print(f"[send_chat_message] Error clicking output.md: {e}")
+                del pending[aid]
+                print(f"[broadcast] ✗ {aid}: Exception - {e}")
+                finish(aid, {"success": False, "error": str(e)})
+
+
+def broadcast_message(targets, message, timeout=BROADCAST_TIMEOUT):
+    """Broadcast to {agent_id: AgentTab}; yields (agent_id, result) in completion order"""
+    by_instance = {}
+    for aid, tab in targets.items():
+        by_instance.setdefault(tab.instance, []).append((aid, tab.handle))
+    
+    results = queue.Queue()
+    paused = [instance.driver for instance in by_instance]
+    for driver in paused:
+        pause_monitor(driver)
+    try:
+        for instance, tabs in by_instance.items():
+            if instance.driver is None:
+                for aid, _ in tabs:
+                    results.put((aid, {"success": False, "error": "Browser instance is down"}))
+                continue
             
-            if output_md_clicked:
-                # Step 2: Wait for Monaco editor to load output.md
-                time.sleep(1.5)  # Wait for editor to switch
-                
-                # Verify editor shows output.md (check data-uri attribute)
-                try:
-                    editor = driver.find_element(By.CSS_SELECTOR, "div.monaco-editor[data-uri*='output.md']")
-                    print("[send_chat_message] ✓ Monaco editor loaded output.md")
-                except:
-                    # Editor might just take a moment
-                    time.sleep(1)
-                    print("[send_chat_message] Waiting for editor to load output.md...")
-                
-                # Step 3: Read content from Monaco editor view-lines
-                try:
-                    # Debug: Try multiple selectors
-                    view_lines = driver.find_elements(By.CSS_SELECTOR, "div.view-lines.monaco-mouse-cursor-text div.view-line")
-                    print(f"[send_chat_message] DEBUG: Found {len(view_lines)} view-line elements")
-                    
-                    if not view_lines:
-                        # Fallback: try without the mouse-cursor-text class
-                        view_lines = driver.find_elements(By.CSS_SELECTOR, "div.view-lines div.view-line")
-                        print(f"[send_chat_message] DEBUG: Fallback found {len(view_lines)} view-line elements")
-                    
-                    lines = []
-                    for line in view_lines:
-                        # Each line has span elements with class mtk1, mtk8, etc.
-                        line_text = line.text.strip()
-                        if line_text:
-                            lines.append(line_text)
-                    
-                    print(f"[send_chat_message] DEBUG: Extracted {len(lines)} non-empty lines")
-                    
-                    if lines:
-                        response_text = "\n".join(lines)
-                        print(f"[send_chat_message] ✓ Read {len(lines)} lines from output.md")
-                        logger.debug("CHAT", f"Response captured ({len(response_text)} chars)")
-                        
-                        # P9: After first response, save URL and mark agent active
-                        # Find which agent this tab belongs to
-                        current_handle = driver.current_window_handle
-                        print(f"[send_chat_message] DEBUG: Looking for handle {current_handle[:20]}... in agent_handles")
-                        print(f"[send_chat_message] DEBUG: agent_handles = {list(agent_handles.keys())}")
-                        
-                        for aid, handle in agent_handles.items():
-                            if handle == current_handle:
-                                print(f"[send_chat_message] DEBUG: Found matching agent: {aid}")
-                                # Check if agent is still in "spawning" status
-                                agent_data = db_get_agent(aid)
-                                print(f"[send_chat_message] DEBUG: agent_data status = {agent_data.get('status') if agent_data else 'None'}")
-                                
-                                if agent_data and agent_data.get("status") == "spawning":
-                                    # First response received! Save URL and mark active
-                                    current_url = driver.current_url
-                                    db_upsert_agent(aid, status="active", drive_url=current_url)
-                                    logger.info("AGENT", f"First response received, agent now active", {
-                                        "agent_id": aid,
-                                        "url": current_url[:50]
-                                    })
-                                    print(f"[send_chat_message] ✓ Agent {aid} marked ACTIVE, URL saved")
-                                break
+            def run(instance=instance, tabs=tabs):
+                try:
+                    _broadcast_on_instance(instance, tabs, message, results, timeout)
                 except Exception as e:
-                    print(f"[send_chat_message] Error reading Monaco editor: {e}")
-                     
-        except Exception as e:
-            logger.warning("CHAT", f"Response capture failed: {e}")
-        
-        print(f"[send_chat_message] ✓ Message sent successfully!")
-        return response_text if response_text else True
+                    # Anything not reported yet is lost with this instance
+                    for aid, _ in tabs:
+                        results.put((aid, {"success": False, "error": str(e)}))
+            
+            threading.Thread(target=run, daemon=True).start()
         
-    except Exception as e:
-        print(f"[send_chat_message] ERROR: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        reported = set()
+        while len(reported) < len(targets):
+            aid, result = results.get()
+            if aid in reported:
+                continue
+            reported.add(aid)
+            CHATS.inc(mode="broadcast", result="succeeded" if result["success"] else "failed")
+            if result.get("elapsed") is not None:
+                CHAT_SECONDS.observe(result["elapsed"], mode="broadcast")
+            yield aid, result
     finally:
-        resume_monitor()
+        for driver in paused:
+            resume_monitor(driver)
 
 
 def select_model(driver, model_name="Gemini 3 Pro Preview", skip_close=False):
@@ -1233,7 +2206,7 @@ def select_model(driver, model_name="Gemini 3 Pro Preview", skip_close=False):
     """
     # breakpoint()  # DEBUG: Model selection workflow
     wait = WebDriverWait(driver, 15)
-    pause_monitor()
+    pause_monitor(driver)
     
     try:
         print(f"Selecting model: {model_name}")
@@ -1266,9 +2239,7 @@ def select_model(driver, model_name="Gemini 3 Pro Preview", skip_close=False):
         # Step 4: Close the panel with Escape (unless skip_close is True)
         if not skip_close:
             print("Closing Advanced settings...")
-            pyautogui.press('escape')
-            time.sleep(0.5)
-            pyautogui.press('escape')
+            press_key(driver, "Escape", times=2)
             time.sleep(1)
         else:
             print("Keeping settings panel open for next step...")
@@ -1277,12 +2248,160 @@ def select_model(driver, model_name="Gemini 3 Pro Preview", skip_close=False):
         
     except Exception as e:
         print(f"Model selection error: {e}")
-        pyautogui.press('escape')
-        time.sleep(0.5)
-        pyautogui.press('escape')
+        try:
+            press_key(driver, "Escape", times=2)
+        except:
+            pass
         return False
     finally:
-        resume_monitor()
+        resume_monitor(driver)
+
+
+# =============================================================================
+# P34: Warm Blank-App Tab Pool
+# - Keeps XAGENT_WARM_TABS tabs per instance with the blank app loaded and
+#   DEFAULT_MODEL selected; a full spawn claims one and skips the
+#   navigate + select_model phases
+# - Refilled in the background once an instance drops to the low-water mark
+#   (XAGENT_WARM_TABS_LOW). Warm-up is split into short items on the executor's
+#   idle lane (P33), run only while nothing else is queued: open tab + start navigation,
+#   then (after the page settles, outside the executor) select the model.
+#   Queued chats/spawns wait for at most one step - the model selection,
+#   a few seconds - which is why the pool is off by default
+# =============================================================================
+DEFAULT_MODEL = "Gemini 3 Pro Preview"
+WARM_TABS = max(0, int(os.getenv("XAGENT_WARM_TABS", "0")))
+WARM_TABS_LOW = max(0, min(WARM_TABS - 1, int(os.getenv("XAGENT_WARM_TABS_LOW", str(WARM_TABS // 2)))))
+WARM_TAB_LOAD_WAIT = 5  # Same settle time spawn_agent gives a fresh blank app
+WARM_TAB_LOAD_CHECKS = 6  # Readiness re-checks before a tab that never loads is discarded
+
+
+def _back_to(driver, previous):
+    """Never leave the driver on a pooled tab (a first-agent spawn uses the current tab)"""
+    try:
+        driver.switch_to.window(previous)
+    except Exception:
+        pass
+
+
+def open_warm_tab(driver):
+    """Executor item: open a tab and start loading the blank app (no wait), then go back. Returns its handle."""
+    previous = driver.current_window_handle
+    driver.switch_to.new_window('tab')
+    handle = driver.current_window_handle
+    try:
+        # Non-blocking navigation: the page loads while the executor serves other work
+        driver.execute_script("window.location.href = arguments[0];", NEW_APP_URL)
+        return handle
+    finally:
+        _back_to(driver, previous)
+
+
+def finish_warm_tab(driver, handle):
+    """Executor item: select DEFAULT_MODEL on a loaded warm tab, then go back
+    
+    Returns True when the tab is ready, False if the page is still loading
+    (check again later), None if model selection failed (tab closed).
+    """
+    previous = driver.current_window_handle
+    driver.switch_to.window(handle)
+    try:
+        if driver.execute_script("return document.readyState") != "complete":
+            return False
+        if select_model(driver, DEFAULT_MODEL):
+            return True
+        driver.close()
+        return None
+    finally:
+        _back_to(driver, previous)
+
+
+def discard_warm_tab(driver, handle):
+    """Executor item: close a warm tab by targetId (no tab switch)"""
+    driver.execute_cdp_cmd("Target.closeTarget", {"targetId": handle})
+
+
+class WarmTabPool:
+    """Ready blank-app tabs per pool instance"""
+    
+    def __init__(self, size=WARM_TABS, low=WARM_TABS_LOW):
+        self.size = size
+        self.low = low
+        self._tabs = {}  # {instance: [(driver, handle)]}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        if self.size and self._thread is None:
+            self._thread = threading.Thread(target=self._refill_loop, name="warm-tabs", daemon=True)
+            self._thread.start()
+            logger.info("AGENT", "Warm tab pool started", {"size": self.size, "low": self.low})
+        self._wake.set()
+    
+    def count(self, instance):
+        with self._lock:
+            return sum(1 for driver, _ in self._tabs.get(instance, []) if driver is instance.driver)
+    
+    def claim(self, instance):
+        """Take a ready tab on `instance` (None if there is none); triggers a refill"""
+        if not self.size:
+            return None
+        handle = None
+        with self._lock:
+            tabs = self._tabs.pop(instance, [])
+        if tabs:
+            open_tabs = page_targets(instance)
+            # Skip tabs of a restarted browser or closed meanwhile; the refill replaces them
+            live = [(driver, h) for driver, h in tabs if driver is instance.driver and h in open_tabs]
+            if live:
+                handle = live.pop(0)[1]
+            with self._lock:
+                self._tabs.setdefault(instance, [])[:0] = live
+        WARM_TAB_CLAIMS.inc(result="hit" if handle else "miss")
+        self._wake.set()
+        return handle
+    
+    def _warm_one(self, instance):
+        """Open, load and configure one tab on `instance`. Returns its handle or None."""
+        driver = instance.driver
+        handle = instance.executor.run_idle(None, open_warm_tab)
+        for _ in range(WARM_TAB_LOAD_CHECKS):
+            time.sleep(WARM_TAB_LOAD_WAIT)  # Settles outside the executor
+            if instance.driver is not driver:
+                return None  # Browser restarted
+            ready = instance.executor.run_idle(None, finish_warm_tab, handle)
+            if ready:
+                return handle
+            if ready is None:
+                return None
+        instance.executor.run_idle(None, discard_warm_tab, handle)
+        return None
+    
+    def _refill_loop(self):
+        while True:
+            self._wake.wait(timeout=30)
+            self._wake.clear()
+            for instance in list(driver_pool.instances):
+                if instance.driver is None or self.count(instance) > self.low:
+                    continue
+                while self.count(instance) < self.size:
+                    driver = instance.driver
+                    try:
+                        handle = self._warm_one(instance)
+                    except Exception as e:
+                        logger.warning("AGENT", f"Warm tab failed on instance {instance.index}", {"error": str(e)})
+                        break
+                    if not handle:
+                        break
+                    with self._lock:
+                        self._tabs.setdefault(instance, []).append((driver, handle))
+                    logger.debug("AGENT", "Warm tab ready", {"instance": instance.index, "handle": handle[:20]})
+
+
+warm_tab_pool = WarmTabPool()
+
+AWAITING_INIT = "awaiting_init"  # spawn_agent sent the init message; await_init_response() collects the reply
 
 
 def spawn_agent(driver, agent_id):
@@ -1292,15 +2411,21 @@ def spawn_agent(driver, agent_id):
     - Phase 0: Check if agent has URL in DB
     - Phase R: Reactivate (if URL exists) - fast path
     - Phase 1-8: Full spawn (if no URL)
+    
+    Returns AWAITING_INIT once the init message is submitted (the reply is not
+    waited for here), True/False otherwise.
     """
     # breakpoint()  # DEBUG: Agent spawn workflow start
-    global agent_handles
-    
     logger.info("AGENT", f"Spawn requested: {agent_id}")
     
+    # P13: "First agent" and tab bookkeeping are per pool instance
+    instance = driver_pool.instance_of(driver) or driver_pool.adopt(driver)
+    instance_agents = [aid for aid in instance.agent_ids() if aid != agent_id]
+    
     # ==========================================================================
     # P8 Phase 0: Check for Reactivation
     # ==========================================================================
+    mark_phase("reactivation_check")
     existing_agent = db_get_agent(agent_id)
     
     if existing_agent and existing_agent.get("drive_url"):
@@ -1308,6 +2433,7 @@ def spawn_agent(driver, agent_id):
         # P8 Phase R: Reactivate (fast path)
         # =======================================================================
         logger.info("AGENT", f"Reactivating {agent_id} from saved URL")
+        mark_phase("reactivate")
         saved_url = existing_agent["drive_url"]
         print(f"[REACTIVATE] Saved URL from DB: {saved_url}")
         
@@ -1317,7 +2443,7 @@ def spawn_agent(driver, agent_id):
             print(f"[REACTIVATE] Current tabs: {len(handles_before)}")
             
             # Check if we already have agent tabs (besides the base AI Studio tab)
-            is_first_agent = len(agent_handles) == 0
+            is_first_agent = len(instance_agents) == 0
             
             if is_first_agent:
                 # First agent - navigate in current tab (no new tab needed)
@@ -1327,7 +2453,7 @@ def spawn_agent(driver, agent_id):
             else:
                 # Not first agent - open new tab then navigate
                 print(f"[REACTIVATE] P12: Additional agent - opening new tab")
-                print(f"[REACTIVATE] P12: Current handles in memory: {list(agent_handles.keys())}")
+                print(f"[REACTIVATE] P12: Current handles in memory: {instance_agents}")
                 
                 # P12 Fix: Robust new tab detection
                 before_tabs = driver.window_handles
@@ -1373,9 +2499,10 @@ def spawn_agent(driver, agent_id):
                 current_url = driver.current_url
                 
                 # Check if we're on AI Studio (not an error page)
-                if "aistudio.google.com" in current_url:
+                if AISTUDIO_HOST in current_url:
                     # Store handle in memory
-                    agent_handles[agent_id] = new_handle
+                    with agent_handles_lock:
+                        agent_handles[agent_id] = AgentTab(instance, new_handle)
                     
                     # Update status in DB
                     db_upsert_agent(agent_id, status="active")
@@ -1398,6 +2525,7 @@ def spawn_agent(driver, agent_id):
     # P8 Phase 1: Full Spawn (no saved URL)
     # ==========================================================================
     logger.info("AGENT", f"Full spawn starting for {agent_id}")
+    mark_phase("create_zip")
     
     # Get agent skill info
     skill = get_agent_skill(agent_id)
@@ -1415,12 +2543,19 @@ def spawn_agent(driver, agent_id):
     # P11 Fix 1: Open new tab if there are already active agents
     # P12 Fix: Use robust new tab detection (compare before/after handles)
     # ==========================================================================
-    print(f"[spawn_agent] P12 CHECK: agent_handles = {agent_handles}", flush=True)
-    logger.info("AGENT", f"P12 tab check", {"agent_handles_count": len(agent_handles), "agents": list(agent_handles.keys())})
-    
-    if agent_handles:
-        print(f"[spawn_agent] P12: {len(agent_handles)} agents already active, opening new tab", flush=True)
-        print(f"[spawn_agent] P12: Current handles in memory: {list(agent_handles.keys())}", flush=True)
+    mark_phase("new_tab")
+    print(f"[spawn_agent] P12 CHECK: instance {instance.index} agents = {instance_agents}", flush=True)
+    logger.info("AGENT", f"P12 tab check", {"instance": instance.index, "agent_handles_count": len(instance_agents), "agents": instance_agents})
+    
+    # P34: A pre-warmed tab already has the blank app loaded and the model selected
+    warm_handle = warm_tab_pool.claim(instance)
+    if warm_handle:
+        driver.switch_to.window(warm_handle)
+        print(f"[spawn_agent] P34: ✓ Claimed warm tab {warm_handle[:20]}...", flush=True)
+        logger.info("AGENT", "P34: Claimed warm tab", {"handle": warm_handle[:20], "instance": instance.index})
+    elif instance_agents:
+        print(f"[spawn_agent] P12: {len(instance_agents)} agents already active, opening new tab", flush=True)
+        print(f"[spawn_agent] P12: Current handles in memory: {instance_agents}", flush=True)
         
         # Get handles BEFORE opening new tab
         before_tabs = driver.window_handles
@@ -1467,35 +2602,43 @@ def spawn_agent(driver, agent_id):
         print(f"[spawn_agent] P12: First agent, using current tab", flush=True)
         logger.info("AGENT", "P12: First agent, using current tab")
     
-    # Navigate to new app page
-    url = "https://aistudio.google.com/apps/bundled/blank?showAssistant=true&showCode=true"
-    print(f"Navigating to: {url}")
-    driver.get(url)
-    time.sleep(5)
-    
-    # Select Gemini 3 Pro Preview model (keep panel open for system instructions)
-    select_model(driver, "Gemini 3 Pro Preview", skip_close=True)
+    if not warm_handle:
+        # Navigate to new app page
+        url = NEW_APP_URL
+        mark_phase("navigate")
+        print(f"Navigating to: {url}")
+        driver.get(url)
+        time.sleep(5)
+        
+        # Select Gemini 3 Pro Preview model (keep panel open for system instructions)
+        mark_phase("select_model")
+        select_model(driver, DEFAULT_MODEL, skip_close=True)
     
-    # Set system instructions from SKILL.md (panel already open from select_model)
-    # This closes the panel when done
-    set_system_instructions(driver, skill["skill_content"], skip_open=True)
+    # Set system instructions from SKILL.md (panel already open from select_model,
+    # P34: a warm tab's panel is closed, so open it). This closes the panel when done
+    mark_phase("system_instructions")
+    set_system_instructions(driver, skill["skill_content"], skip_open=not warm_handle)
     
     # Now upload files (panel is closed)
     # Upload the agent zip
+    mark_phase("upload_zip")
     if not upload_zip(driver, zip_path):
         print(f"Failed to upload zip for {agent_id}")
         return False
+    workspace = package_manifest(skill)  # P30: what this new app now contains
     
     # Upload core.txt (the project documentation these agents work on)
-    core_txt = os.path.abspath("core.txt")
+    mark_phase("upload_core")
+    core_txt = os.path.abspath(CORE_TXT)
     if os.path.exists(core_txt):
         print(f"Uploading project: core.txt")
-        upload_files(driver, ["core.txt"])
+        upload_files(driver, [CORE_TXT], workspace)  # Skipped if packed into the zip
     else:
         print(f"core.txt not found, skipping project upload")
     
     # Save app with agent name
     app_name = f"AGENT: {agent_id}"
+    mark_phase("save_app")
     save_app(driver, app_name)
     
     # Get app URL (save it for later, after first response)
@@ -1507,6 +2650,7 @@ def spawn_agent(driver, agent_id):
         agent_id=agent_id,
         name=skill["name"],
         description=skill["description"],
+        files_uploaded=json.dumps(workspace),  # P30: {file name: sha256} in this app
         status="spawning"  # Not "active" until first response
         # drive_url=app_url  # Saved after first response
     )
@@ -1537,65 +2681,135 @@ DO NOT respond in the chat. Write to output.md file ONLY.
 Confirm you understand by editing output.md with STATUS: READY."""
     
     # Store window handle in memory BEFORE sending init message
-    # This is needed so send_chat_message can find this agent and update status
-    agent_handles[agent_id] = driver.current_window_handle
-    logger.debug("AGENT", "Tab handle stored", {"agent_id": agent_id, "handle": agent_handles[agent_id]})
-    
-    send_chat_message(driver, init_message)
+    # This is needed so capture_response can find this agent and update status
+    with agent_handles_lock:
+        agent_handles[agent_id] = AgentTab(instance, driver.current_window_handle)
+    notify_agents_changed()
+    logger.debug("AGENT", "Tab handle stored", {"agent_id": agent_id, "instance": instance.index, "handle": agent_handles[agent_id].handle})
+    
+    mark_phase("init_message")
+    pause_monitor(driver)
+    try:
+        sent = submit_chat_message(driver, init_message)
+    finally:
+        resume_monitor(driver)
     
     logger.info("AGENT", "Agent spawned successfully", {"agent_id": agent_id})
-    return True
+    # P33: The caller waits for the init response in short poll items, off this item
+    return AWAITING_INIT if sent == "sent" else True
+
+
+def await_init_response(agent_id):
+    """Wait for the reply to spawn_agent's init message (capture_response marks the agent ACTIVE)"""
+    with agent_handles_lock:
+        tab = agent_handles.get(agent_id)
+    if not tab:
+        return None
+    pause_monitor(tab.instance.driver)
+    try:
+        return await_tab_response(tab.instance.executor, tab.handle, agent_id)
+    except Exception as e:
+        logger.warning("AGENT", f"Init response capture failed: {agent_id}", {"error": str(e)})
+        return None
+    finally:
+        resume_monitor(tab.instance.driver)
+
+
+# =============================================================================
+# P31: CDP Target Discovery
+# - Tab titles/URLs come from CDP targets (a WebDriver handle is the page's
+#   targetId), so finding AGENT: tabs never switches tabs or sleeps
+# - Each pool instance gets a TargetWatcher: its own DevTools websocket,
+#   updated from Target.targetCreated/targetInfoChanged/targetDestroyed
+# - Without DevTools access it falls back to one Target.getTargets call
+# =============================================================================
+TARGET_WATCHER_RETRY_SECONDS = 30
+_target_watchers_lock = threading.Lock()
+
+
+def target_watcher(instance):
+    """Live TargetWatcher for the instance's current browser, or None if DevTools is unreachable"""
+    driver = instance.driver
+    if driver is None:
+        return None
+    with _target_watchers_lock:
+        watcher = instance.targets
+        if watcher and watcher.owner is driver and watcher.alive:
+            return watcher
+        if watcher:
+            watcher.close()
+            instance.targets = None
+        if time.time() < instance.targets_retry_at:
+            return None
+        
+        address = (driver.capabilities.get("goog:chromeOptions") or {}).get("debuggerAddress")
+        try:
+            if not address:
+                raise RuntimeError("no debuggerAddress in capabilities")
+            watcher = cdp_targets.TargetWatcher(cdp_targets.browser_ws_url(address),
+                                                name=f"cdp-targets-{instance.index}", owner=driver)
+            if not watcher.start():
+                raise RuntimeError(f"cannot connect to {address}")
+        except Exception as e:
+            instance.targets_retry_at = time.time() + TARGET_WATCHER_RETRY_SECONDS
+            logger.warning("TAB", f"CDP target watcher unavailable on instance {instance.index}, "
+                                  f"using Target.getTargets", {"error": str(e)})
+            return None
+        
+        watcher.add_listener(lambda event, info: on_target_event(instance, event, info))  # P32
+        instance.targets = watcher
+        logger.info("TAB", f"CDP target watcher started for instance {instance.index}",
+                    {"pages": len(watcher.pages())})
+        return watcher
+
+
+def page_targets(instance):
+    """{handle (targetId): targetInfo} for every tab of the instance, without switching"""
+    watcher = target_watcher(instance)
+    if watcher:
+        return watcher.pages()
+    with instance.lock:
+        infos = instance.driver.execute_cdp_cmd("Target.getTargets", {}).get("targetInfos", [])
+    return {info["targetId"]: info for info in infos if info.get("type") == "page"}
+
+
+def agent_id_from_title(title):
+    """'AGENT: XXX | ...' -> 'XXX' (None for other tabs)"""
+    if "AGENT:" not in title:
+        return None
+    return title.split("AGENT:", 1)[1].split("|")[0].strip() or None
 
 
 def capture_agent_handles(driver):
-    """Scan all open tabs and capture handles for AGENT: tabs"""
+    """Scan all open tabs and capture handles for AGENT: tabs (P31: from CDP targets)"""
     # breakpoint()  # DEBUG: Scanning tabs for agent handles
-    global agent_handles
+    instance = driver_pool.instance_of(driver) or driver_pool.adopt(driver)
     
-    try:
-        original_handle = driver.current_window_handle
-    except:
-        original_handle = None
+    pages = page_targets(instance)
+    print(f"[capture_agent_handles] Scanning {len(pages)} tabs on instance {instance.index}...")
     
-    handles = driver.window_handles
-    print(f"[capture_agent_handles] Scanning {len(handles)} tabs...")
+    HANDLE_RESCANS.inc()
     
-    # Clear old handles that are no longer valid
-    agent_handles = {k: v for k, v in agent_handles.items() if v in handles}
-    
-    for handle in handles:
-        try:
-            driver.switch_to.window(handle)
-            time.sleep(0.5)  # Wait for title to load
-            title = driver.title
-            url = driver.current_url
-            
-            print(f"[capture_agent_handles] Tab: {handle[:20]}... | Title: {title[:40]}")
-            
-            # Look for "AGENT: XXX" in title
-            if "AGENT:" in title:
-                parts = title.split("AGENT:")
-                if len(parts) > 1:
-                    agent_id = parts[1].split("|")[0].strip()
-                    if agent_id:
-                        agent_handles[agent_id] = handle
-                        print(f"[capture_agent_handles] ✓ Found {agent_id} → {handle}")
-        except Exception as e:
-            print(f"[capture_agent_handles] Error on handle {handle}: {e}")
+    # Clear old handles (for this instance) that are no longer valid
+    with agent_handles_lock:
+        for aid, tab in list(agent_handles.items()):
+            if tab.instance is instance and tab.handle not in pages:
+                del agent_handles[aid]
+                STALE_HANDLES.inc()
     
-    # Return to original tab
-    if original_handle and original_handle in handles:
-        try:
-            driver.switch_to.window(original_handle)
-        except:
-            pass
-    elif handles:
-        try:
-            driver.switch_to.window(handles[0])
-        except:
-            pass
+    for handle, info in pages.items():
+        title = info.get("title", "")
+        logger.trace("CHAT", "capture_agent_handles: Tab %s... | Title: %s", handle[:20], title[:40])
+        
+        # Look for "AGENT: XXX" in title
+        agent_id = agent_id_from_title(title)
+        if agent_id:
+            with agent_handles_lock:
+                agent_handles[agent_id] = AgentTab(instance, handle)
+            print(f"[capture_agent_handles] ✓ Found {agent_id} → {handle}")
     
-    print(f"[capture_agent_handles] Result: {list(agent_handles.keys())}")
+    print(f"[capture_agent_handles] Result: {instance.agent_ids()}")
+    notify_agents_changed()
     return agent_handles
 
 
@@ -1609,7 +2823,7 @@ def login_to_google(driver, wait):
         logger.warning("LOGIN", "No credentials in .env, manual login required")
         return
 
-    pause_monitor()
+    pause_monitor(driver)
 
     try:
         logger.info("LOGIN", "Entering email...")
@@ -1640,13 +2854,13 @@ def login_to_google(driver, wait):
         logger.error("LOGIN", "Auto-login failed, manual login required", {"error": str(e)})
         try:
             WebDriverWait(driver, 120).until(
-                lambda d: "aistudio.google.com" in d.current_url
+                lambda d: AISTUDIO_HOST in d.current_url
             )
             logger.info("LOGIN", "Manual login completed")
         except:
             logger.warning("LOGIN", "Login timeout, continuing anyway")
     finally:
-        resume_monitor()
+        resume_monitor(driver)
 
 
 
@@ -1656,16 +2870,11 @@ def main():
     extension_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "extension"))
     profile_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "chrome_profile"))
     
-    options = uc.ChromeOptions()
-    options.add_argument(f"--load-extension={extension_path}")
-    options.add_argument(f"--user-data-dir={profile_path}")
-    options.add_argument("--no-first-run")
-    options.add_argument("--no-default-browser-check")
-    
     print(f"Extension: {extension_path}")
     print(f"Profile: {profile_path}")
     
-    driver = uc.Chrome(options=options)
+    driver = init_driver(profile_path)
+    driver_pool.adopt(driver)
     wait = WebDriverWait(driver, 30)
     
     try:
@@ -1673,7 +2882,7 @@ def main():
         time.sleep(8)
         
         # Navigate to AI Studio
-        url = "https://aistudio.google.com/apps/bundled/blank?showAssistant=true&showCode=true"
+        url = NEW_APP_URL
         print(f"Navigating to: {url}")
         driver.get(url)
         time.sleep(5)
@@ -1688,7 +2897,8 @@ def main():
         
         # Standalone mode: spawn one agent
         agent_id = "CTO-001"
-        spawn_agent(driver, agent_id)
+        if spawn_agent(driver, agent_id) == AWAITING_INIT:
+            await_init_response(agent_id)
 
         print("\nBrowser ready. Press Ctrl+C to exit.")
         while True:
@@ -1715,23 +2925,98 @@ def main():
 app = Flask(__name__)
 CORS(app)
 
-@app.route('/api/status', methods=['GET'])
-def api_status():
-    return jsonify({
+# P15: Bounded worker pool for spawn/chat jobs
+job_manager = jobs.JobManager(max_workers=int(os.getenv("XAGENT_JOB_WORKERS", "4")))
+job_manager.add_listener(lambda job: event_bus.publish("job", job.to_dict()))
+
+
+# =============================================================================
+# P35: Spawn Scheduler (see spawn_scheduler.py)
+# - /api/spawn queues a request: bounded (XAGENT_SPAWN_QUEUE), ordered by
+#   priority class (XAGENT_SPAWN_PRIORITIES), one request per agent_id
+# - A request is dispatched once an instance has a free spawn slot
+#   (XAGENT_SPAWNS_PER_INSTANCE); only then does it take a job worker
+# - The queue position is kept in job.progress["queue_position"] (pushed over /api/events)
+# =============================================================================
+SPAWN_PRIORITY_RULES = spawn_scheduler.parse_priorities(
+    os.getenv("XAGENT_SPAWN_PRIORITIES", spawn_scheduler.DEFAULT_PRIORITIES))
+
+
+def run_spawn(spawn_request):
+    """Job body for a dispatched spawn (P8/P13: serialized per instance by its executor)"""
+    agent_id = spawn_request.agent_id
+    instance = spawn_request.instance
+    started = time.time()
+    spawned = False
+    try:
+        # P12: Ensure browser is running, recover if dead
+        if not ensure_instance(instance):
+            raise RuntimeError("Browser not initialized and recovery failed")
+        with tracing.trace(agent_id, "spawn", instance=instance.index):
+            mark_phase("wait_instance")
+            # P33: Runs on the instance's executor thread (queued behind other tab work)
+            print(f"[api_spawn] P13: Queued {agent_id} on instance {instance.index} executor", flush=True)
+            spawned = instance.executor.run(None, spawn_agent, agent_id)
+            print(f"[api_spawn] P13: Instance {instance.index} finished {agent_id}", flush=True)
+            if spawned == AWAITING_INIT:
+                mark_phase("init_response")
+                await_init_response(agent_id)
+    finally:
+        driver_pool.release(instance)
+        spawn_queue.finish(spawn_request)
+        SPAWNS.inc(result="succeeded" if spawned else "failed")
+        SPAWN_SECONDS.observe(time.time() - started)
+    
+    if not spawned:
+        raise RuntimeError(f"Spawn failed for {agent_id} - check backend logs")
+    return {"agent_id": agent_id, "instance": instance.index}
+
+
+def start_spawn(spawn_request):
+    job = spawn_request.job
+    job.params["instance"] = spawn_request.instance.index
+    job.set_progress("queue_position", None)
+    job_manager.start(job, run_spawn, spawn_request)
+
+
+def spawn_start_failed(spawn_request, error):
+    """The job could not be handed to a worker: undo the instance reservation and fail the job"""
+    driver_pool.release(spawn_request.instance)
+    job_manager.fail(spawn_request.job, f"Spawn could not be started: {error}")
+    SPAWNS.inc(result="failed")
+    logger.error("AGENT", f"Spawn start failed: {spawn_request.agent_id}", {"error": str(error)})
+
+
+spawn_queue = spawn_scheduler.SpawnScheduler(
+    # An agent that already has a tab spawns on that tab's browser; otherwise the browser with
+    # the fewest agents and pending spawns wins, skipping browsers whose spawn slots are all in use
+    pick_instance=lambda agent_id, has_slot: driver_pool.assign(agent_id, accept=has_slot),
+    start=start_spawn,
+    max_queue=int(os.getenv("XAGENT_SPAWN_QUEUE", str(spawn_scheduler.MAX_QUEUE))),
+    per_instance=int(os.getenv("XAGENT_SPAWNS_PER_INSTANCE", str(spawn_scheduler.SPAWNS_PER_INSTANCE))),
+    on_position=lambda spawn_request: spawn_request.job.set_progress("queue_position", spawn_request.position),
+    on_start_failed=spawn_start_failed)
+metrics.REGISTRY.gauge("xagent_spawn_queue_depth", "Spawn requests waiting for an instance slot",
+                       callback=lambda: spawn_queue.queue_depth())
+
+def status_snapshot():
+    return {
         "status": "online" if driver_ref else "offline",
-        "driver_initialized": driver_ref is not None
-    })
+        "driver_initialized": driver_ref is not None,
+        "pool": driver_pool.describe()
+    }
 
-@app.route('/api/agents', methods=['GET'])
-def api_agents():
-    """Return only agents that have active window handles (from memory + DB info)"""
-    global agent_handles
-    
+
+def agents_snapshot():
+    """Agents that have active window handles (from memory + DB info)"""
     active = {}
     
     # For each agent with a window handle, get its info from database
-    for agent_id in agent_handles.keys():
-        agent_data = db_get_agent(agent_id)
+    with agent_handles_lock:
+        agent_ids = list(agent_handles.keys())
+    rows = db_get_agents(agent_ids)
+    for agent_id in agent_ids:
+        agent_data = rows.get(agent_id)
         if agent_data:
             active[agent_id] = {
                 "id": agent_id,
@@ -1752,64 +3037,157 @@ def api_agents():
                 "created_at": ""
             }
     
-    return jsonify(active)
+    return active
+
+
+def agents_etag(status=None):
+    """P27: Changes whenever an agent record or the set of open agent tabs changes"""
+    with agent_handles_lock:
+        handles = ",".join(sorted(agent_handles))
+    key = f"{status}|{agent_db.registry.version}|{handles}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def notify_agents_changed():
+    """P16: Push the current agent map to /api/events subscribers"""
+    if event_bus.subscriber_count():
+        event_bus.publish("agents", agents_snapshot())
+
+
+def notify_status():
+    """P16: Push browser status to /api/events subscribers"""
+    event_bus.publish("status", status_snapshot())
+
+
+@app.route('/api/status', methods=['GET'])
+def api_status():
+    return jsonify(status_snapshot())
+
+@app.route('/api/agents', methods=['GET'])
+def api_agents():
+    """Return only agents that have active window handles (from memory + DB info)
+
+    ?status=inactive|spawning|active lists stored agents with that status instead.
+    """
+    status = request.args.get('status')
+    
+    # P27: Cheap revalidation - nothing is built when the client's copy is current
+    etag = agents_etag(status)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    
+    if status:
+        response = jsonify({row["id"]: {
+            "id": row["id"],
+            "name": row.get("name") or row["id"],
+            "description": row.get("description") or "",
+            "url": row.get("drive_url") or "",
+            "status": row["status"],
+            "created_at": row.get("created_at") or ""
+        } for row in db_get_all_agents(status)})
+    else:
+        response = jsonify(agents_snapshot())
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@app.route('/api/events', methods=['GET'])
+def api_events():
+    """P16: Server-Sent Events stream (status, agents, agent, job, response)"""
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    q, replayed = event_bus.subscribe(int(last_event_id) if last_event_id.isdigit() else None)
+    # Snapshots are taken now and sent after the replayed (older) events
+    initial = [("status", status_snapshot()), ("agents", agents_snapshot())]
+    return Response(
+        stream_with_context(event_bus.stream(q, initial, replayed)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.route('/api/roster', methods=['GET'])
 def api_roster():
-    roster = {}
-    if os.path.exists(SKILLS_PATH):
-        for agent_id in os.listdir(SKILLS_PATH):
-            skill = get_agent_skill(agent_id)
-            if skill:
-                category = agent_id.split("-")[0] if "-" in agent_id else "OTHER"
-                if category not in roster:
-                    roster[category] = []
-                roster[category].append({
-                    "id": agent_id,
-                    "name": skill["name"],
-                    "description": skill["description"]
-                })
-    return jsonify(roster)
+    # P28: Served from the skill index; rebuilt only when a SKILL.md changes
+    roster, etag = skill_index.roster()
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(roster)
+        response.headers["Cache-Control"] = "no-cache"
+    response.set_etag(etag, weak=True)
+    return response
 
 @app.route('/api/spawn', methods=['POST'])
 def api_spawn():
     # breakpoint()  # DEBUG: API spawn endpoint hit
-    global driver_ref
-    
-    # P12: Ensure browser is running, recover if dead
-    driver_ref = ensure_browser()
-    if not driver_ref:
-        return jsonify({"error": "Browser not initialized and recovery failed"}), 503
-    
     data = request.json
     agent_id = data.get('agent_id')
     if not agent_id:
         return jsonify({"error": "Missing agent_id"}), 400
+    if not driver_pool.instances:
+        return jsonify({"error": "Browser not initialized"}), 503
     
+    # P35: Priority class from the agent ID unless the caller sets one
+    priority = data.get('priority')
+    if priority is None:
+        priority = spawn_scheduler.priority_for(agent_id, SPAWN_PRIORITY_RULES)
     try:
-        def do_spawn():
-            # P8: Acquire lock to prevent parallel spawns
-            # This ensures agent_handles is properly populated before next spawn checks it
-            with spawn_lock:
-                print(f"[api_spawn] P8: Lock acquired for {agent_id}", flush=True)
-                spawn_agent(driver_ref, agent_id)
-                print(f"[api_spawn] P8: Lock released for {agent_id}", flush=True)
-        
-        t = threading.Thread(target=do_spawn, daemon=True)
-        t.start()
-        
-        return jsonify({"status": "spawning", "agent_id": agent_id})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        priority = int(priority)
+    except (TypeError, ValueError):
+        return jsonify({"error": "priority must be an integer"}), 400
+    
+    try:
+        spawn_request, created = spawn_queue.submit(agent_id, priority, lambda: job_manager.create(
+            "spawn", params={"agent_id": agent_id, "priority": priority}))
+    except spawn_scheduler.QueueFull as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "5"
+        return response, 429
+    
+    info = spawn_request.to_dict()
+    print(f"[api_spawn] P35: {agent_id} {info['state']} (priority {priority}, position {info['position']}, "
+          f"deduplicated {not created})", flush=True)
+    return jsonify({
+        "status": "queued" if info["state"] == "queued" else "spawning",
+        "agent_id": agent_id,
+        "instance": info["instance"],
+        "job_id": info["job_id"],
+        "priority": spawn_request.priority,
+        "queue_position": info["position"],
+        "deduplicated": not created
+    }), 202
+
+@app.route('/api/spawn/queue', methods=['GET'])
+def api_spawn_queue():
+    """P35: Queued spawns in dispatch order (with positions) and running spawns"""
+    return jsonify(spawn_queue.snapshot())
+
+@app.route('/api/spawn/cancel', methods=['POST'])
+def api_spawn_cancel():
+    """P35: Cancel a queued spawn {agent_id}. A spawn that already started is left to finish."""
+    agent_id = (request.json or {}).get('agent_id')
+    if not agent_id:
+        return jsonify({"error": "Missing agent_id"}), 400
+    spawn_request = spawn_queue.cancel(agent_id)
+    if spawn_request:
+        job_manager.cancel(spawn_request.job, "Cancelled while queued")
+        SPAWNS.inc(result="cancelled")
+        return jsonify({"cancelled": True, "agent_id": agent_id, "job_id": spawn_request.job.id})
+    running = spawn_queue.get(agent_id)
+    if running:
+        return jsonify({"error": f"Spawn for {agent_id} is already running", "job_id": running.job.id}), 409
+    return jsonify({"error": f"No queued spawn for {agent_id}"}), 404
 
 @app.route('/api/deactivate', methods=['POST'])
 def api_deactivate():
     """Deactivate an agent: close its tab and mark as inactive"""
-    global driver_ref, agent_handles
+    global driver_ref
     
     print(f"[api_deactivate] ═══════════════════════════════════════")
     
-    if not driver_ref:
+    # Any live pool instance will do (driver_ref is only instance 0)
+    if not any(i.driver for i in driver_pool.instances):
         print("[api_deactivate] ERROR: Browser not initialized")
         return jsonify({"error": "Browser not initialized"}), 503
     
@@ -1823,52 +3201,67 @@ def api_deactivate():
     print(f"[api_deactivate] Deactivating: {agent_id}")
     logger.info("AGENT", f"Deactivating agent: {agent_id}")
     
-    # Pause tab monitor during deactivation
-    pause_monitor()
+    # Find the agent's window handle
+    with agent_handles_lock:
+        tab = agent_handles.get(agent_id)
+    
+    # Pause tab monitor on the agent's browser during deactivation
+    paused_driver = tab.instance.driver if tab else None
+    if paused_driver:
+        pause_monitor(paused_driver)
+    started = time.time()
+    outcome = "failed"
     
     try:
-        # Find the agent's window handle
-        handle = agent_handles.get(agent_id)
-        print(f"[api_deactivate] Handle in memory: {handle}")
+        print(f"[api_deactivate] Handle in memory: {tab.handle if tab else None}")
         print(f"[api_deactivate] All handles in memory: {list(agent_handles.keys())}")
         
-        if handle:
-            try:
+        if tab:
+            instance, handle = tab
+            
+            def close_tab(driver):
+                # P33: Untargeted executor item - it switches/closes tabs itself
                 # Check if handle is still valid
-                current_handles = driver_ref.window_handles
-                print(f"[api_deactivate] Browser handles: {len(current_handles)}")
+                current_handles = driver.window_handles
+                print(f"[api_deactivate] Instance {instance.index} handles: {len(current_handles)}")
                 
                 if handle in current_handles:
                     # Switch to the tab and close it
                     print(f"[api_deactivate] Switching to tab...")
-                    driver_ref.switch_to.window(handle)
+                    driver.switch_to.window(handle)
                     print(f"[api_deactivate] Closing tab...")
-                    driver_ref.close()
+                    driver.close()
                     
                     # Switch back to another tab
-                    remaining_handles = driver_ref.window_handles
+                    remaining_handles = driver.window_handles
                     if remaining_handles:
-                        driver_ref.switch_to.window(remaining_handles[0])
+                        driver.switch_to.window(remaining_handles[0])
                         print(f"[api_deactivate] Switched to first remaining tab")
                     
                     logger.info("AGENT", f"Closed tab for {agent_id}")
                     print(f"[api_deactivate] ✓ Tab closed")
                 else:
                     print(f"[api_deactivate] Handle no longer valid (tab already closed?)")
-                
+            
+            try:
+                instance.executor.run(None, close_tab)
             except InvalidSessionIdException:
-                # P12 Fix: Browser session is dead - mark driver_ref as stale
-                print(f"[api_deactivate] P12: Browser session dead, marking driver_ref as None")
-                driver_ref = None
-                agent_handles.clear()  # All handles are invalid now
+                # P12 Fix: Browser session is dead - mark the instance as stale
+                print(f"[api_deactivate] P12: Browser session dead, dropping instance {instance.index}")
+                instance.driver = None
+                if instance.index == 0:
+                    driver_ref = None
+                drop_instance_handles(instance)  # All handles on this instance are invalid now
+                notify_status()
             except Exception as tab_error:
                 print(f"[api_deactivate] Tab close error (non-fatal): {tab_error}")
                 # Continue even if tab close fails
             
             # Remove from memory (check first - may have been cleared by InvalidSessionIdException)
-            if agent_id in agent_handles:
-                del agent_handles[agent_id]
-                print(f"[api_deactivate] ✓ Removed from memory")
+            with agent_handles_lock:
+                if agent_id in agent_handles:
+                    del agent_handles[agent_id]
+                    print(f"[api_deactivate] ✓ Removed from memory")
         else:
             print(f"[api_deactivate] Agent not in memory (already deactivated?)")
         
@@ -1877,6 +3270,7 @@ def api_deactivate():
         print(f"[api_deactivate] ✓ DB updated to 'inactive'")
         logger.info("AGENT", f"Agent marked inactive: {agent_id}")
         
+        outcome = "succeeded"
         return jsonify({"status": "deactivated", "agent_id": agent_id})
         
     except Exception as e:
@@ -1886,151 +3280,219 @@ def api_deactivate():
         logger.error("AGENT", f"Deactivation failed: {e}")
         return jsonify({"error": str(e)}), 500
     finally:
-        resume_monitor()
+        DEACTIVATES.inc(result=outcome)
+        DEACTIVATE_SECONDS.observe(time.time() - started)
+        if paused_driver:
+            resume_monitor(paused_driver)
+
+
+def rescan_agent_handles():
+    """P13: Rescan AGENT: tabs on every live pool instance"""
+    for instance in driver_pool.instances:
+        if instance.driver is None:
+            continue
+        try:
+            capture_agent_handles(instance.driver)  # P31: no tab switching, so no instance lock
+        except Exception as e:
+            print(f"[rescan_agent_handles] Instance {instance.index} scan failed: {e}")
+
+
+def resolve_agent_tab(agent_id):
+    """Return a live AgentTab for agent_id, rescanning tabs if unknown or stale"""
+    with agent_handles_lock:
+        tab = agent_handles.get(agent_id)
+    
+    if not tab:
+        print(f"[api_chat] Agent {agent_id} not in stored handles, rescanning...")
+        rescan_agent_handles()
+    else:
+        # Validate handle is still valid (P31: cached CDP targets, no WebDriver call)
+        current_handles = page_targets(tab.instance) if tab.instance.driver else {}
+        if tab.handle not in current_handles:
+            print(f"[api_chat] Handle {tab.handle} is STALE! Rescanning...")
+            rescan_agent_handles()
+    
+    with agent_handles_lock:
+        return agent_handles.get(agent_id)
+
+
+def chat_with_agent(agent_id, tab, message):
+    """Send a message on an agent's tab and wait for its response
+    
+    P33: Like a P14 broadcast, the submit and every completion check are short
+    items on the instance's executor (which switches and verifies), and all
+    waiting happens on this thread, so other tabs are served in between.
+    """
+    instance, handle = tab
+    executor = instance.executor
+    driver = instance.driver
+    if driver is None:
+        print(f"[api_chat] Instance {instance.index} is down")
+        return False
+    print(f"[api_chat] Queuing chat for tab: {handle} (instance {instance.index})")
+    
+    def submit_on_tab(driver, settled):
+        if executor.last_switched and not settled:
+            return "settle"  # Let the page stabilize after the switch (slept off the executor)
+        
+        logger.trace("CHAT", lambda: f"api_chat: Now on tab: {driver.title}")
+        logger.trace("CHAT", lambda: f"api_chat: URL: {driver.current_url}")
+        return submit_chat_message(driver, message)
+    
+    pause_monitor(driver)
+    try:
+        sent = executor.run(handle, submit_on_tab, False)
+        if sent == "settle":
+            time.sleep(2.5)
+            sent = executor.run(handle, submit_on_tab, True)
+        if not sent:
+            return False
+        if sent == "sent_enter":
+            return True
+        
+        # P9 Phase 4-5 / P17: Wait for the AI, then read output.md
+        response_text = None
+        try:
+            print("[api_chat] Waiting for AI to finish (event-driven)...")
+            with tracing.span("wait:ai_completion", "wait"):
+                response_text = await_tab_response(executor, handle, agent_id)
+        except Exception as e:
+            logger.warning("CHAT", f"Response capture failed: {e}")
+        
+        print(f"[api_chat] ✓ Message sent successfully!")
+        return response_text if response_text else True
+        
+    except Exception as e:
+        print(f"[api_chat] ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        resume_monitor(driver)
+
+
+def chat_single(agent_id, message):
+    """Send to one agent. Returns (payload, http_status)."""
+    tab = resolve_agent_tab(agent_id)
+    if not tab:
+        return {"error": f"Agent {agent_id} not found in any tab"}, 404
+    
+    print(f"[api_chat] Target handle for {agent_id}: {tab.handle}")
+    started = time.time()
+    result = None
+    with tracing.trace(agent_id, "chat", instance=tab.instance.index):
+        mark_phase("send")
+        try:
+            result = chat_with_agent(agent_id, tab, message)
+        finally:
+            CHATS.inc(mode="single", result="succeeded" if result else "failed")
+            CHAT_SECONDS.observe(time.time() - started, mode="single")
+    
+    # P9: Return response if captured
+    if result:
+        if isinstance(result, str):
+            return {
+                "status": "sent",
+                "agent_id": agent_id,
+                "response": result
+            }, 200
+        else:
+            return {
+                "status": "sent",
+                "agent_id": agent_id
+            }, 200
+    else:
+        return {"error": "Failed to send message - check backend logs"}, 500
+
+
+def chat_broadcast(targets, message):
+    """Broadcast to {agent_id: AgentTab} and summarize the per-agent results"""
+    results = {}
+    success_count = 0
+    error_count = 0
+    
+    mark_phase("broadcast")
+    for aid, result in broadcast_message(targets, message):
+        results[aid] = result
+        jobs.progress(aid, "succeeded" if result["success"] else "failed")
+        if result["success"]:
+            success_count += 1
+        else:
+            error_count += 1
+    
+    print(f"[api_chat] ═══════════════════════════════════════")
+    print(f"[api_chat] BROADCAST COMPLETE: {success_count} success, {error_count} failed")
+    
+    return {
+        "broadcast": True,
+        "total": len(targets),
+        "success_count": success_count,
+        "error_count": error_count,
+        "results": results
+    }
+
 
 @app.route('/api/chat', methods=['POST'])
 def api_chat():
     # breakpoint()  # DEBUG: API chat endpoint hit
-    global driver_ref, agent_handles
-    if not driver_ref:
+    # Any live pool instance will do (driver_ref is only instance 0)
+    if not any(i.driver for i in driver_pool.instances):
         return jsonify({"error": "Browser not initialized"}), 503
     
     data = request.json
     message = data.get('message')
     agent_id = data.get('agent_id')
+    run_async = bool(data.get('async'))  # P15: {"async": true} returns a job_id immediately
     
     if not message:
         return jsonify({"error": "Missing message"}), 400
     
     try:
-        # Get current valid handles from browser
-        current_handles = driver_ref.window_handles
         print(f"[api_chat] ═══════════════════════════════════════")
-        print(f"[api_chat] Browser tabs open: {len(current_handles)}")
+        print(f"[api_chat] Pool instances: {len(driver_pool.instances)}")
         print(f"[api_chat] Stored agent handles: {list(agent_handles.keys())}")
         
         if agent_id:
-            if agent_id not in agent_handles:
-                print(f"[api_chat] Agent {agent_id} not in stored handles, rescanning...")
-                capture_agent_handles(driver_ref)
-            
-            if agent_id not in agent_handles:
-                return jsonify({"error": f"Agent {agent_id} not found in any tab"}), 404
-            
-            handle = agent_handles[agent_id]
-            print(f"[api_chat] Target handle for {agent_id}: {handle}")
-            
-            # Validate handle is still valid
-            if handle not in current_handles:
-                print(f"[api_chat] Handle {handle} is STALE! Rescanning...")
-                capture_agent_handles(driver_ref)
+            if run_async:
+                def do_chat():
+                    payload, code = chat_single(agent_id, message)
+                    if code != 200:
+                        raise RuntimeError(payload["error"])
+                    return payload
                 
-                if agent_id not in agent_handles:
-                    return jsonify({"error": f"Agent {agent_id} tab was closed"}), 404
-                    
-                handle = agent_handles[agent_id]
-                print(f"[api_chat] New handle after rescan: {handle}")
-            
-            # Switch to the agent's tab
-            print(f"[api_chat] Switching to tab: {handle}")
-            driver_ref.switch_to.window(handle)
-            
-            # Wait for switch and verify
-            time.sleep(1)
-            actual_handle = driver_ref.current_window_handle
-            if actual_handle != handle:
-                print(f"[api_chat] WARNING: Switch may have failed. Current: {actual_handle}")
-            
-            # Additional wait for page to stabilize
-            time.sleep(1.5)
-            
-            print(f"[api_chat] Now on tab: {driver_ref.title}")
-            print(f"[api_chat] URL: {driver_ref.current_url}")
+                job = job_manager.submit("chat", do_chat, params={"agent_id": agent_id})
+                return jsonify({"status": "queued", "agent_id": agent_id, "job_id": job.id}), 202
             
-            # Send the message and capture response
-            result = send_chat_message(driver_ref, message)
-            
-            # P9: Return response if captured
-            if result:
-                if isinstance(result, str):
-                    return jsonify({
-                        "status": "sent",
-                        "agent_id": agent_id,
-                        "response": result
-                    })
-                else:
-                    return jsonify({
-                        "status": "sent",
-                        "agent_id": agent_id
-                    })
-            else:
-                return jsonify({"error": "Failed to send message - check backend logs"}), 500
+            payload, code = chat_single(agent_id, message)
+            return jsonify(payload), code
                 
         else:
             # =====================================================================
             # P10: BROADCAST MODE - Send to ALL active agents
             # =====================================================================
-            if not agent_handles:
+            with agent_handles_lock:
+                targets = dict(agent_handles)
+            if not targets:
                 return jsonify({"error": "No active agents to broadcast to"}), 400
             
             print(f"[api_chat] ═══════════════════════════════════════")
-            print(f"[api_chat] BROADCAST MODE: Sending to {len(agent_handles)} agents")
-            print(f"[api_chat] Agents: {list(agent_handles.keys())}")
+            print(f"[api_chat] BROADCAST MODE: Sending to {len(targets)} agents")
+            print(f"[api_chat] Agents: {list(targets.keys())}")
             
-            results = {}
-            success_count = 0
-            error_count = 0
+            if run_async:
+                job = job_manager.submit("broadcast", chat_broadcast, targets, message,
+                                         params={"agents": list(targets.keys())})
+                return jsonify({"status": "queued", "broadcast": True, "job_id": job.id}), 202
             
-            for aid in list(agent_handles.keys()):  # Use list() to avoid dict modification during iteration
-                print(f"[api_chat] ───────────────────────────────────────")
-                print(f"[api_chat] Broadcasting to: {aid}")
+            # P14: {"stream": true} returns one NDJSON line per agent as it finishes
+            if data.get('stream'):
+                def generate():
+                    for aid, result in broadcast_message(targets, message):
+                        yield json.dumps({"agent_id": aid, **result}) + "\n"
                 
-                try:
-                    handle = agent_handles[aid]
-                    
-                    # Validate handle is still valid
-                    if handle not in current_handles:
-                        print(f"[api_chat] Handle for {aid} is stale, skipping")
-                        results[aid] = {"success": False, "error": "Tab was closed"}
-                        error_count += 1
-                        continue
-                    
-                    # Switch to agent's tab
-                    driver_ref.switch_to.window(handle)
-                    time.sleep(1)
-                    
-                    print(f"[api_chat] Switched to: {driver_ref.title}")
-                    
-                    # Send message and capture response
-                    response = send_chat_message(driver_ref, message)
-                    
-                    if response:
-                        if isinstance(response, str):
-                            results[aid] = {"success": True, "response": response}
-                        else:
-                            results[aid] = {"success": True}
-                        success_count += 1
-                        print(f"[api_chat] ✓ {aid}: Message sent")
-                    else:
-                        results[aid] = {"success": False, "error": "Failed to send"}
-                        error_count += 1
-                        print(f"[api_chat] ✗ {aid}: Send failed")
-                        
-                except Exception as e:
-                    print(f"[api_chat] ✗ {aid}: Exception - {e}")
-                    results[aid] = {"success": False, "error": str(e)}
-                    error_count += 1
+                return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
             
-            print(f"[api_chat] ═══════════════════════════════════════")
-            print(f"[api_chat] BROADCAST COMPLETE: {success_count} success, {error_count} failed")
-            
-            return jsonify({
-                "broadcast": True,
-                "total": len(agent_handles),
-                "success_count": success_count,
-                "error_count": error_count,
-                "results": results
-            })
+            return jsonify(chat_broadcast(targets, message))
             
     except Exception as e:
         print(f"[api_chat] EXCEPTION: {e}")
@@ -2039,6 +3501,70 @@ def api_chat():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/jobs', methods=['GET'])
+def api_jobs():
+    """P15: List recent jobs, optionally filtered by ?kind= and ?state="""
+    kind = request.args.get('kind')
+    state = request.args.get('state')
+    return jsonify([job.to_dict() for job in job_manager.list(kind=kind, state=state)])
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job(job_id):
+    """P15: State, per-phase timings and result of one job"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/api/traces', methods=['GET'])
+def api_traces():
+    """P22: Agents with buffered spans and their span counts"""
+    return jsonify(tracing.tracer.agent_ids())
+
+
+@app.route('/api/traces/<agent_id>', methods=['GET'])
+def api_agent_traces(agent_id):
+    """P22: Spawn/chat timelines for one agent (?format=chrome for chrome://tracing / Perfetto)"""
+    if request.args.get('format') == 'chrome':
+        spans = tracing.tracer.spans(agent_id, trace_id=request.args.get('trace_id'))
+        return jsonify(tracing.to_chrome_trace(spans))
+    return jsonify({"agent_id": agent_id, "traces": tracing.tracer.traces(agent_id)})
+
+
+@app.route('/api/debug', methods=['GET', 'POST'])
+def api_debug():
+    """P25: Toggle debug tracing / per-category file levels at runtime
+    
+    POST {"trace": {"CHAT": true, "UPLOAD": false}} or {"trace": {"*": true}}
+         {"levels": {"TAB": "WARNING", "CHROME": null}}
+    """
+    if request.method == 'POST':
+        data = request.json or {}
+        for category, enabled in (data.get('trace') or {}).items():
+            logger.set_trace(category, bool(enabled))
+        try:
+            for category, level in (data.get('levels') or {}).items():
+                logger.set_level(category, level)
+        except KeyError as e:
+            return jsonify({"error": f"Unknown level {e}; use one of {list(Logger.LEVELS)}"}), 400
+        logger.info("LOGGER", "Instrumentation updated", data)
+    
+    return jsonify({
+        "trace": sorted(logger.debug_categories),
+        "trace_categories": Logger.TRACE_CATEGORIES,
+        "file_level": logger.file_level,
+        "levels": logger.category_levels
+    })
+
+
+@app.route('/api/metrics', methods=['GET'])
+def api_metrics():
+    """P23: Prometheus text exposition (cheap: counters are only formatted here)"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
 def run_flask():
     # Quiet down Werkzeug logging - hide /api/status spam
     import logging
@@ -2048,7 +3574,7 @@ def run_flask():
         def filter(self, record):
             # Hide polling requests from terminal
             msg = record.getMessage()
-            if '/api/status' in msg or '/api/agents' in msg:
+            if '/api/status' in msg or '/api/agents' in msg or '/api/metrics' in msg:
                 return False
             return True
     
@@ -2077,13 +3603,7 @@ def main_with_api():
     else:
         logger.info("PROFILE", "Fresh Chrome instance (no saved profile)", {"path": profile_path})
     
-    options = uc.ChromeOptions()
-    options.add_argument(f"--load-extension={extension_path}")
-    options.add_argument(f"--user-data-dir={profile_path}")
-    options.add_argument("--no-first-run")
-    options.add_argument("--no-default-browser-check")
-    
-    logger.info("CHROME", "Chrome options configured")
+    logger.info("CHROME", "Chrome options configured", {"headless": HEADLESS})
     
     # ==========================================================================
     # P2 Phase 4: Chrome Launch
@@ -2091,7 +3611,7 @@ def main_with_api():
     logger.info("CHROME", "Launching Chrome...")
     
     try:
-        driver = uc.Chrome(options=options)
+        driver = init_driver(profile_path)  # P20: Shared options incl. headless
         logger.info("CHROME", "Chrome launched successfully")
     except Exception as e:
         logger.error("CHROME", "Chrome launch failed", {"error": str(e)})
@@ -2100,6 +3620,7 @@ def main_with_api():
         sys.exit(1)
     
     driver_ref = driver
+    driver_pool.adopt(driver)  # P13: The first Chrome is pool instance 0
     wait = WebDriverWait(driver, 5)  # P2: 5 second timeout
     logger.info("CHROME", "Driver ready", {"timeout": 5})
     
@@ -2114,7 +3635,7 @@ def main_with_api():
         # ======================================================================
         # P3 Phase 6: Navigate to AI Studio
         # ======================================================================
-        url = "https://aistudio.google.com/apps/bundled/blank?showAssistant=true&showCode=true"
+        url = NEW_APP_URL
         logger.info("NAVIGATION", "Navigating to AI Studio", {"url": url})
         driver.get(url)
         logger.debug("NAVIGATION", "Navigation started")
@@ -2196,6 +3717,17 @@ def main_with_api():
         # Scan existing tabs for agent handles
         capture_agent_handles(driver)
         
+        # P13: Launch the remaining pool instances (profile copies share the login)
+        if driver_pool.size > 1:
+            logger.info("CHROME", f"Launching {driver_pool.size - 1} extra pool instance(s)")
+            driver_pool.launch_extra(url)
+            for instance in driver_pool.instances[1:]:
+                if instance.driver:
+                    capture_agent_handles(instance.driver)
+        
+        # P34: Pre-warm blank-app tabs (no-op unless XAGENT_WARM_TABS > 0)
+        warm_tab_pool.start()
+        
         # Start Flask API in background
         flask_thread = threading.Thread(target=run_flask, daemon=True)
         flask_thread.start()
@@ -2219,13 +3751,25 @@ def main_with_api():
     finally:
         logger.info("SHUTDOWN", "Cleaning up...")
         stop_all()
-        try:
-            driver.quit()
-            logger.info("SHUTDOWN", "Chrome closed")
-        except:
-            pass
+        for instance in driver_pool.instances:
+            try:
+                if instance.driver:
+                    instance.driver.quit()
+                    logger.info("SHUTDOWN", f"Chrome instance {instance.index} closed")
+            except:
+                pass
         logger.info("SHUTDOWN", "Goodbye!")
 
 
 if __name__ == "__main__":
-    main_with_api()
+    import argparse
+    parser = argparse.ArgumentParser(description="XAGENT automation backend")
+    parser.add_argument("--prebuild-packages", action="store_true",
+                        help="Build every agent's .agent.zip (P29 package cache) and exit")
+    parser.add_argument("--api", action="store_true",
+                        help="Accepted for compatibility; the API server always starts")
+    args = parser.parse_args()
+    if args.prebuild_packages:
+        prebuild_agent_packages()
+    else:
+        main_with_api()
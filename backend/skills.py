@@ -0,0 +1,116 @@
+"""
+Skill Index - parsed .agent/skills/<AGENT_ID>/SKILL.md files, cached in memory
+Files are parsed once; later lookups only stat them (at most every
+XAGENT_SKILL_CHECK_SECONDS) and re-read the ones whose mtime/size changed.
+The roster grouped by category and its ETag are rebuilt only when the index changes.
+"""
+import hashlib
+import os
+import threading
+import time
+
+CHECK_INTERVAL = float(os.getenv("XAGENT_SKILL_CHECK_SECONDS", "2"))
+
+
+def parse_skill(agent_id: str, content: str) -> tuple[str, str]:
+    """(name, description) from the YAML frontmatter; defaults to (agent_id, "")"""
+    name = agent_id
+    description = ""
+    if content.startswith("---"):
+        parts = content.split("---", 2)
+        if len(parts) >= 3:
+            for line in parts[1].split("\n"):
+                if line.startswith("name:"):
+                    name = line.split(":", 1)[1].strip().strip('"\'')
+                elif line.startswith("description:"):
+                    description = line.split(":", 1)[1].strip().strip('"\'')
+    return name, description
+
+
+class SkillIndex:
+    """agent_id -> parsed skill, invalidated by file mtime/size"""
+
+    def __init__(self, root: str, check_interval: float = CHECK_INTERVAL):
+        self.root = root
+        self.check_interval = check_interval
+        self.version = 0
+        self._skills = {}   # agent_id -> skill dict
+        self._stats = {}    # agent_id -> (mtime_ns, size)
+        self._checked = 0.0
+        self._roster = None  # (version, roster, etag)
+        self._lock = threading.Lock()
+
+    def _skill_path(self, agent_id: str) -> str:
+        return os.path.join(self.root, agent_id, "SKILL.md")
+
+    def _scan(self):
+        """Stat every SKILL.md; (re)parse new or changed files, drop removed ones"""
+        try:
+            agent_ids = [name for name in os.listdir(self.root)
+                         if os.path.isfile(self._skill_path(name))]
+        except OSError:
+            agent_ids = []
+        changed = False
+        for agent_id in agent_ids:
+            path = self._skill_path(agent_id)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stamp = (st.st_mtime_ns, st.st_size)
+            if self._stats.get(agent_id) == stamp:
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+            name, description = parse_skill(agent_id, content)
+            self._skills[agent_id] = {
+                "id": agent_id,
+                "name": name,
+                "description": description,
+                "skill_content": content,
+                "skill_path": path,
+                "hash": hashlib.sha256(content.encode("utf-8")).hexdigest()
+            }
+            self._stats[agent_id] = stamp
+            changed = True
+        for agent_id in set(self._skills) - set(agent_ids):
+            del self._skills[agent_id]
+            del self._stats[agent_id]
+            changed = True
+        if changed:
+            self.version += 1
+
+    def refresh(self, force: bool = False):
+        """Re-stat the skill files unless that was done within check_interval"""
+        with self._lock:
+            now = time.monotonic()
+            if force or now - self._checked >= self.check_interval:
+                self._scan()
+                self._checked = now
+
+    def get(self, agent_id: str) -> dict | None:
+        """Parsed skill for agent_id (copy), or None if it has no SKILL.md"""
+        self.refresh()
+        with self._lock:
+            skill = self._skills.get(agent_id)
+        return dict(skill) if skill else None
+
+    def roster(self) -> tuple[dict, str]:
+        """({category: [{id, name, description}]}, etag), rebuilt only when a skill changed"""
+        self.refresh()
+        with self._lock:
+            if self._roster is None or self._roster[0] != self.version:
+                roster = {}
+                for agent_id in sorted(self._skills):
+                    skill = self._skills[agent_id]
+                    category = agent_id.split("-")[0] if "-" in agent_id else "OTHER"
+                    roster.setdefault(category, []).append({
+                        "id": agent_id,
+                        "name": skill["name"],
+                        "description": skill["description"]
+                    })
+                digest = hashlib.sha1("".join(
+                    agent_id + self._skills[agent_id]["hash"] for agent_id in sorted(self._skills)
+                ).encode()).hexdigest()[:16]
+                self._roster = (self.version, roster, digest)
+            return self._roster[1], self._roster[2]
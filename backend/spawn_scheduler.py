@@ -0,0 +1,191 @@
+"""
+Spawn Scheduler - bounded, prioritized queue in front of agent spawns
+Spawn requests wait here (not in parked worker threads) until a browser
+instance has a free spawn slot. Lower priority numbers are dispatched first,
+FIFO within a class. A request for an agent that is already queued or spawning
+returns the existing request (dedup), queued requests can be cancelled, and
+every queued request knows its position.
+"""
+import itertools
+import threading
+import time
+
+MAX_QUEUE = 64
+SPAWNS_PER_INSTANCE = 1
+DEFAULT_PRIORITIES = "CTO=0,DIR=1,LEAD=1,ARCH=1,SEN=2,*=3"
+
+
+class QueueFull(RuntimeError):
+    """The spawn queue already holds max_queue requests"""
+
+
+def parse_priorities(spec: str) -> dict:
+    """'CTO=0,DIR=1,*=3' -> {"CTO": 0, "DIR": 1, "*": 3}"""
+    rules = {}
+    for part in spec.split(","):
+        token, _, value = part.partition("=")
+        if token.strip() and value.strip():
+            rules[token.strip().upper()] = int(value)
+    return rules
+
+
+def priority_for(agent_id: str, rules: dict) -> int:
+    """Best (lowest) priority among the agent_id's dash-separated parts, else the '*' rule
+
+    CTO-001 -> CTO, BE-DIR-001 -> DIR, FE-SEN-002 -> SEN
+    """
+    matches = [rules[part] for part in agent_id.upper().split("-") if part in rules]
+    return min(matches) if matches else rules.get("*", 0)
+
+
+class SpawnRequest:
+    """One queued or running spawn"""
+
+    def __init__(self, agent_id: str, priority: int, seq: int, job):
+        self.agent_id = agent_id
+        self.priority = priority
+        self.seq = seq
+        self.job = job
+        self.state = "queued"  # queued -> running -> done | cancelled
+        self.position = None  # 1-based while queued
+        self.instance = None  # Set when dispatched
+        self.created_at = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "agent_id": self.agent_id,
+            "priority": self.priority,
+            "state": self.state,
+            "position": self.position,
+            "instance": getattr(self.instance, "index", None),
+            "job_id": getattr(self.job, "id", None),
+            "waited": round(time.time() - self.created_at, 3)
+        }
+
+
+class SpawnScheduler:
+    """Dispatches spawn requests to instances with a free slot, in priority order
+
+    pick_instance(agent_id, has_slot) returns the instance to spawn on (one for
+    which has_slot(instance) is True) or None to keep the request queued.
+    start(request) begins the spawn without blocking; the spawn must call
+    finish(request) when it ends. If start() raises, the request's slot is
+    freed and on_start_failed(request, error) undoes whatever pick_instance
+    reserved. on_position(request) is called whenever a queued request's
+    position changes.
+    """
+
+    def __init__(self, pick_instance, start, max_queue=MAX_QUEUE, per_instance=SPAWNS_PER_INSTANCE,
+                 on_position=None, on_start_failed=None):
+        self.pick_instance = pick_instance
+        self.start = start
+        self.max_queue = max_queue
+        self.per_instance = per_instance
+        self.on_position = on_position
+        self.on_start_failed = on_start_failed
+        self._queue = []  # Sorted by (priority, seq)
+        self._active = {}  # agent_id -> queued or running request
+        self._running = {}  # instance -> running spawns
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _has_slot(self, instance) -> bool:
+        return self._running.get(instance, 0) < self.per_instance
+
+    # -- requests -----------------------------------------------------------------
+    def submit(self, agent_id: str, priority: int, create_job) -> tuple[SpawnRequest, bool]:
+        """Queue a spawn; create_job() makes its job. Returns (request, False) for a duplicate."""
+        with self._lock:
+            existing = self._active.get(agent_id)
+            if existing:
+                return existing, False
+            if len(self._queue) >= self.max_queue:
+                raise QueueFull(f"Spawn queue is full ({self.max_queue} waiting)")
+            request = SpawnRequest(agent_id, priority, next(self._seq), create_job())
+            self._active[agent_id] = request
+            self._queue.append(request)
+            self._queue.sort(key=lambda r: (r.priority, r.seq))
+        self._dispatch()
+        return request, True
+
+    def cancel(self, agent_id: str) -> SpawnRequest | None:
+        """Remove a queued request. Running spawns are not interrupted (returns None)."""
+        with self._lock:
+            request = self._active.get(agent_id)
+            if not request or request.state != "queued":
+                return None
+            self._queue.remove(request)
+            del self._active[agent_id]
+            request.state = "cancelled"
+            request.position = None
+        self._dispatch()
+        return request
+
+    def finish(self, request: SpawnRequest):
+        """Release the request's instance slot and dispatch what can run now"""
+        self._release(request)
+        self._dispatch()
+
+    def _release(self, request: SpawnRequest):
+        with self._lock:
+            request.state = "done"
+            if self._active.get(request.agent_id) is request:
+                del self._active[request.agent_id]
+            if request.instance is not None:
+                self._running[request.instance] = max(0, self._running.get(request.instance, 0) - 1)
+
+    def get(self, agent_id: str) -> SpawnRequest | None:
+        with self._lock:
+            return self._active.get(agent_id)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            active = list(self._active.values())
+            return {
+                "max_queue": self.max_queue,
+                "per_instance": self.per_instance,
+                "queued": [r.to_dict() for r in self._queue],
+                "running": [r.to_dict() for r in active if r.state == "running"]
+            }
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    # -- dispatch -----------------------------------------------------------------
+    def _dispatch(self):
+        """Start every queued request whose instance has a free slot; renumber the rest"""
+        started, moved = [], []
+        with self._lock:
+            for request in list(self._queue):
+                instance = self.pick_instance(request.agent_id, self._has_slot)
+                if instance is None:
+                    continue  # Its instance is busy; later requests may fit elsewhere
+                self._queue.remove(request)
+                request.state = "running"
+                request.position = None
+                request.instance = instance
+                self._running[instance] = self._running.get(instance, 0) + 1
+                started.append(request)
+            for position, request in enumerate(self._queue, 1):
+                if request.position != position:
+                    request.position = position
+                    moved.append(request)
+        failed = False
+        for request in started:
+            try:
+                self.start(request)
+            except Exception as e:
+                # One failed start must not strand the others: free its slot and go on
+                failed = True
+                self._release(request)
+                if self.on_start_failed:
+                    try:
+                        self.on_start_failed(request, e)
+                    except Exception:
+                        pass
+        if self.on_position:
+            for request in moved:
+                self.on_position(request)
+        if failed:
+            self._dispatch()  # Freed slots can take the next queued requests
@@ -0,0 +1,225 @@
+"""
+Span Tracing - per-agent timelines for spawn/chat phases and WebDriver waits
+A trace is opened per operation (trace(agent_id, "spawn")); phases and spans
+recorded on the same thread nest under it. Finished spans go into a bounded
+ring buffer and can be exported as Chrome trace-event JSON (chrome://tracing,
+Perfetto). Outside an open trace every call is a cheap no-op.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_BUFFER_SIZE = int(os.getenv("XAGENT_TRACE_BUFFER", "5000"))  # Finished spans kept
+
+
+class Span:
+    """One timed operation inside a trace"""
+
+    __slots__ = ("id", "trace_id", "agent_id", "parent_id", "name", "category",
+                 "start", "end", "attrs", "thread", "error")
+
+    def __init__(self, trace_id, agent_id, parent_id, name, category, attrs):
+        self.id = uuid.uuid4().hex[:8]
+        self.trace_id = trace_id
+        self.agent_id = agent_id
+        self.parent_id = parent_id
+        self.name = name
+        self.category = category
+        self.start = time.time()
+        self.end = None
+        self.attrs = attrs
+        self.thread = threading.current_thread().name
+        self.error = None
+
+    @property
+    def duration(self):
+        return None if self.end is None else self.end - self.start
+
+    def to_dict(self) -> dict:
+        return {
+            "span_id": self.id,
+            "trace_id": self.trace_id,
+            "agent_id": self.agent_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "category": self.category,
+            "start": self.start,
+            "duration": round(self.duration, 4) if self.end is not None else None,
+            "attrs": self.attrs,
+            "thread": self.thread,
+            "error": self.error
+        }
+
+
+class Tracer:
+    """Thread-local span stacks feeding one shared ring buffer"""
+
+    def __init__(self, capacity: int = TRACE_BUFFER_SIZE):
+        self._spans = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # -- context --------------------------------------------------------------
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def active(self) -> bool:
+        return bool(getattr(self._local, "stack", None))
+
+    def _open(self, name, category, attrs, agent_id=None) -> Span:
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        span = Span(
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex[:12],
+            agent_id=parent.agent_id if parent else agent_id,
+            parent_id=parent.id if parent else None,
+            name=name, category=category, attrs=attrs
+        )
+        stack.append(span)
+        return span
+
+    def _close(self, span: Span, error: Exception = None):
+        stack = self._stack()
+        # Close anything left open above this span (e.g. a trailing phase)
+        while stack:
+            top = stack.pop()
+            top.end = time.time()
+            if top is span:
+                break
+            self._record(top)
+        if error is not None:
+            span.error = str(error)
+        self._record(span)
+
+    def _record(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+
+    # -- public API -----------------------------------------------------------
+    @contextmanager
+    def trace(self, agent_id: str, name: str, **attrs):
+        """Root span for one operation on agent_id (nests as a child if a trace is open)"""
+        span = self._open(name, "trace" if not self.active() else "operation", attrs, agent_id)
+        try:
+            yield span
+        except BaseException as e:
+            self._close(span, e)
+            raise
+        else:
+            self._close(span)
+
+    @contextmanager
+    def span(self, name: str, category: str = "span", **attrs):
+        """Nested span; no-op when no trace is open on this thread"""
+        if not self.active():
+            yield None
+            return
+        span = self._open(name, category, attrs)
+        try:
+            yield span
+        except BaseException as e:
+            self._close(span, e)
+            raise
+        else:
+            self._close(span)
+
+    def phase(self, name: str, **attrs):
+        """Sequential phase marker: ends the previous phase and starts `name`"""
+        if not self.active():
+            return
+        stack = self._stack()
+        # Phases belong to the innermost trace/operation; close that one's current phase
+        owner = max(i for i, s in enumerate(stack) if s.category in ("trace", "operation"))
+        if owner + 1 < len(stack) and stack[owner + 1].category == "phase":
+            self._close(stack[owner + 1])
+        self._open(name, "phase", attrs)
+
+    def context(self):
+        """This thread's open span stack, for attach() on a thread doing work on its behalf"""
+        return getattr(self._local, "stack", None)
+
+    @contextmanager
+    def attach(self, stack):
+        """Record into another thread's open trace (that thread must be waiting on this one)"""
+        previous = getattr(self._local, "stack", None)
+        self._local.stack = stack if stack is not None else []
+        try:
+            yield
+        finally:
+            self._local.stack = previous
+
+    def spans(self, agent_id: str = None, trace_id: str = None) -> list:
+        """Finished spans, oldest first"""
+        with self._lock:
+            spans = list(self._spans)
+        return [s for s in spans
+                if (agent_id is None or s.agent_id == agent_id)
+                and (trace_id is None or s.trace_id == trace_id)]
+
+    def traces(self, agent_id: str) -> list:
+        """Spans for agent_id grouped by trace, each trace's spans ordered by start"""
+        grouped = {}
+        for span in self.spans(agent_id):
+            grouped.setdefault(span.trace_id, []).append(span)
+        result = []
+        for trace_id, spans in grouped.items():
+            spans.sort(key=lambda s: s.start)
+            root = next((s for s in spans if s.parent_id is None), None)
+            result.append({
+                "trace_id": trace_id,
+                "name": root.name if root else None,
+                "start": spans[0].start,
+                "duration": round(root.duration, 4) if root else None,
+                "error": root.error if root else None,
+                "spans": [s.to_dict() for s in spans]
+            })
+        result.sort(key=lambda t: t["start"])
+        return result
+
+    def agent_ids(self) -> dict:
+        """{agent_id: span count} for everything in the buffer"""
+        counts = {}
+        for span in self.spans():
+            counts[span.agent_id] = counts.get(span.agent_id, 0) + 1
+        return counts
+
+
+def to_chrome_trace(spans: list) -> dict:
+    """Chrome trace-event JSON ("X" complete events, microseconds; one process per agent)"""
+    events = []
+    pids, tids = {}, {}
+    for span in spans:
+        if span.end is None:
+            continue
+        pid = pids.setdefault(span.agent_id or "xagent", len(pids) + 1)
+        tid = tids.setdefault((pid, span.thread), len(tids) + 1)
+        args = dict(span.attrs, trace_id=span.trace_id)
+        if span.error:
+            args["error"] = span.error
+        events.append({
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": int(span.start * 1_000_000),
+            "dur": int(span.duration * 1_000_000),
+            "pid": pid,
+            "tid": tid,
+            "args": args
+        })
+    meta = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}}
+            for name, pid in pids.items()]
+    meta += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread}}
+             for (pid, thread), tid in tids.items()]
+    return {"traceEvents": meta + events, "displayTimeUnit": "ms"}
+
+
+tracer = Tracer()
+trace = tracer.trace
+span = tracer.span
+phase = tracer.phase
@@ -0,0 +1,337 @@
+"""
+XAGENT API Benchmark - spawn time, per-phase breakdown, chat round trip,
+broadcast latency and spawn throughput, measured through the Flask API.
+
+Against a running backend (already pointed at a fake or real AI Studio):
+    python benchmarks/bench_api.py --agents 4 --chats 10
+
+Fully offline - starts backend/fake_aistudio.py in-process and backend/main.py
+as a subprocess with XAGENT_AISTUDIO_URL pointing at it:
+    python benchmarks/bench_api.py --launch --agents 4 --think 1.0
+
+Results are written as JSON (benchmarks/results/bench-<timestamp>.json by
+default); pass --baseline <old.json> to print p50/p95 deltas against a
+previous run.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BACKEND_DIR = os.path.join(ROOT, "backend")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+sys.path.insert(0, BACKEND_DIR)
+from jobs import FINISHED_STATES  # backend/jobs.py is stdlib-only
+
+# Spawn phases reported in the breakdown (names match jobs.phase() calls in main.py)
+SPAWN_PHASES = [
+    "wait_instance", "reactivation_check", "reactivate", "create_zip", "new_tab", "navigate",
+    "select_model", "system_instructions", "upload_zip", "upload_core", "save_app", "init_message",
+    "init_response",
+]
+
+
+# =============================================================================
+# HTTP + statistics helpers
+# =============================================================================
+def api_call(base, method, path, body=None, timeout=600):
+    """JSON request; returns (status, parsed body)"""
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method,
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read() or b"null")
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read() or b"null")
+        except ValueError:
+            return e.code, None
+
+
+def percentile(values, p):
+    """Linear-interpolated percentile (p in 0-100)"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(values):
+    """n/min/mean/p50/p95/p99/max in seconds (rounded to ms)"""
+    values = [v for v in values if v is not None]
+    if not values:
+        return {"n": 0}
+    r = lambda v: round(v, 3)
+    return {
+        "n": len(values),
+        "min": r(min(values)),
+        "mean": r(sum(values) / len(values)),
+        "p50": r(percentile(values, 50)),
+        "p95": r(percentile(values, 95)),
+        "p99": r(percentile(values, 99)),
+        "max": r(max(values)),
+    }
+
+
+def wait_for_job(base, job_id, poll=0.25, timeout=900):
+    """Poll /api/jobs/<id> until the job finishes; returns its final dict"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        code, job = api_call(base, "GET", f"/api/jobs/{job_id}")
+        if code == 200 and job["state"] in FINISHED_STATES:
+            return job
+        time.sleep(poll)
+    raise TimeoutError(f"Job {job_id} did not finish in {timeout}s")
+
+
+# =============================================================================
+# Benchmarks
+# =============================================================================
+def bench_spawn(base, agent_ids):
+    """Submit all spawns at once; report per-agent times, phases and agents/minute"""
+    print(f"[spawn] Spawning {len(agent_ids)} agents...")
+    started = time.time()
+    submitted = []
+    for aid in agent_ids:
+        t0 = time.time()
+        code, body = api_call(base, "POST", "/api/spawn", {"agent_id": aid})
+        if code != 202:
+            print(f"[spawn] {aid}: submit failed ({code}) {body}")
+            submitted.append((aid, t0, None))
+            continue
+        submitted.append((aid, t0, body["job_id"]))
+
+    runs = []
+    for aid, t0, job_id in submitted:
+        if not job_id:
+            runs.append({"agent_id": aid, "state": "rejected"})
+            continue
+        job = wait_for_job(base, job_id)
+        phases = {p["name"]: p["duration"] for p in job["phases"]}
+        runs.append({
+            "agent_id": aid,
+            "state": job["state"],
+            "error": job["error"],
+            "end_to_end": round(job["finished_at"] - t0, 3),
+            "run_time": job["run_time"],
+            "queue_time": job["queue_time"],
+            "path": "reactivate" if phases.get("reactivate") is not None and "create_zip" not in phases else "full",
+            "phases": phases,
+        })
+        print(f"[spawn] {aid}: {job['state']} in {job['run_time']}s")
+    wall = time.time() - started
+
+    ok = [r for r in runs if r["state"] == "succeeded"]
+    phase_names = SPAWN_PHASES + sorted({n for r in ok for n in r["phases"]} - set(SPAWN_PHASES))
+    return {
+        "requested": len(agent_ids),
+        "succeeded": len(ok),
+        "failed": len(runs) - len(ok),
+        "wall_seconds": round(wall, 3),
+        "agents_per_minute": round(len(ok) / (wall / 60.0), 3) if wall > 0 else None,
+        "run_time": summarize([r["run_time"] for r in ok]),
+        "end_to_end": summarize([r["end_to_end"] for r in ok]),
+        "phases": {name: summarize([r["phases"].get(name) for r in ok])
+                   for name in phase_names if any(name in r["phases"] for r in ok)},
+        "runs": runs,
+    }
+
+
+def bench_chat(base, agent_ids, count, message):
+    """Sequential synchronous /api/chat calls, round-robin over agents"""
+    print(f"[chat] {count} round trips over {len(agent_ids)} agents...")
+    samples, failures = [], 0
+    for i in range(count):
+        aid = agent_ids[i % len(agent_ids)]
+        t0 = time.time()
+        code, body = api_call(base, "POST", "/api/chat", {"agent_id": aid, "message": f"{message} #{i}"})
+        elapsed = time.time() - t0
+        if code == 200:
+            samples.append(elapsed)
+            print(f"[chat] {aid}: {elapsed:.2f}s ({'response' if body.get('response') else 'no response'})")
+        else:
+            failures += 1
+            print(f"[chat] {aid}: failed ({code}) {body}")
+    return {"requested": count, "failed": failures, "round_trip": summarize(samples)}
+
+
+def bench_broadcast(base, count, message):
+    """Synchronous broadcasts to every active agent"""
+    print(f"[broadcast] {count} broadcasts...")
+    totals, per_agent, failures = [], [], 0
+    for i in range(count):
+        t0 = time.time()
+        code, body = api_call(base, "POST", "/api/chat", {"message": f"{message} (broadcast #{i})"})
+        elapsed = time.time() - t0
+        if code != 200:
+            failures += 1
+            print(f"[broadcast] failed ({code}) {body}")
+            continue
+        totals.append(elapsed)
+        per_agent.extend(r.get("elapsed") for r in body["results"].values() if r.get("success"))
+        print(f"[broadcast] {body['success_count']}/{body['total']} agents in {elapsed:.2f}s")
+    return {
+        "requested": count,
+        "failed": failures,
+        "total": summarize(totals),
+        "per_agent": summarize(per_agent),
+    }
+
+
+# =============================================================================
+# Environment (optional --launch)
+# =============================================================================
+def start_fake_aistudio(port, config):
+    """Run fake_aistudio in a daemon thread; returns its base URL"""
+    import fake_aistudio
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", port, fake_aistudio.create_app(config), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{port}"
+
+
+def start_backend(base, env_overrides, timeout=180):
+    """Start backend/main.py and wait until /api/status reports a browser"""
+    env = dict(os.environ, **env_overrides)
+    proc = subprocess.Popen([sys.executable, "main.py"], cwd=BACKEND_DIR, env=env)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"backend exited with code {proc.returncode}")
+        try:
+            code, status = api_call(base, "GET", "/api/status", timeout=5)
+            if code == 200 and status.get("driver_initialized"):
+                return proc
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(1)
+    proc.terminate()
+    raise TimeoutError("backend did not become ready")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline_path):
+    """Print p50/p95 changes vs an earlier results file"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def rows(result):
+        for section, key in [("spawn", "run_time"), ("spawn", "end_to_end"), ("chat", "round_trip"),
+                             ("broadcast", "total"), ("broadcast", "per_agent")]:
+            yield f"{section}.{key}", result.get(section, {}).get(key, {})
+        for name, stats in result.get("spawn", {}).get("phases", {}).items():
+            yield f"spawn.phase.{name}", stats
+
+    old = dict(rows(baseline))
+    print(f"\nvs {baseline_path} ({baseline.get('meta', {}).get('commit')})")
+    for name, stats in rows(current):
+        before = old.get(name, {})
+        for p in ("p50", "p95"):
+            if stats.get(p) is not None and before.get(p):
+                change = (stats[p] - before[p]) / before[p] * 100
+                print(f"  {name:32s} {p}: {before[p]:8.3f}s -> {stats[p]:8.3f}s ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the XAGENT API")
+    parser.add_argument("--api", default="http://127.0.0.1:5000", help="backend base URL")
+    parser.add_argument("--launch", action="store_true", help="start fake AI Studio + backend/main.py")
+    parser.add_argument("--fake-port", type=int, default=8800)
+    parser.add_argument("--think", type=float, default=1.0, help="fake AI think seconds (--launch)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="fake AI think jitter (--launch)")
+    parser.add_argument("--agents", type=int, default=3, help="agents to spawn (first N from /api/roster)")
+    parser.add_argument("--agent-ids", nargs="*", help="explicit agent ids instead of the roster")
+    parser.add_argument("--chats", type=int, default=10, help="single-agent chat round trips")
+    parser.add_argument("--broadcasts", type=int, default=3)
+    parser.add_argument("--message", default="Benchmark ping: update output.md with STATUS: COMPLETE")
+    parser.add_argument("--out", help="results JSON path")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    backend = None
+    fake_config = None
+    if args.launch:
+        fake_config = {"think": args.think, "jitter": args.jitter, "seed": 1}
+        fake_url = start_fake_aistudio(args.fake_port, fake_config)
+        print(f"Fake AI Studio: {fake_url}")
+        backend = start_backend(args.api, {"XAGENT_AISTUDIO_URL": fake_url})
+
+    try:
+        agent_ids = args.agent_ids
+        if not agent_ids:
+            _, roster = api_call(args.api, "GET", "/api/roster")
+            agent_ids = sorted(a["id"] for agents in roster.values() for a in agents)[:args.agents]
+        if not agent_ids:
+            sys.exit("No agents to benchmark (empty roster)")
+
+        result = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "commit": git_commit(),
+                "api": args.api,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "fake_aistudio": fake_config,
+                "args": vars(args),
+            },
+            "spawn": bench_spawn(args.api, agent_ids),
+        }
+
+        # Chat/broadcast only against agents that actually came up
+        live = [r["agent_id"] for r in result["spawn"]["runs"] if r["state"] == "succeeded"]
+        if live and args.chats:
+            result["chat"] = bench_chat(args.api, live, args.chats, args.message)
+        if live and args.broadcasts:
+            result["broadcast"] = bench_broadcast(args.api, args.broadcasts, args.message)
+    finally:
+        if backend:
+            backend.terminate()
+            try:
+                backend.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                backend.kill()
+
+    out = args.out or os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    spawn = result["spawn"]
+    print(f"\nspawn: {spawn['succeeded']}/{spawn['requested']} ok, "
+          f"p50 {spawn['run_time'].get('p50')}s p95 {spawn['run_time'].get('p95')}s "
+          f"p99 {spawn['run_time'].get('p99')}s, {spawn['agents_per_minute']} agents/min")
+    for name, stats in spawn["phases"].items():
+        print(f"  {name:20s} p50 {stats['p50']:7.3f}s  p95 {stats['p95']:7.3f}s")
+    if "chat" in result:
+        rt = result["chat"]["round_trip"]
+        print(f"chat: p50 {rt.get('p50')}s p95 {rt.get('p95')}s p99 {rt.get('p99')}s")
+    if "broadcast" in result:
+        print(f"broadcast: p50 {result['broadcast']['total'].get('p50')}s total")
+    print(f"Results: {out}")
+
+    if args.baseline:
+        compare(result, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
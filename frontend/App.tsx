@@ -192,49 +192,37 @@ export default function App() {
     };
   }, []);
 
-  // Polling (after initial connection established)
+  // P16: Live updates via Server-Sent Events (replaces 2s status/agents polling)
   useEffect(() => {
     if (status.status === 'offline' && connectionError) {
-      debugLog('useEffect', 'Polling skipped - connection error');
+      debugLog('useEffect', 'Event stream skipped - connection error');
       return;
     }
 
-    debugLog('useEffect', 'Polling setup');
-    debugger; // BREAKPOINT: Polling setup
+    debugLog('useEffect', 'Event stream setup');
+    debugger; // BREAKPOINT: Event stream setup
 
-    const poll = async () => {
-      debugLog('poll', 'Polling cycle start');
-      try {
-        debugLog('poll', 'Fetching status...');
-        const s = await api.getStatus();
-        debugLog('poll', 'Status received', s);
-        debugger; // BREAKPOINT: Status update
+    const unsubscribe = api.subscribeEvents({
+      onStatus: (s) => {
+        debugLog('events', 'Status received', s);
         setStatus(s);
         setConnectionError(null);
-
-        debugLog('poll', 'Fetching agents...');
-        const a = await api.getAgents();
-        debugLog('poll', 'Agents received', Object.keys(a));
+      },
+      onAgents: (a) => {
+        debugLog('events', 'Agents received', Object.keys(a));
         debugger; // BREAKPOINT: Agents update
         setActiveAgents(a);
-
-        debugLog('poll', 'Polling cycle complete');
-      } catch (e) {
-        debugLog('poll', 'Polling error', e);
-        debugger; // BREAKPOINT: Polling error
+      },
+      onError: () => {
+        // EventSource reconnects on its own; show offline until it does
+        debugLog('events', 'Event stream error');
         setStatus({ status: 'offline', driver_initialized: false });
-      }
-    };
-
-    poll();
-    const interval = setInterval(() => {
-      debugLog('poll', 'Interval tick');
-      poll();
-    }, 2000);
+      },
+    });
 
     return () => {
-      debugLog('useEffect', 'Polling cleanup');
-      clearInterval(interval);
+      debugLog('useEffect', 'Event stream cleanup');
+      unsubscribe();
     };
   }, [connectionError]);
 
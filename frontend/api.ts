@@ -1,5 +1,5 @@
 
-import { ActiveAgentMap, ParseResult, RosterResponse, SystemStatus, UploadedFile } from './types';
+import { ActiveAgentMap, AgentLifecycleEvent, AgentResponseEvent, Job, ParseResult, RosterResponse, SystemStatus, UploadedFile } from './types';
 
 const API_BASE = '/api';
 
@@ -61,6 +61,36 @@ export const api = {
     }
   },
 
+  // P16: Server-Sent Events stream - returns an unsubscribe function
+  subscribeEvents: (handlers: {
+    onStatus?: (status: SystemStatus) => void,
+    onAgents?: (agents: ActiveAgentMap) => void,
+    onAgent?: (event: AgentLifecycleEvent) => void,
+    onJob?: (job: Job) => void,
+    onResponse?: (event: AgentResponseEvent) => void,
+    onError?: () => void,
+  }): (() => void) => {
+    console.log('[API] subscribeEvents: Opening /api/events');
+    const source = new EventSource(`${API_BASE}/events`);
+    const listen = <T,>(event: string, handler?: (data: T) => void) => {
+      if (!handler) return;
+      source.addEventListener(event, (e) => handler(JSON.parse((e as MessageEvent).data)));
+    };
+    listen('status', handlers.onStatus);
+    listen('agents', handlers.onAgents);
+    listen('agent', handlers.onAgent);
+    listen('job', handlers.onJob);
+    listen('response', handlers.onResponse);
+    source.onerror = () => {
+      console.warn('[API] subscribeEvents: Stream error (browser will reconnect)');
+      handlers.onError?.();
+    };
+    return () => {
+      console.log('[API] subscribeEvents: Closing /api/events');
+      source.close();
+    };
+  },
+
   getAgents: async (): Promise<ActiveAgentMap> => {
     debugger; // BREAKPOINT: getAgents start
     console.log('[API] getAgents: Starting request');
@@ -42,3 +42,34 @@ export interface ParseResult {
   text: string;
   length: number;
 }
+
+// P15/P16: Background jobs and /api/events payloads
+export interface JobPhase {
+  name: string;
+  started_at: number;
+  duration: number | null;
+}
+
+export interface Job {
+  job_id: string;
+  kind: 'spawn' | 'chat' | 'broadcast';
+  params: Record<string, any>;
+  state: 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled';
+  created_at: number;
+  started_at: number | null;
+  finished_at: number | null;
+  phases: JobPhase[];
+  progress: Record<string, any>;
+  result: any;
+  error: string | null;
+}
+
+export interface AgentLifecycleEvent {
+  agent_id: string;
+  status: 'spawning' | 'active' | 'inactive';
+}
+
+export interface AgentResponseEvent {
+  agent_id: string;
+  response: string;
+}